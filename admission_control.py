@@ -0,0 +1,158 @@
+"""
+Admission control / load shedding for the profiler endpoints
+
+Under burst, requests used to pile up inside the single worker until the
+proxy timeout killed them, after the LLM call had already been paid for.
+AdmissionController decides up front, per request, whether admitted work
+can still finish within the deadline:
+
+- Provider budget: a dependency whose circuit is open -> 503
+- In-flight cap: too many profiler requests already running -> 429
+- Provider budget: LLM calls admitted in the last minute reached the
+  per-minute budget -> 429
+- Deadline: estimated queue wait + expected LLM time exceeds the deadline -> 429
+
+Every rejection carries Retry-After so the Lambda/SQS retry comes back
+later instead of spending tokens on a result nobody receives.
+"""
+
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+from circuit_breaker import find_breaker
+from deadlines import REQUEST_DEADLINE_SECONDS
+from llm_scheduler import LLMDispatcher, PRIORITY_RANKS
+
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32"))
+# Expected LLM call duration until the dispatcher has observed real calls
+ADMISSION_DEFAULT_LLM_SECONDS = float(os.getenv("ADMISSION_DEFAULT_LLM_SECONDS", "30"))
+# Max profiler requests admitted per minute (0 = unlimited)
+LLM_PROVIDER_RPM_BUDGET = int(os.getenv("LLM_PROVIDER_RPM_BUDGET", "0"))
+
+
+class AdmissionRejected(Exception):
+    """A request was shed before doing any work"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float, message: str):
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(message)
+
+
+class AdmissionController:
+    """Admit or shed profiler requests based on in-flight load, queue wait and provider budget"""
+
+    def __init__(
+        self,
+        dispatcher: LLMDispatcher,
+        dependencies: Mapping[str, Iterable[str]],
+        deadline_seconds: float = REQUEST_DEADLINE_SECONDS,
+        max_in_flight: int = ADMISSION_MAX_IN_FLIGHT,
+        default_llm_seconds: float = ADMISSION_DEFAULT_LLM_SECONDS,
+        rpm_budget: int = LLM_PROVIDER_RPM_BUDGET
+    ):
+        """
+        Args:
+            dispatcher: LLM dispatcher whose queue is used for the wait estimate
+            dependencies: Per priority class, circuit breaker names that must be closed to admit work
+            deadline_seconds: Default time a request may take end to end
+            max_in_flight: Max admitted requests running at once (all classes)
+            default_llm_seconds: Expected LLM call time before any call was observed
+            rpm_budget: Max requests admitted per 60s window (0 = unlimited)
+        """
+        self.dispatcher = dispatcher
+        self.dependencies = {priority: list(names) for priority, names in dependencies.items()}
+        self.deadline_seconds = deadline_seconds
+        self.max_in_flight = max_in_flight
+        self.default_llm_seconds = default_llm_seconds
+        self.rpm_budget = rpm_budget
+
+        self._in_flight = {priority: 0 for priority in PRIORITY_RANKS}
+        self._admitted_at = deque()
+        self._admitted = 0
+        self._rejected: Dict[str, int] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return sum(self._in_flight.values())
+
+    def admit(self, priority: str, deadline_seconds: Optional[float] = None) -> None:
+        """
+        Admit one request of the given priority class (call release() when it finishes)
+
+        Args:
+            priority: Priority class of the request
+            deadline_seconds: The request's own deadline (X-Request-Deadline), if shorter
+
+        Raises:
+            AdmissionRejected: If the request should be shed
+        """
+        try:
+            self._check(priority, deadline_seconds or self.deadline_seconds)
+        except AdmissionRejected as e:
+            self._rejected[e.reason] = self._rejected.get(e.reason, 0) + 1
+            print(f"🚦 Shed {priority} request ({e.status_code} {e.reason}, Retry-After {e.retry_after}s): {e}")
+            raise
+        self._in_flight[priority] += 1
+        self._admitted += 1
+        if self.rpm_budget > 0:
+            self._admitted_at.append(time.monotonic())
+
+    def release(self, priority: str) -> None:
+        self._in_flight[priority] -= 1
+
+    def spare_rpm(self) -> Optional[int]:
+        """Requests that can still be admitted in the current 60s window (None = unlimited budget)"""
+        if self.rpm_budget <= 0:
+            return None
+        now = time.monotonic()
+        while self._admitted_at and self._admitted_at[0] <= now - 60:
+            self._admitted_at.popleft()
+        return max(0, self.rpm_budget - len(self._admitted_at))
+
+    def _check(self, priority: str, deadline_seconds: float) -> None:
+        for name in self.dependencies.get(priority, ()):
+            breaker = find_breaker(name)
+            if breaker is not None and breaker.is_open:
+                raise AdmissionRejected(
+                    503, "circuit_open", breaker.retry_after(),
+                    f"Dependency temporarily unavailable: {name}"
+                )
+
+        service = self.dispatcher.service_seconds(priority) or self.default_llm_seconds
+        if self.in_flight >= self.max_in_flight:
+            raise AdmissionRejected(
+                429, "in_flight_limit", service,
+                f"Too many requests in flight ({self.in_flight}/{self.max_in_flight})"
+            )
+
+        if self.spare_rpm() == 0:
+            raise AdmissionRejected(
+                429, "provider_budget", self._admitted_at[0] + 60 - time.monotonic(),
+                f"Provider request budget exhausted ({self.rpm_budget}/min)"
+            )
+
+        wait = self.dispatcher.estimate_wait(priority, self.default_llm_seconds)
+        if wait + service > deadline_seconds:
+            raise AdmissionRejected(
+                429, "deadline", wait + service - deadline_seconds,
+                f"Estimated completion {wait + service:.0f}s exceeds deadline {deadline_seconds:.0f}s"
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": dict(self._in_flight),
+            "max_in_flight": self.max_in_flight,
+            "deadline_seconds": self.deadline_seconds,
+            "rpm_budget": self.rpm_budget,
+            "admitted": self._admitted,
+            "rejected": dict(self._rejected),
+            "estimated_wait_seconds": {
+                priority: round(self.dispatcher.estimate_wait(priority, self.default_llm_seconds), 1)
+                for priority in PRIORITY_RANKS
+            }
+        }
@@ -0,0 +1,246 @@
+"""
+Circuit breakers for external dependencies (LLM providers, Supabase)
+
+Each dependency gets one CircuitBreaker that tracks recent calls in a
+sliding time window:
+
+- CLOSED: calls pass; the breaker opens when the failure rate or the
+  slow-call rate in the window reaches its threshold
+- OPEN: calls fail immediately with CircuitOpenError (no network I/O)
+  until `open_seconds` have passed
+- HALF_OPEN: a limited number of probe calls are let through; success
+  closes the breaker, failure re-opens it
+
+Only transient dependency errors (timeouts, connection errors, 429, 5xx)
+count as failures. Client errors such as 400 validation errors mean the
+dependency is healthy and are neither retried nor counted.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Default thresholds (overridable per dependency in get_breaker)
+CIRCUIT_FAILURE_RATE_THRESHOLD = float(os.getenv("CIRCUIT_FAILURE_RATE_THRESHOLD", "0.5"))
+CIRCUIT_SLOW_CALL_RATE_THRESHOLD = float(os.getenv("CIRCUIT_SLOW_CALL_RATE_THRESHOLD", "0.8"))
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "60"))
+CIRCUIT_MINIMUM_CALLS = int(os.getenv("CIRCUIT_MINIMUM_CALLS", "5"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+CIRCUIT_HALF_OPEN_MAX_CALLS = int(os.getenv("CIRCUIT_HALF_OPEN_MAX_CALLS", "1"))
+
+_TRANSIENT_NAME_MARKERS = ("Timeout", "Connect", "NetworkError", "RemoteProtocol")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Circuit '{name}' is open; retry after {retry_after:.0f}s")
+
+
+def is_transient_error(e: BaseException) -> bool:
+    """
+    Classify an exception as a transient dependency error (retry / count as failure)
+
+    Transient: 408/429/5xx responses, timeouts, connection errors.
+    Not transient: other 4xx responses, validation errors, open circuits.
+    """
+    if isinstance(e, CircuitOpenError):
+        return False
+    status_code = getattr(e, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in (408, 429) or status_code >= 500
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return True
+    return any(
+        marker in cls.__name__
+        for cls in type(e).__mro__
+        for marker in _TRANSIENT_NAME_MARKERS
+    )
+
+
+class CircuitBreaker:
+    """Error-rate / latency circuit breaker with half-open probing (thread-safe)"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = CIRCUIT_FAILURE_RATE_THRESHOLD,
+        slow_call_rate_threshold: float = CIRCUIT_SLOW_CALL_RATE_THRESHOLD,
+        slow_call_seconds: float = 30.0,
+        window_seconds: float = CIRCUIT_WINDOW_SECONDS,
+        minimum_calls: int = CIRCUIT_MINIMUM_CALLS,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+        half_open_max_calls: int = CIRCUIT_HALF_OPEN_MAX_CALLS
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.window_seconds = window_seconds
+        self.minimum_calls = minimum_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._calls = deque()  # (timestamp, failed, slow)
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+        self._rejected = 0
+        self._opened_count = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh_state(time.monotonic())
+            return self._state
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker will allow a probe call"""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def _refresh_state(self, now: float) -> None:
+        if self._state == OPEN and now >= self._opened_at + self.open_seconds:
+            self._state = HALF_OPEN
+            self._half_open_in_flight = 0
+            self._half_open_successes = 0
+
+    def _open(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._calls.clear()
+        self._opened_count += 1
+        print(f"🔌 Circuit '{self.name}' opened for {self.open_seconds:.0f}s")
+
+    def before_call(self) -> bool:
+        """
+        Check whether a call may proceed
+
+        Returns:
+            bool: True if the call is a half-open probe
+
+        Raises:
+            CircuitOpenError: If the breaker is open (or probe slots are taken)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refresh_state(now)
+            if self._state == OPEN:
+                self._rejected += 1
+                raise CircuitOpenError(self.name, self._opened_at + self.open_seconds - now)
+            if self._state == HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_max_calls:
+                    self._rejected += 1
+                    raise CircuitOpenError(self.name, 1.0)
+                self._half_open_in_flight += 1
+                return True
+            return False
+
+    def after_call(self, probe: bool, failed: bool, latency: float) -> None:
+        """Record the outcome of a call admitted by before_call"""
+        slow = latency >= self.slow_call_seconds
+        with self._lock:
+            now = time.monotonic()
+            if probe:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+                if self._state != HALF_OPEN:
+                    return
+                if failed or slow:
+                    self._open(now)
+                else:
+                    self._half_open_successes += 1
+                    if self._half_open_successes >= self.half_open_max_calls:
+                        self._state = CLOSED
+                        self._calls.clear()
+                        print(f"🔌 Circuit '{self.name}' closed")
+                return
+
+            if self._state != CLOSED:
+                return
+            self._calls.append((now, failed, slow))
+            while self._calls and self._calls[0][0] < now - self.window_seconds:
+                self._calls.popleft()
+            total = len(self._calls)
+            if total < self.minimum_calls:
+                return
+            failure_rate = sum(1 for _, f, _ in self._calls if f) / total
+            slow_rate = sum(1 for _, _, s in self._calls if s) / total
+            if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+                self._open(now)
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """
+        Wrap one dependency call
+
+        Raises CircuitOpenError without running the body while open.
+        Transient errors (is_transient_error) are recorded as failures.
+        """
+        probe = self.before_call()
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            self.after_call(probe, is_transient_error(e), time.monotonic() - started)
+            raise
+        self.after_call(probe, False, time.monotonic() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self._refresh_state(now)
+            total = len(self._calls)
+            return {
+                "state": self._state,
+                "window_calls": total,
+                "window_failure_rate": round(sum(1 for _, f, _ in self._calls if f) / total, 3) if total else 0.0,
+                "window_slow_rate": round(sum(1 for _, _, s in self._calls if s) / total, 3) if total else 0.0,
+                "opened_count": self._opened_count,
+                "rejected": self._rejected,
+                "retry_after_seconds": round(max(0.0, self._opened_at + self.open_seconds - now), 1) if self._state == OPEN else 0.0
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str, **settings: Any) -> CircuitBreaker:
+    """Get (or create on first use) the breaker for a dependency"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, **settings)
+            _breakers[name] = breaker
+        return breaker
+
+
+def find_breaker(name: str) -> Optional[CircuitBreaker]:
+    """Get an existing breaker without creating one"""
+    with _breakers_lock:
+        return _breakers.get(name)
+
+
+def all_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
+
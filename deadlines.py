@@ -0,0 +1,187 @@
+"""
+End-to-end request deadlines and cancellation on client disconnect
+
+A Deadline is created per profiler request from the X-Request-Deadline
+header (seconds the caller is willing to wait), defaulting to the proxy
+timeout. Each stage gets a share of the total budget:
+
+- fetch: prompt / input reads from Supabase
+- llm_attempt: one provider call (passed to the SDK as its request timeout;
+  retries stop once another attempt cannot fit)
+- write: result upserts and status updates (always granted its share, even
+  past the deadline: the LLM result is already paid for)
+
+While the LLM stage runs, the client connection is polled. When the caller
+disconnects or the deadline passes, the stage is cancelled and no further
+provider attempts are made. If the caller disconnects while a provider call
+is nearly finished (and DEADLINE_PERSIST_AFTER_DISCONNECT is on), the
+request keeps running in the background so the result is still persisted.
+
+Blocking SDK calls cannot be interrupted from another thread; they are
+bounded by the per-attempt timeout instead.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+REQUEST_DEADLINE_HEADER = "x-request-deadline"
+# nginx proxy_read_timeout is 180s; keep a margin for the response itself
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "170"))
+
+# Share of the total budget per stage (a stage never gets more than what is left)
+DEADLINE_STAGE_SHARES = {
+    "fetch": float(os.getenv("DEADLINE_SHARE_FETCH", "0.1")),
+    "llm_attempt": float(os.getenv("DEADLINE_SHARE_LLM_ATTEMPT", "0.6")),
+    "write": float(os.getenv("DEADLINE_SHARE_WRITE", "0.15")),
+}
+# Don't start another provider attempt with less time than this left
+DEADLINE_MIN_ATTEMPT_SECONDS = float(os.getenv("DEADLINE_MIN_ATTEMPT_SECONDS", "10"))
+
+# Keep running after a disconnect if the provider call should finish within this many seconds
+DEADLINE_PERSIST_AFTER_DISCONNECT = os.getenv("DEADLINE_PERSIST_AFTER_DISCONNECT", "true").lower() == "true"
+DEADLINE_PERSIST_GRACE_SECONDS = float(os.getenv("DEADLINE_PERSIST_GRACE_SECONDS", "15"))
+DISCONNECT_POLL_SECONDS = 1.0
+
+
+class DeadlineExceeded(Exception):
+    """A stage could not finish within the request deadline"""
+
+    def __init__(self, stage: str, budget: float):
+        self.stage = stage
+        self.budget = budget
+        super().__init__(f"Deadline exceeded in stage '{stage}' (budget {budget:.1f}s)")
+
+
+class ClientDisconnected(Exception):
+    """The caller went away before the result was ready"""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        super().__init__(f"Client disconnected during stage '{stage}'")
+
+
+class Deadline:
+    """Time budget of one request, shared by its stages (safe to read from worker threads)"""
+
+    def __init__(self, seconds: float = REQUEST_DEADLINE_SECONDS):
+        self.total = seconds
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + seconds
+        self.cancelled = False
+        # Last start per stage name: pipeline stages run concurrently, so there is no
+        # single "current stage" (a fetch retry must not hide a running LLM attempt)
+        self._stage_started: Dict[str, float] = {}
+        self._stage_lock = threading.Lock()
+
+    @classmethod
+    def from_headers(cls, headers: Any) -> "Deadline":
+        """Build from X-Request-Deadline (seconds); invalid or missing values use the default"""
+        value = headers.get(REQUEST_DEADLINE_HEADER) if headers is not None else None
+        try:
+            seconds = float(value) if value else REQUEST_DEADLINE_SECONDS
+        except ValueError:
+            seconds = REQUEST_DEADLINE_SECONDS
+        if not 0 < seconds <= REQUEST_DEADLINE_SECONDS:
+            seconds = REQUEST_DEADLINE_SECONDS
+        return cls(seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.cancelled or self.remaining() <= 0
+
+    def enter(self, stage: str) -> float:
+        """Record the start of a stage and return its start time"""
+        now = time.monotonic()
+        with self._stage_lock:
+            self._stage_started[stage] = now
+        return now
+
+    def stage_started_at(self, stage: str) -> Optional[float]:
+        """When the most recent run of `stage` started (None if it never ran)"""
+        with self._stage_lock:
+            return self._stage_started.get(stage)
+
+    def stage_timeout(self, stage: str) -> float:
+        """
+        Enter a stage and return its time budget
+
+        Raises:
+            DeadlineExceeded: If nothing is left of the request budget
+        """
+        self.enter(stage)
+        share = self.total * DEADLINE_STAGE_SHARES[stage]
+        if stage == "write":
+            return share
+        if self.expired:
+            raise DeadlineExceeded(stage, 0.0)
+        return min(self.remaining(), share)
+
+    def can_start_attempt(self) -> bool:
+        """Whether another provider attempt fits into the remaining budget"""
+        return not self.cancelled and self.remaining() >= DEADLINE_MIN_ATTEMPT_SECONDS
+
+    def cancel(self) -> None:
+        """Stop further work (provider retries check this flag)"""
+        self.cancelled = True
+
+
+async def run_stage(deadline: Deadline, stage: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking call in a worker thread within the stage budget"""
+    budget = deadline.stage_timeout(stage)
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(fn, *args, **kwargs), budget)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(stage, budget)
+
+
+async def watch_client(
+    awaitable: Awaitable[Any],
+    deadline: Deadline,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]],
+    expected_attempt_seconds: float
+) -> Any:
+    """
+    Await an LLM stage, cancelling it when the deadline passes or the client disconnects
+
+    Args:
+        awaitable: The LLM stage
+        deadline: Request deadline (cancelled together with the stage)
+        is_disconnected: Request.is_disconnected, or None when there is no HTTP caller
+        expected_attempt_seconds: Typical provider call duration, used to decide
+            whether a call in flight is nearly done when the client disconnects
+    """
+    task = asyncio.ensure_future(awaitable)
+    disconnected = False
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=min(DISCONNECT_POLL_SECONDS, max(deadline.remaining(), 0.01)))
+            if done:
+                return task.result()
+            attempt_started_at = deadline.stage_started_at("llm_attempt")
+            stage = "llm_attempt" if attempt_started_at is not None else "llm"
+            if deadline.expired:
+                deadline.cancel()
+                task.cancel()
+                raise DeadlineExceeded(stage, deadline.total)
+            if disconnected or is_disconnected is None or not await is_disconnected():
+                continue
+
+            disconnected = True
+            in_attempt = attempt_started_at is not None
+            left = expected_attempt_seconds - (time.monotonic() - (attempt_started_at or time.monotonic()))
+            if DEADLINE_PERSIST_AFTER_DISCONNECT and in_attempt and left <= DEADLINE_PERSIST_GRACE_SECONDS:
+                print(f"🔌 Client disconnected; provider call nearly done (~{max(left, 0):.0f}s), persisting in background")
+                continue
+            deadline.cancel()
+            task.cancel()
+            raise ClientDisconnected(stage)
+    except asyncio.CancelledError:
+        deadline.cancel()
+        task.cancel()
+        raise
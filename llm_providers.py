@@ -6,44 +6,296 @@ LLMプロバイダー抽象化レイヤー
 """
 
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Optional, List, Dict, Any, Callable, Tuple
 import os
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+import threading
+import time
+from datetime import datetime
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
+
+from circuit_breaker import get_breaker, is_transient_error, HALF_OPEN
+from deadlines import Deadline, DeadlineExceeded, DEADLINE_STAGE_SHARES, REQUEST_DEADLINE_SECONDS
 
 # ==========================================
 # 🔧 現在使用中のLLMプロバイダー設定
 # ==========================================
 # この行を変更するだけでプロバイダーを切り替え可能
-CURRENT_PROVIDER = "openai"  # "openai" または "groq"
+CURRENT_PROVIDER = "openai"  # "openai", "groq" または "local"（OpenAI互換のローカル推論サーバー）
 CURRENT_MODEL = "gpt-5-nano"
 # Groq推論モデル用の設定（openai/で始まるモデルの場合のみ使用）
 CURRENT_REASONING_EFFORT = "medium"  # "low", "medium", "high"
 CURRENT_MAX_COMPLETION_TOKENS = 8192
+# カスケードモード：まず高速な小型モデルで生成し、検証に失敗した場合のみ上記モデルで再生成
+CASCADE_FAST_PROVIDER = "groq"
+CASCADE_FAST_MODEL = "llama-3.1-8b-instant"
+# プロファイラーごとの生成パラメータ（推論量・最大トークン・温度・モデル上書き）は
+# このファイル内の GENERATION_PROFILES で設定
+# ==========================================
+
+# カスケードモードの有効化（Spotプロファイラーのみ対象）
+LLM_CASCADE_ENABLED = os.getenv("LLM_CASCADE_ENABLED", "false").lower() == "true"
+
+# OpenAI互換のローカル／セルフホスト推論サーバー（llama.cpp server、vLLM等）
+LOCAL_LLM_BASE_URL = os.getenv("LOCAL_LLM_BASE_URL", "http://localhost:8000/v1")
+LOCAL_LLM_API_KEY = os.getenv("LOCAL_LLM_API_KEY", "not-needed")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "default")
+LOCAL_LLM_TIMEOUT_SECONDS = float(os.getenv("LOCAL_LLM_TIMEOUT_SECONDS", "60"))
+LOCAL_LLM_POOL_SIZE = int(os.getenv("LOCAL_LLM_POOL_SIZE", "8"))
+LOCAL_LLM_MAX_CONCURRENCY = int(os.getenv("LOCAL_LLM_MAX_CONCURRENCY", "4"))
+# 起動後もこの間隔でヘルスチェックを再実行（サーキットが半開状態なら間隔を待たずに再確認）
+LOCAL_LLM_HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv("LOCAL_LLM_HEALTH_CHECK_INTERVAL_SECONDS", "30"))
+
+# 対応プロバイダーと、モデル未指定時のデフォルトモデル
+PROVIDER_DEFAULT_MODELS = {
+    "openai": "gpt-4o",
+    "groq": "llama-3.3-70b-versatile",
+    "local": LOCAL_LLM_MODEL,
+}
+
+# サーキットブレーカー：この秒数以上かかった呼び出しを「遅い」とみなす
+LLM_SLOW_CALL_SECONDS = float(os.getenv("LLM_SLOW_CALL_SECONDS", "45"))
+
+# 期限なしで呼ばれた場合の1回の試行のタイムアウト（デフォルト期限のllm_attempt配分と同じ）
+LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv(
+    "LLM_ATTEMPT_TIMEOUT_SECONDS",
+    str(REQUEST_DEADLINE_SECONDS * DEADLINE_STAGE_SHARES["llm_attempt"])
+))
+
+
+def retry_transient_unless_open(breaker_name: str):
+    """
+    リトライ条件：一時的なエラー（429/5xx/タイムアウト/接続エラー）のみ
+
+    4xxのバリデーションエラーはリトライしない。
+    サーキットが開いている間はリトライせずに即座に失敗させる。
+    """
+    def predicate(e: BaseException) -> bool:
+        return is_transient_error(e) and not get_breaker(breaker_name).is_open
+    return retry_if_exception(predicate)
+
+
+class GenerationProfile:
+    """
+    プロファイラーごとの生成パラメータ
+
+    全プロバイダーで同じ意味で適用される（Noneの項目はプロバイダーのデフォルト）:
+    - reasoning_effort: 推論モデル（gpt-5系、o系、openai/gpt-oss系）のみに送信
+    - max_completion_tokens: 出力トークン上限（推論トークンを含む）
+    - temperature: 推論モデルは1以外を受け付けないためNone推奨
+    - provider / model: このプロファイラーだけ別モデルを使う場合に指定
+      （providerのみ指定した場合、現在のプロバイダーならCURRENT_MODEL、
+      それ以外はそのプロバイダーのデフォルトモデルを使う）
+
+    Raises:
+        ValueError: 未知のプロバイダーが指定された場合（プロファイル定義時に検出）
+    """
+
+    def __init__(
+        self,
+        reasoning_effort: Optional[str] = None,
+        max_completion_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        provider: Optional[str] = None,
+        model: Optional[str] = None
+    ):
+        self.reasoning_effort = reasoning_effort
+        self.max_completion_tokens = max_completion_tokens
+        self.temperature = temperature
+        if provider is not None:
+            provider = provider.lower()
+            if provider not in PROVIDER_DEFAULT_MODELS:
+                raise ValueError(
+                    f"未知のプロバイダー: {provider}\n"
+                    f"対応プロバイダー: {', '.join(PROVIDER_DEFAULT_MODELS)}"
+                )
+            if model is None:
+                # 他プロバイダーのモデル名（CURRENT_MODEL）を流用しない
+                model = CURRENT_MODEL if provider == CURRENT_PROVIDER.lower() else PROVIDER_DEFAULT_MODELS[provider]
+        self.provider = provider
+        self.model = model
+
+    def describe(self, model_name: str) -> Dict[str, Any]:
+        """実際に応答したモデルに適用された値（結果テーブルに記録する用）"""
+        bare_model = model_name.split("/", 1)[1] if "/" in model_name else model_name
+        return {
+            "model": model_name,
+            "reasoning_effort": self.reasoning_effort if is_reasoning_model(bare_model) else None,
+            "max_completion_tokens": self.max_completion_tokens,
+            "temperature": self.temperature
+        }
+
+
+# ==========================================
+# 🔧 プロファイラーごとの生成プロファイル
 # ==========================================
+# spot: 短い要約なので推論を抑えて低レイテンシ優先
+# daily / weekly: バッチ処理なので推論・出力の予算を多めに
+GENERATION_PROFILES: Dict[str, GenerationProfile] = {
+    "spot": GenerationProfile(reasoning_effort="low", max_completion_tokens=4096),
+    "daily": GenerationProfile(reasoning_effort="medium", max_completion_tokens=8192),
+    "weekly": GenerationProfile(reasoning_effort="medium", max_completion_tokens=16384),
+}
+# ==========================================
+
+
+def is_reasoning_model(model: str) -> bool:
+    """reasoning_effortを受け付ける推論モデルか（プロバイダー接頭辞なしのモデル名で判定）"""
+    return model.startswith(("o1", "o3", "o4", "gpt-5", "openai/gpt-oss"))
+
+
+def generation_params(model: str, profile: Optional[GenerationProfile]) -> Dict[str, Any]:
+    """生成プロファイルをChat Completions APIのパラメータに変換（全プロバイダー共通）"""
+    params: Dict[str, Any] = {}
+    if profile is None:
+        return params
+    if profile.max_completion_tokens:
+        params["max_completion_tokens"] = profile.max_completion_tokens
+    if profile.temperature is not None:
+        params["temperature"] = profile.temperature
+    if profile.reasoning_effort and is_reasoning_model(model):
+        params["reasoning_effort"] = profile.reasoning_effort
+    return params
+
+
+def stop_at_deadline(retry_state) -> bool:
+    """リトライ停止条件：リクエストの期限内に次の試行が収まらない、またはキャンセル済み"""
+    deadline = retry_state.kwargs.get("deadline")
+    return deadline is not None and not deadline.can_start_attempt()
+
+
+def attempt_timeout_params(
+    deadline: Optional[Deadline],
+    default: float = LLM_ATTEMPT_TIMEOUT_SECONDS
+) -> Dict[str, float]:
+    """
+    1回の試行のタイムアウト（期限の配分）をSDKのtimeout引数として返す
+
+    各SDKクライアントは max_retries=0 で生成しているため、このtimeoutは
+    1回のHTTP呼び出しの上限になる（SDK内部の再試行で予算を超えることはない）。
+    期限によるキャンセルは協調的で、ワーカースレッド内のSDK呼び出しは中断できない。
+    スレッド（とディスパッチャーの枠）が解放されるのはこのtimeoutが切れたときなので、
+    期限なしの呼び出しにも必ず default を渡す。
+    """
+    if deadline is None:
+        return {"timeout": default}
+    return {"timeout": deadline.stage_timeout("llm_attempt")}
 
 
 class LLMProvider(ABC):
     """LLMプロバイダーの抽象基底クラス"""
 
+    def __init__(self):
+        # トークン使用量の累計（キャッシュヒット分を含む）
+        self._usage_lock = threading.Lock()
+        self._usage = {
+            "calls": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "completion_tokens": 0
+        }
+
     @abstractmethod
-    def generate(self, prompt: str) -> str:
+    def generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        profile: Optional[GenerationProfile] = None
+    ) -> str:
         """
         プロンプトを受け取り、LLMの応答を返す
 
         Args:
-            prompt (str): 入力プロンプト
+            prompt (str): 入力プロンプト（録音ごとの可変データ）
+            system_prompt (str, optional): 固定の指示ブロック。
+                毎回バイト単位で同一の内容を送ることでプロバイダー側のプレフィックスキャッシュが効く
+            deadline (Deadline, optional): リクエストの期限。各試行のタイムアウトに配分され、
+                期限切れ・キャンセル後はリトライしない（キーワード引数で渡すこと）
+            profile (GenerationProfile, optional): 推論量・最大トークン・温度
 
         Returns:
             str: LLMの応答テキスト
         """
         pass
 
+    def generate_once(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        profile: Optional[GenerationProfile] = None
+    ) -> str:
+        """
+        リトライなしで1回だけ生成（カスケードの高速モデル用）
+
+        一時的なエラーでもバックオフせずに即座に例外を返すため、
+        呼び出し側はすぐに別モデルへエスカレーションできる。
+        """
+        generate = type(self).generate
+        if hasattr(generate, "retry_with"):
+            generate = generate.retry_with(stop=stop_after_attempt(1))
+        return generate(self, prompt, system_prompt, deadline=deadline, profile=profile)
+
+    @staticmethod
+    def build_messages(prompt: str, system_prompt: Optional[str] = None) -> List[Dict[str, str]]:
+        """固定部分をsystemメッセージ、可変部分をuserメッセージとして組み立てる"""
+        if system_prompt:
+            return [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ]
+        return [{"role": "user", "content": prompt}]
+
+    def record_usage(self, response: Any) -> None:
+        """レスポンスのusageからトークン数（キャッシュヒット分を含む）を記録"""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+
+        with self._usage_lock:
+            self._usage["calls"] += 1
+            self._usage["prompt_tokens"] += prompt_tokens
+            self._usage["cached_tokens"] += cached_tokens
+            self._usage["completion_tokens"] += completion_tokens
+        print(f"🧮 Tokens ({self.model_name}): prompt={prompt_tokens} (cached={cached_tokens}), completion={completion_tokens}")
+
+    def usage_stats(self) -> Dict[str, Any]:
+        """トークン使用量の累計とキャッシュヒット率"""
+        with self._usage_lock:
+            stats = dict(self._usage)
+        stats["model"] = self.model_name
+        stats["cached_token_ratio"] = (
+            round(stats["cached_tokens"] / stats["prompt_tokens"], 4) if stats["prompt_tokens"] else None
+        )
+        return stats
+
     @property
     @abstractmethod
     def model_name(self) -> str:
         """使用中のモデル名を返す（プロバイダー名を含む）"""
         pass
 
+    def warmup(self) -> None:
+        """
+        起動時に接続プールを温める（TLSハンドシェイク等を事前に済ませる）
+
+        トークンを消費しない軽量なAPI呼び出しを想定。デフォルトは何もしない。
+        """
+        pass
+
+    def refresh_health(self) -> Optional[Dict[str, Any]]:
+        """
+        必要に応じてヘルスチェックを再実行し、直近の結果を返す
+
+        ヘルスチェックを持たないプロバイダー（クラウドAPI）はNone。
+        稼働状況はサーキットブレーカーで判断する。
+        """
+        return None
+
 
 class OpenAIProvider(LLMProvider):
     """OpenAI APIプロバイダー"""
@@ -56,31 +308,51 @@ class OpenAIProvider(LLMProvider):
         """
         from openai import OpenAI  # 遅延インポート
 
+        super().__init__()
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY環境変数が設定されていません")
 
-        self.client = OpenAI(api_key=api_key)
+        # SDK内蔵リトライは無効化（リトライはtenacityで分類・制御し、1回の試行=1回のHTTP呼び出しにする）
+        self.client = OpenAI(api_key=api_key, max_retries=0, timeout=LLM_ATTEMPT_TIMEOUT_SECONDS)
         self._model = model
+        self._breaker = get_breaker("openai", slow_call_seconds=LLM_SLOW_CALL_SECONDS)
 
     @retry(
-        stop=stop_after_attempt(3),
+        stop=stop_after_attempt(3) | stop_at_deadline,
         wait=wait_exponential(multiplier=1, min=4, max=10),
-        retry=retry_if_exception_type(Exception)
+        retry=retry_transient_unless_open("openai"),
+        reraise=True
     )
-    def generate(self, prompt: str) -> str:
-        """OpenAI APIを呼び出してテキスト生成（リトライ付き）"""
+    def generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        profile: Optional[GenerationProfile] = None
+    ) -> str:
+        """OpenAI APIを呼び出してテキスト生成（リトライ・サーキットブレーカー・期限付き）"""
         try:
-            response = self.client.chat.completions.create(
-                model=self._model,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            params = {
+                "model": self._model,
+                "messages": self.build_messages(prompt, system_prompt)
+            }
+            params.update(generation_params(self._model, profile))
+            params.update(attempt_timeout_params(deadline))
+
+            with self._breaker.guard():
+                response = self.client.chat.completions.create(**params)
+            self.record_usage(response)
             return response.choices[0].message.content
 
         except Exception as e:
             print(f"❌ OpenAI API呼び出しエラー: {e}")
             raise
 
+    def warmup(self) -> None:
+        """モデル一覧APIを呼び出して接続を確立（トークン消費なし）"""
+        self.client.models.list()
+
     @property
     def model_name(self) -> str:
         return f"openai/{self._model}"
@@ -105,27 +377,37 @@ class GroqProvider(LLMProvider):
         """
         from groq import Groq  # 遅延インポート
 
+        super().__init__()
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
             raise ValueError("GROQ_API_KEY環境変数が設定されていません")
 
-        self.client = Groq(api_key=api_key)
+        # SDK内蔵リトライは無効化（リトライはtenacityで分類・制御）
+        self.client = Groq(api_key=api_key, max_retries=0, timeout=LLM_ATTEMPT_TIMEOUT_SECONDS)
         self._model = model
         self._reasoning_effort = reasoning_effort
         self._max_completion_tokens = max_completion_tokens
+        self._breaker = get_breaker("groq", slow_call_seconds=LLM_SLOW_CALL_SECONDS)
 
     @retry(
-        stop=stop_after_attempt(3),
+        stop=stop_after_attempt(3) | stop_at_deadline,
         wait=wait_exponential(multiplier=1, min=4, max=10),
-        retry=retry_if_exception_type(Exception)
+        retry=retry_transient_unless_open("groq"),
+        reraise=True
     )
-    def generate(self, prompt: str) -> str:
-        """Groq APIを呼び出してテキスト生成（リトライ付き）"""
+    def generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        profile: Optional[GenerationProfile] = None
+    ) -> str:
+        """Groq APIを呼び出してテキスト生成（リトライ・サーキットブレーカー・期限付き）"""
         try:
             # 基本パラメータ
             params = {
                 "model": self._model,
-                "messages": [{"role": "user", "content": prompt}],
+                "messages": self.build_messages(prompt, system_prompt),
                 "max_completion_tokens": self._max_completion_tokens,
                 "temperature": 1,
                 "top_p": 1
@@ -135,18 +417,260 @@ class GroqProvider(LLMProvider):
             if self._model.startswith("openai/") and self._reasoning_effort:
                 params["reasoning_effort"] = self._reasoning_effort
 
-            response = self.client.chat.completions.create(**params)
+            # プロファイルが指定されていればコンストラクタのデフォルトより優先
+            params.update(generation_params(self._model, profile))
+            params.update(attempt_timeout_params(deadline))
+            with self._breaker.guard():
+                response = self.client.chat.completions.create(**params)
+            self.record_usage(response)
             return response.choices[0].message.content
 
         except Exception as e:
             print(f"❌ Groq API呼び出しエラー: {e}")
             raise
 
+    def warmup(self) -> None:
+        """モデル一覧APIを呼び出して接続を確立（トークン消費なし）"""
+        self.client.models.list()
+
     @property
     def model_name(self) -> str:
         return f"groq/{self._model}"
 
 
+class LocalOpenAICompatibleProvider(LLMProvider):
+    """
+    OpenAI互換APIを提供するローカル／セルフホスト推論サーバー用プロバイダー
+
+    同一ホストやVPC内のllama.cpp server / vLLM等を想定。
+    - base_url・タイムアウト・接続プールサイズを設定可能
+    - サーバーの処理能力に合わせた独自の同時実行数制限（セマフォ）
+    - /models を使ったヘルスチェック
+    """
+
+    def __init__(
+        self,
+        model: str = LOCAL_LLM_MODEL,
+        base_url: str = LOCAL_LLM_BASE_URL,
+        api_key: str = LOCAL_LLM_API_KEY,
+        timeout: float = LOCAL_LLM_TIMEOUT_SECONDS,
+        pool_size: int = LOCAL_LLM_POOL_SIZE,
+        max_concurrency: int = LOCAL_LLM_MAX_CONCURRENCY
+    ):
+        """
+        Args:
+            model (str): サーバーに渡すモデル名（llama.cpp serverでは任意の値で可）
+            base_url (str): OpenAI互換APIのベースURL（例: "http://localhost:8000/v1"）
+            api_key (str): サーバーが認証を要求する場合のキー
+            timeout (float): 1回の呼び出しのタイムアウト（秒）
+            pool_size (int): HTTP接続プールの最大接続数
+            max_concurrency (int): サーバーへ同時に送るリクエスト数の上限
+        """
+        import httpx  # 遅延インポート
+        from openai import OpenAI
+
+        super().__init__()
+        self._base_url = base_url.rstrip("/")
+        self._model = model
+        self._max_concurrency = max_concurrency
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._last_health: Dict[str, Any] = {"healthy": None, "checked_at": None, "latency_seconds": None, "error": None}
+        self._last_health_at: Optional[float] = None
+
+        self.client = OpenAI(
+            api_key=api_key,
+            base_url=self._base_url,
+            timeout=timeout,
+            max_retries=0,  # リトライはtenacityで制御
+            http_client=httpx.Client(
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+            )
+        )
+        self._timeout = timeout
+        self._breaker = get_breaker("local", slow_call_seconds=LLM_SLOW_CALL_SECONDS)
+
+    @retry(
+        stop=stop_after_attempt(3) | stop_at_deadline,
+        wait=wait_exponential(multiplier=1, min=1, max=4),
+        retry=retry_transient_unless_open("local"),
+        reraise=True
+    )
+    def generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        profile: Optional[GenerationProfile] = None
+    ) -> str:
+        """ローカル推論サーバーを呼び出してテキスト生成（同時実行数制限・リトライ・期限付き）"""
+        try:
+            params = {
+                "model": self._model,
+                "messages": self.build_messages(prompt, system_prompt)
+            }
+            params.update(generation_params(self._model, profile))
+            budget = attempt_timeout_params(deadline, self._timeout)["timeout"]
+
+            # 同時実行数の上限に達している場合は空きを待つ（待ち時間も1回の試行の予算に含める）
+            wait_started = time.monotonic()
+            if not self._semaphore.acquire(timeout=budget):
+                raise TimeoutError(f"ローカルLLMの同時実行枠を{budget:.0f}秒以内に確保できませんでした")
+            try:
+                # SDKには待ち時間を差し引いた残りの予算を渡す
+                params["timeout"] = max(0.001, budget - (time.monotonic() - wait_started))
+                with self._in_flight_lock:
+                    self._in_flight += 1
+                with self._breaker.guard():
+                    response = self.client.chat.completions.create(**params)
+            finally:
+                with self._in_flight_lock:
+                    self._in_flight -= 1
+                self._semaphore.release()
+
+            self.record_usage(response)
+            return response.choices[0].message.content
+
+        except Exception as e:
+            print(f"❌ ローカルLLM呼び出しエラー ({self._base_url}): {e}")
+            raise
+
+    def health_check(self) -> Dict[str, Any]:
+        """
+        /models を呼び出してサーバーの稼働を確認（トークン消費なし）
+
+        Returns:
+            Dict[str, Any]: healthy, checked_at, latency_seconds, error
+        """
+        started = time.monotonic()
+        try:
+            self.client.models.list()
+            self._last_health = {"healthy": True, "error": None}
+        except Exception as e:
+            self._last_health = {"healthy": False, "error": f"{type(e).__name__}: {e}"}
+        self._last_health["checked_at"] = datetime.now().isoformat()
+        self._last_health["latency_seconds"] = round(time.monotonic() - started, 3)
+        self._last_health_at = time.monotonic()
+        return dict(self._last_health)
+
+    def health_check_due(self) -> bool:
+        """未確認・前回から LOCAL_LLM_HEALTH_CHECK_INTERVAL_SECONDS 経過・サーキット半開のいずれか"""
+        if self._last_health_at is None or self._breaker.state == HALF_OPEN:
+            return True
+        return time.monotonic() - self._last_health_at >= LOCAL_LLM_HEALTH_CHECK_INTERVAL_SECONDS
+
+    def refresh_health(self) -> Optional[Dict[str, Any]]:
+        """期限が来ていればヘルスチェックを再実行（起動後にサーバーが落ちた場合も検知する）"""
+        if self.health_check_due():
+            return self.health_check()
+        return dict(self._last_health)
+
+    def warmup(self) -> None:
+        """ヘルスチェックで接続を確立（失敗した場合は例外を送出してウォームアップを再試行させる）"""
+        health = self.health_check()
+        if not health["healthy"]:
+            raise ConnectionError(f"ローカルLLMサーバーに接続できません ({self._base_url}): {health['error']}")
+
+    def usage_stats(self) -> Dict[str, Any]:
+        """トークン使用量に加えて同時実行数と直近のヘルスチェック結果"""
+        stats = super().usage_stats()
+        stats["base_url"] = self._base_url
+        stats["in_flight"] = self._in_flight
+        stats["max_concurrency"] = self._max_concurrency
+        stats["health"] = dict(self._last_health)
+        return stats
+
+    @property
+    def model_name(self) -> str:
+        return f"local/{self._model}"
+
+
+class ModelCascade:
+    """
+    モデルカスケード：高速モデル → 検証 → 失敗時のみ高性能モデルへエスカレーション
+
+    無音や短い挨拶など大半の録音は小型モデルで十分なため、
+    出力が検証を通ればそのまま採用し、通らなかった場合だけ高性能モデルで再生成する。
+    """
+
+    def __init__(self, fast: LLMProvider, strong: LLMProvider):
+        self.fast = fast
+        self.strong = strong
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._fast_accepted = 0
+        self._escalations: Dict[str, int] = {}
+
+    def generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        validate: Optional[Callable[[str], Optional[str]]] = None,
+        deadline: Optional[Deadline] = None,
+        profile: Optional[GenerationProfile] = None,
+        strong: Optional[LLMProvider] = None
+    ) -> Tuple[str, str]:
+        """
+        高速モデルで生成し、検証に失敗した場合は高性能モデルで再生成
+
+        高速モデルはリトライせず1回だけ呼び出し、エラー（一時的なものを含む）は
+        即座にエスカレーション理由として扱う。リトライは高性能モデル側でのみ行う。
+
+        Args:
+            prompt (str): 入力プロンプト（可変部分）
+            system_prompt (str, optional): 固定の指示ブロック
+            validate (Callable, optional): 応答テキストを受け取り、問題なければNone、
+                問題があればエスカレーション理由（例: "vibe_score_out_of_range"）を返す関数
+            deadline (Deadline, optional): リクエストの期限（両モデルの呼び出しで共有）
+            profile (GenerationProfile, optional): 生成パラメータ（両モデルに適用）
+            strong (LLMProvider, optional): エスカレーション先（プロファイルのモデル上書き用）
+
+        Returns:
+            Tuple[str, str]: (応答テキスト, 実際に応答したモデル名)
+        """
+        with self._lock:
+            self._calls += 1
+
+        try:
+            # 高速モデルは1回のみ（一時エラーでもバックオフせず即エスカレーション）
+            raw_response = self.fast.generate_once(prompt, system_prompt, deadline=deadline, profile=profile)
+            reason = validate(raw_response) if validate else None
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            reason = f"fast_error:{type(e).__name__}"
+
+        if reason is None:
+            with self._lock:
+                self._fast_accepted += 1
+            return raw_response, self.fast.model_name
+
+        strong = strong or self.strong
+        with self._lock:
+            self._escalations[reason] = self._escalations.get(reason, 0) + 1
+        print(f"⤴️ Cascade escalation ({self.fast.model_name} → {strong.model_name}): {reason}")
+        if deadline is not None and not deadline.can_start_attempt():
+            raise DeadlineExceeded("llm_attempt", deadline.total)
+        return strong.generate(prompt, system_prompt, deadline=deadline, profile=profile), strong.model_name
+
+    def stats(self) -> Dict[str, Any]:
+        """高速モデルでの完了率とエスカレーション理由の内訳"""
+        with self._lock:
+            escalated = sum(self._escalations.values())
+            return {
+                "fast_model": self.fast.model_name,
+                "strong_model": self.strong.model_name,
+                "calls": self._calls,
+                "fast_accepted": self._fast_accepted,
+                "escalated": escalated,
+                "escalation_rate": round(escalated / self._calls, 4) if self._calls else None,
+                "escalation_reasons": dict(self._escalations),
+                "fast_usage": self.fast.usage_stats()
+            }
+
+
 class LLMFactory:
     """LLMプロバイダーのファクトリークラス"""
 
@@ -156,7 +680,7 @@ class LLMFactory:
         指定されたプロバイダーとモデルでLLMProviderインスタンスを作成
 
         Args:
-            provider (str): プロバイダー名 ("openai", "groq")
+            provider (str): プロバイダー名 ("openai", "groq", "local")
             model (str, optional): モデル名。Noneの場合はデフォルトを使用
 
         Returns:
@@ -167,19 +691,22 @@ class LLMFactory:
         """
         provider = provider.lower()
 
+        if provider not in PROVIDER_DEFAULT_MODELS:
+            raise ValueError(
+                f"未知のプロバイダー: {provider}\n"
+                f"対応プロバイダー: {', '.join(PROVIDER_DEFAULT_MODELS)}"
+            )
+        model = model or PROVIDER_DEFAULT_MODELS[provider]
+
         if provider == "openai":
-            default_model = "gpt-4o"
-            return OpenAIProvider(model or default_model)
+            return OpenAIProvider(model)
 
         elif provider == "groq":
-            default_model = "llama-3.3-70b-versatile"
-            return GroqProvider(model or default_model)
+            return GroqProvider(model)
 
         else:
-            raise ValueError(
-                f"未知のプロバイダー: {provider}\n"
-                f"対応プロバイダー: openai, groq"
-            )
+            # 接続先・タイムアウト・プールサイズ・同時実行数は LOCAL_LLM_* 環境変数で設定
+            return LocalOpenAICompatibleProvider(model)
 
     @staticmethod
     def get_current() -> LLMProvider:
@@ -205,7 +732,93 @@ class LLMFactory:
             return LLMFactory.create(CURRENT_PROVIDER, CURRENT_MODEL)
 
 
+# プロセス内で再利用するプロバイダーインスタンス（SDKクライアントの接続プールを維持）
+_current_llm: Optional[LLMProvider] = None
+_current_llm_lock = threading.Lock()
+
+
 # 便利な関数：現在のLLMを取得
 def get_current_llm() -> LLMProvider:
-    """現在設定されているLLMプロバイダーを取得（エイリアス）"""
-    return LLMFactory.get_current()
+    """
+    現在設定されているLLMプロバイダーを取得
+
+    初回呼び出し時にインスタンスを生成し、以降は同じインスタンスを返す。
+    リクエストごとにクライアントを作り直さないため、接続プールが維持される。
+    """
+    global _current_llm
+    if _current_llm is None:
+        with _current_llm_lock:
+            if _current_llm is None:
+                _current_llm = LLMFactory.get_current()
+    return _current_llm
+
+
+_override_llms: Dict[Tuple[str, str], LLMProvider] = {}
+
+
+def get_llm_for_profile(profile: Optional[GenerationProfile]) -> LLMProvider:
+    """
+    プロファイルのモデル上書きに対応するプロバイダーを取得（上書きなしなら現在のLLM）
+
+    上書きモデルのインスタンスも (provider, model) ごとに1つだけ生成して再利用する。
+    """
+    if profile is None or not (profile.provider or profile.model):
+        return get_current_llm()
+    key = ((profile.provider or CURRENT_PROVIDER).lower(), profile.model or CURRENT_MODEL)
+    if key == (CURRENT_PROVIDER.lower(), CURRENT_MODEL):
+        return get_current_llm()
+    llm = _override_llms.get(key)
+    if llm is None:
+        with _current_llm_lock:
+            llm = _override_llms.get(key)
+            if llm is None:
+                print(f"🤖 プロファイル用LLMプロバイダー: {key[0]}/{key[1]}")
+                llm = LLMFactory.create(*key)
+                _override_llms[key] = llm
+    return llm
+
+
+_model_cascade: Optional[ModelCascade] = None
+
+
+def get_model_cascade() -> ModelCascade:
+    """
+    カスケード（CASCADE_FAST_PROVIDER/CASCADE_FAST_MODEL → 現在のLLM）を取得
+
+    get_current_llm()と同様に初回のみ生成し、以降は同じインスタンスを返す。
+    """
+    global _model_cascade
+    if _model_cascade is None:
+        strong = get_current_llm()
+        with _current_llm_lock:
+            if _model_cascade is None:
+                print(f"🤖 カスケード高速モデル: {CASCADE_FAST_PROVIDER}/{CASCADE_FAST_MODEL}")
+                fast = LLMFactory.create(CASCADE_FAST_PROVIDER, CASCADE_FAST_MODEL)
+                _model_cascade = ModelCascade(fast, strong)
+    return _model_cascade
+
+
+def profile_provider(profiler_type: str) -> str:
+    """
+    プロファイラーが実際に呼び出すプロバイダー名（サーキットブレーカー名と同じ）
+
+    プロファイルのプロバイダー上書きがあればそれ、なければ CURRENT_PROVIDER。
+    カスケードの高速モデルは含めない（失敗時は現在のモデルへエスカレーションするため）。
+    """
+    profile = GENERATION_PROFILES.get(profiler_type)
+    return (profile.provider if profile and profile.provider else CURRENT_PROVIDER).lower()
+
+
+def built_llm_providers() -> List[LLMProvider]:
+    """
+    生成済みのプロバイダーインスタンス一覧（現在のLLM・プロファイル上書き・カスケード高速モデル）
+
+    まだ生成されていないものは含めない（メトリクス取得でクライアントを作らないため）。
+    """
+    providers: List[LLMProvider] = []
+    if _current_llm is not None:
+        providers.append(_current_llm)
+    providers.extend(_override_llms.values())
+    if _model_cascade is not None:
+        providers.append(_model_cascade.fast)
+    return providers
@@ -0,0 +1,227 @@
+"""
+Priority-aware LLM dispatch scheduler
+
+All LLM calls go through LLMDispatcher so that heavy batch work (daily,
+weekly, backfill) cannot starve near-real-time spot analysis:
+
+- Priority classes: spot > daily > weekly > backfill
+- Global concurrency cap plus a per-class cap
+- Aging: a waiter's effective rank improves by 1 every `aging_seconds`,
+  so low-priority work is eventually dispatched under sustained spot load
+- Queue depth / wait time / service time metrics per class, and a
+  queue wait estimate used by admission control
+
+Provider SDK calls are blocking, so they run on a dedicated thread pool
+sized to the global cap; the event loop stays free while they run.
+"""
+
+import asyncio
+import functools
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+PRIORITY_SPOT = "spot"
+PRIORITY_DAILY = "daily"
+PRIORITY_WEEKLY = "weekly"
+PRIORITY_BACKFILL = "backfill"
+
+# Lower rank = dispatched first
+PRIORITY_RANKS = {
+    PRIORITY_SPOT: 0,
+    PRIORITY_DAILY: 1,
+    PRIORITY_WEEKLY: 2,
+    PRIORITY_BACKFILL: 3,
+}
+
+
+class _Waiter:
+    __slots__ = ("priority", "rank", "enqueued_at", "future")
+
+    def __init__(self, priority: str, future: "asyncio.Future[None]"):
+        self.priority = priority
+        self.rank = PRIORITY_RANKS[priority]
+        self.enqueued_at = time.monotonic()
+        self.future = future
+
+
+class _ClassStats:
+    __slots__ = ("submitted", "dispatched", "completed", "failed", "wait_total", "wait_max", "recent_waits", "recent_service")
+
+    def __init__(self):
+        self.submitted = 0
+        self.dispatched = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.recent_waits = deque(maxlen=200)
+        self.recent_service = deque(maxlen=200)
+
+
+class LLMDispatcher:
+    """Schedules blocking LLM calls by priority class with per-class concurrency caps"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        class_limits: Optional[Dict[str, int]] = None,
+        aging_seconds: float = 30.0
+    ):
+        """
+        Args:
+            max_concurrency: Max LLM calls in flight across all classes
+            class_limits: Max calls in flight per class (default: max_concurrency)
+            aging_seconds: Seconds of waiting that promote a waiter by one priority rank
+        """
+        self.max_concurrency = max_concurrency
+        self.class_limits = {priority: max_concurrency for priority in PRIORITY_RANKS}
+        if class_limits:
+            self.class_limits.update(class_limits)
+        self.aging_seconds = aging_seconds
+
+        self._waiters: List[_Waiter] = []
+        self._running = {priority: 0 for priority in PRIORITY_RANKS}
+        self._total_running = 0
+        self._stats = {priority: _ClassStats() for priority in PRIORITY_RANKS}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def run(self, priority: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Wait for a slot in the given priority class, then run fn(*args, **kwargs) in a worker thread
+
+        The slot is released when the thread finishes, even if the caller is cancelled.
+        """
+        if priority not in PRIORITY_RANKS:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        stats = self._stats[priority]
+        stats.submitted += 1
+        wait_started = time.monotonic()
+        await self._acquire(priority)
+        waited = time.monotonic() - wait_started
+        stats.dispatched += 1
+        stats.wait_total += waited
+        stats.wait_max = max(stats.wait_max, waited)
+        stats.recent_waits.append(waited)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm")
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        future = loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        future.add_done_callback(lambda f: self._on_finished(priority, f, time.monotonic() - started))
+        # shield: cancelling the caller must not release the slot while the thread still runs
+        return await asyncio.shield(future)
+
+    async def _acquire(self, priority: str) -> None:
+        waiter = _Waiter(priority, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Slot was granted just before cancellation
+                self._release(priority)
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def _effective_rank(self, waiter: _Waiter, now: float) -> float:
+        return waiter.rank - (now - waiter.enqueued_at) / self.aging_seconds
+
+    def _dispatch(self) -> None:
+        """Grant free slots to the best eligible waiters (FIFO within equal effective rank)"""
+        now = time.monotonic()
+        while self._total_running < self.max_concurrency:
+            best = None
+            best_rank = None
+            for waiter in self._waiters:
+                if waiter.future.done():
+                    continue
+                if self._running[waiter.priority] >= self.class_limits[waiter.priority]:
+                    continue
+                rank = self._effective_rank(waiter, now)
+                if best is None or rank < best_rank:
+                    best = waiter
+                    best_rank = rank
+            if best is None:
+                break
+            self._waiters.remove(best)
+            self._running[best.priority] += 1
+            self._total_running += 1
+            best.future.set_result(None)
+
+    def _release(self, priority: str) -> None:
+        self._running[priority] -= 1
+        self._total_running -= 1
+        self._dispatch()
+
+    def _on_finished(self, priority: str, future: "asyncio.Future[Any]", elapsed: float) -> None:
+        stats = self._stats[priority]
+        if future.cancelled() or future.exception() is not None:
+            stats.failed += 1
+        else:
+            stats.completed += 1
+            stats.recent_service.append(elapsed)
+        self._release(priority)
+
+    def queue_depth(self, priority: Optional[str] = None) -> int:
+        """Number of waiting calls (all classes, or one class)"""
+        return sum(
+            1 for waiter in self._waiters
+            if not waiter.future.done() and (priority is None or waiter.priority == priority)
+        )
+
+    def service_seconds(self, priority: str) -> Optional[float]:
+        """Average duration of recent successful calls in a class (None before the first one)"""
+        recent = self._stats[priority].recent_service
+        return sum(recent) / len(recent) if recent else None
+
+    def estimate_wait(self, priority: str, default_service_seconds: float) -> float:
+        """
+        Estimate how long a call submitted now would wait for a slot
+
+        Waiters of the same or higher priority are dispatched first; they
+        drain at the class's effective concurrency, each taking the class's
+        recent average service time. Aging is ignored (pessimistic for
+        low classes, which is acceptable for admission decisions).
+        """
+        rank = PRIORITY_RANKS[priority]
+        ahead = sum(
+            1 for waiter in self._waiters
+            if not waiter.future.done() and waiter.rank <= rank
+        )
+        slots = min(self.max_concurrency, self.class_limits[priority])
+        if ahead == 0 and self._total_running < self.max_concurrency and self._running[priority] < slots:
+            return 0.0
+        service = self.service_seconds(priority) or default_service_seconds
+        return (ahead + 1) * service / slots
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, running count and wait-time metrics per priority class"""
+        classes = {}
+        for priority, stats in self._stats.items():
+            recent = sorted(stats.recent_waits)
+            classes[priority] = {
+                "queued": self.queue_depth(priority),
+                "running": self._running[priority],
+                "limit": self.class_limits[priority],
+                "submitted": stats.submitted,
+                "completed": stats.completed,
+                "failed": stats.failed,
+                "wait_avg_seconds": round(stats.wait_total / stats.dispatched, 3) if stats.dispatched else 0.0,
+                "wait_max_seconds": round(stats.wait_max, 3),
+                "wait_p95_seconds": round(recent[math.ceil(len(recent) * 0.95) - 1], 3) if recent else 0.0,
+                "service_avg_seconds": round(self.service_seconds(priority) or 0.0, 3),
+            }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self._total_running,
+            "queued": self.queue_depth(),
+            "aging_seconds": self.aging_seconds,
+            "classes": classes
+        }
@@ -1,12 +1,18 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 import os
 import json
 import re
-from datetime import datetime
-from typing import Dict, Any
+import math
+import asyncio
+import threading
+import traceback
+from datetime import datetime, timezone
+from typing import Dict, Any, Literal, Optional, Callable, Tuple
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
 # Load environment variables
 load_dotenv()
@@ -15,10 +21,164 @@ load_dotenv()
 from supabase_client import SupabaseClient
 
 # Import LLM provider
-from llm_providers import get_current_llm, CURRENT_PROVIDER, CURRENT_MODEL
+from llm_providers import (
+    get_current_llm, get_llm_for_profile, get_model_cascade, profile_provider, built_llm_providers,
+    GENERATION_PROFILES, LLM_CASCADE_ENABLED, CURRENT_PROVIDER, CURRENT_MODEL
+)
+
+# Import daily vibe analytics
+from vibe_analytics import extract_vibe_points, compute_daily_vibe_analytics
+
+# Import result cache (read API)
+from result_cache import ResultCache, CacheKey, etag_matches
+
+# Import prompt template registry (static prefix → system message)
+from prompt_templates import PromptTemplateRegistry
+
+# Import circuit breakers
+from circuit_breaker import CircuitOpenError, all_breaker_stats
+
+# Import LLM dispatch scheduler
+from llm_scheduler import LLMDispatcher, PRIORITY_SPOT, PRIORITY_DAILY, PRIORITY_WEEKLY, PRIORITY_BACKFILL
+
+# Import admission control (load shedding)
+from admission_control import AdmissionController, AdmissionRejected, ADMISSION_DEFAULT_LLM_SECONDS
+
+# Import request deadlines (per-stage budgets, cancellation on disconnect)
+from deadlines import Deadline, DeadlineExceeded, ClientDisconnected, run_stage, watch_client
+
+# Import profiler pipeline engine
+from profiler_pipeline import ProfilerPipeline, Stage, PipelineContext, StageFunction
+
+# Import spot shortcuts (no-speech fast path, near-duplicate reuse)
+from spot_shortcuts import SpotShortcuts, PromptSignature
+
+# Import background re-drive of rate_limited / failed spot rows
+from spot_redrive import SpotRedriveSweeper, SPOT_REDRIVE_ENABLED, SPOT_REDRIVE_IN_PROCESS
+
+# Response settings
+# DEFAULT_RESPONSE_MODE: "full" echoes analysis_result (existing API contract),
+# "minimal" returns status and keys only (Lambda callers send response_mode="minimal")
+DEFAULT_RESPONSE_MODE = os.getenv("DEFAULT_RESPONSE_MODE", "full")
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))  # bytes
+
+# Result columns added by migrations (README): written only once enabled, so upserts
+# keep working against tables where the migration has not run yet
+STORE_DAILY_VIBE_ANALYTICS = os.getenv("STORE_DAILY_VIBE_ANALYTICS", "false").lower() == "true"
+STORE_GENERATION_PROFILE = os.getenv("STORE_GENERATION_PROFILE", "false").lower() == "true"
+
+# Result cache settings (GET /spot-results, /daily-results, /weekly-results)
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "5000"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "300"))
+
+# LLM dispatch settings (priority: spot > daily > weekly > backfill)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_CONCURRENCY_LIMITS = {
+    PRIORITY_SPOT: int(os.getenv("LLM_CONCURRENCY_SPOT", "8")),
+    PRIORITY_DAILY: int(os.getenv("LLM_CONCURRENCY_DAILY", "3")),
+    PRIORITY_WEEKLY: int(os.getenv("LLM_CONCURRENCY_WEEKLY", "2")),
+    PRIORITY_BACKFILL: int(os.getenv("LLM_CONCURRENCY_BACKFILL", "1")),
+}
+LLM_PRIORITY_AGING_SECONDS = float(os.getenv("LLM_PRIORITY_AGING_SECONDS", "30"))
+
+# Model cascade settings (LLM_CASCADE_ENABLED in llm_providers.py)
+# A fast-model spot result with a "confidence" field below this value is escalated
+LLM_CASCADE_MIN_CONFIDENCE = float(os.getenv("LLM_CASCADE_MIN_CONFIDENCE", "0.5"))
+
+app = FastAPI(title="Profiler API", version="1.0.0", default_response_class=ORJSONResponse)
+
+@app.exception_handler(HTTPException)
+async def http_exception_handler(request: Request, exc: HTTPException):
+    """Serialize HTTPException with orjson (same format as FastAPI default)"""
+    return ORJSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers=getattr(exc, "headers", None)
+    )
+
+# Startup warm-up settings
+# WARMUP_PING_DEPENDENCIES: issue a cheap call to Supabase/LLM provider on startup
+# so TLS handshakes and connection pools are ready before the first real request
+WARMUP_PING_DEPENDENCIES = os.getenv("WARMUP_PING_DEPENDENCIES", "true").lower() == "true"
+WARMUP_RETRY_INTERVAL_SECONDS = float(os.getenv("WARMUP_RETRY_INTERVAL_SECONDS", "5"))
+
+# Lazy initialization of Supabase client
+supabase_client = None
+_supabase_client_lock = threading.Lock()
+
+def get_supabase_client():
+    """Lazy initialize and get Supabase client"""
+    global supabase_client
+    if supabase_client is None:
+        with _supabase_client_lock:
+            if supabase_client is None:
+                try:
+                    supabase_client = SupabaseClient()
+                    print("✅ Supabase client initialized successfully")
+                except Exception as e:
+                    print(f"❌ Failed to initialize Supabase client: {e}")
+                    raise e
+    return supabase_client
 
-app = FastAPI(title="Profiler API", version="1.0.0")
 
+# In-process LRU of saved results, populated by the POST profiler endpoints
+result_cache = ResultCache(max_entries=RESULT_CACHE_MAX_ENTRIES, ttl_seconds=RESULT_CACHE_TTL_SECONDS)
+
+
+# Priority scheduler in front of the LLM layer
+llm_dispatcher = LLMDispatcher(
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    class_limits=LLM_CONCURRENCY_LIMITS,
+    aging_seconds=LLM_PRIORITY_AGING_SECONDS
+)
+
+
+# Load shedding in front of the profiler endpoints (in-flight, queue wait, provider budget)
+# Each class is gated only on what it calls: its profile's LLM provider (re-drives run the spot
+# pipeline) plus Supabase. The cascade fast model is left out: it already falls back on failure.
+ADMISSION_DEPENDENCIES = {
+    PRIORITY_SPOT: [profile_provider("spot"), "supabase"],
+    PRIORITY_DAILY: [profile_provider("daily"), "supabase"],
+    PRIORITY_WEEKLY: [profile_provider("weekly"), "supabase"],
+    PRIORITY_BACKFILL: [profile_provider("spot"), "supabase"],
+}
+admission_controller = AdmissionController(llm_dispatcher, dependencies=ADMISSION_DEPENDENCIES)
+ADMISSION_PRIORITIES = {
+    "/spot-profiler": PRIORITY_SPOT,
+    "/daily-profiler": PRIORITY_DAILY,
+    "/weekly-profiler": PRIORITY_WEEKLY,
+}
+
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    """Shed profiler requests with 429/503 + Retry-After when they cannot finish in time"""
+    priority = ADMISSION_PRIORITIES.get(request.url.path) if request.method == "POST" else None
+    if priority is None:
+        return await call_next(request)
+
+    try:
+        admission_controller.admit(priority, Deadline.from_headers(request.headers).total)
+    except AdmissionRejected as e:
+        return ORJSONResponse(
+            status_code=e.status_code,
+            content={"detail": {
+                "message": str(e),
+                "error_details": {
+                    "error_type": type(e).__name__,
+                    "error_message": e.reason
+                }
+            }},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    try:
+        return await call_next(request)
+    finally:
+        admission_controller.release(priority)
+
+
+# Middleware added later wraps earlier ones: registering CORS after admission control
+# keeps it outermost, so 429/503 shed responses still carry CORS headers
 # CORS settings
 app.add_middleware(
     CORSMiddleware,
@@ -28,38 +188,183 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Lazy initialization of Supabase client
-supabase_client = None
-
-def get_supabase_client():
-    """Lazy initialize and get Supabase client"""
-    global supabase_client
-    if supabase_client is None:
+# Compress large responses (full analysis results, etc.)
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+
+
+# Static instruction prefix per profiler type (provider-side prompt caching)
+prompt_templates = PromptTemplateRegistry()
+
+# Per-device near-duplicate index and no-speech rule for spot prompts (SPOT_SHORTCUT_MODE)
+spot_shortcuts = SpotShortcuts()
+
+
+# Readiness state (/health = liveness, /ready = readiness)
+readiness = {
+    "ready": False,
+    "supabase": False,
+    "llm": False,
+    "last_error": None,
+    "started_at": datetime.now().isoformat(),
+    "ready_at": None,
+    "llm_health": {}
+}
+_warmup_task = None
+_llm_health_task = None
+
+
+def warm_up_dependencies():
+    """Create Supabase and LLM clients and open their connection pools (blocking)"""
+    supabase = get_supabase_client()
+    if WARMUP_PING_DEPENDENCIES:
+        supabase.ping()
+    readiness["supabase"] = True
+    print("  ✅ Supabase connection warmed up")
+
+    llm = get_current_llm()
+    if WARMUP_PING_DEPENDENCIES:
+        llm.warmup()
+    if LLM_CASCADE_ENABLED:
+        cascade = get_model_cascade()
+        if WARMUP_PING_DEPENDENCIES:
+            cascade.fast.warmup()
+        print(f"  ✅ Cascade fast model warmed up ({cascade.fast.model_name})")
+    for profiler_type, profile in GENERATION_PROFILES.items():
+        profile_llm = get_llm_for_profile(profile)
+        if profile_llm is not llm:
+            if WARMUP_PING_DEPENDENCIES:
+                profile_llm.warmup()
+            print(f"  ✅ {profiler_type} profile model warmed up ({profile_llm.model_name})")
+    readiness["llm"] = True
+    print(f"  ✅ LLM provider warmed up ({llm.model_name})")
+
+
+async def warm_up_until_ready():
+    """Run warm-up in a worker thread, retrying until all dependencies are live"""
+    while not readiness["ready"]:
         try:
-            supabase_client = SupabaseClient()
-            print("✅ Supabase client initialized successfully")
+            print("🔥 Warming up dependencies...")
+            await asyncio.to_thread(warm_up_dependencies)
+            readiness["ready"] = True
+            readiness["last_error"] = None
+            readiness["ready_at"] = datetime.now().isoformat()
+            print("✅ Profiler API is ready")
         except Exception as e:
-            print(f"❌ Failed to initialize Supabase client: {e}")
-            raise e
-    return supabase_client
+            readiness["last_error"] = f"{type(e).__name__}: {e}"
+            print(f"⚠️ Warm-up failed, retrying in {WARMUP_RETRY_INTERVAL_SECONDS}s: {e}")
+            await asyncio.sleep(WARMUP_RETRY_INTERVAL_SECONDS)
+
+
+async def monitor_llm_health():
+    """
+    Re-run provider health checks after warm-up (local inference servers only)
+
+    Each provider decides when a check is due (LOCAL_LLM_HEALTH_CHECK_INTERVAL_SECONDS,
+    or immediately while its circuit is half-open); a failed check makes /ready return 503.
+    """
+    while not readiness["ready"]:
+        await asyncio.sleep(WARMUP_RETRY_INTERVAL_SECONDS)
+    while True:
+        for llm in built_llm_providers():
+            health = await asyncio.to_thread(llm.refresh_health)
+            if health is None:
+                continue
+            if health["healthy"] is False and readiness["llm_health"].get(llm.model_name) is not False:
+                print(f"⚠️ LLM health check failed ({llm.model_name}): {health['error']}")
+            elif health["healthy"] and readiness["llm_health"].get(llm.model_name) is False:
+                print(f"✅ LLM health check recovered ({llm.model_name})")
+            readiness["llm_health"][llm.model_name] = health["healthy"]
+        await asyncio.sleep(WARMUP_RETRY_INTERVAL_SECONDS)
+
+
+@app.on_event("startup")
+async def start_warm_up():
+    """Start warm-up (and the LLM health monitor) in the background so /health answers immediately"""
+    global _warmup_task, _llm_health_task
+    _warmup_task = asyncio.create_task(warm_up_until_ready())
+    _llm_health_task = asyncio.create_task(monitor_llm_health())
+
+
+@app.on_event("shutdown")
+async def stop_llm_health_monitor():
+    """Stop the LLM health monitor"""
+    if _llm_health_task is not None:
+        _llm_health_task.cancel()
+        await asyncio.gather(_llm_health_task, return_exceptions=True)
 
 
 class SpotProfilerRequest(BaseModel):
     """Spot profiler analysis request"""
     device_id: str
     recorded_at: str  # UTC timestamp (ISO 8601 format)
+    response_mode: Literal["minimal", "full"] = DEFAULT_RESPONSE_MODE
 
 
 class DailyProfilerRequest(BaseModel):
     """Daily profiler analysis request"""
     device_id: str
     local_date: str  # YYYY-MM-DD format
+    response_mode: Literal["minimal", "full"] = DEFAULT_RESPONSE_MODE
 
 
 class WeeklyProfilerRequest(BaseModel):
     """Weekly profiler analysis request"""
     device_id: str
     week_start_date: str  # YYYY-MM-DD format (Monday)
+    response_mode: Literal["minimal", "full"] = DEFAULT_RESPONSE_MODE
+
+
+def build_profiler_response(response_mode: str, body: Dict[str, Any], analysis_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Build endpoint response; analysis_result is only echoed in "full" mode"""
+    if response_mode == "full":
+        body["analysis_result"] = analysis_result
+    return body
+
+
+def circuit_open_http_exception(e: CircuitOpenError) -> HTTPException:
+    """Fail fast with 503 + Retry-After while a dependency's circuit is open"""
+    print(f"⛔ Fail fast: {e}")
+    return HTTPException(
+        status_code=503,
+        detail={
+            "message": f"Dependency temporarily unavailable: {e.name}",
+            "error_details": {
+                "error_type": type(e).__name__,
+                "error_message": str(e)
+            }
+        },
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+    )
+
+
+def request_deadline(http_request: Optional[Request]) -> Deadline:
+    """Deadline from X-Request-Deadline (calls without an HTTP request, e.g. the queue consumer, get the default)"""
+    return Deadline.from_headers(http_request.headers if http_request is not None else None)
+
+
+def deadline_http_exception(e: Exception) -> HTTPException:
+    """504 when the deadline passed, 499 (client closed request) when the caller went away"""
+    print(f"⏱️ Request abandoned: {e}")
+    return HTTPException(
+        status_code=504 if isinstance(e, DeadlineExceeded) else 499,
+        detail={
+            "message": str(e),
+            "error_details": {
+                "error_type": type(e).__name__,
+                "error_message": str(e)
+            }
+        }
+    )
+
+
+def log_error_details(endpoint: str, e: Exception) -> Dict[str, Any]:
+    """Print full traceback to logs and return error details safe for the response body"""
+    print(f"❌ ERROR in {endpoint}: {type(e).__name__}: {e}")
+    print(traceback.format_exc())
+    return {
+        "error_type": type(e).__name__,
+        "error_message": str(e)
+    }
 
 
 def extract_json_from_response(raw_response: str) -> Dict[str, Any]:
@@ -97,25 +402,155 @@ def extract_json_from_response(raw_response: str) -> Dict[str, Any]:
         }
 
 
-async def call_llm_with_retry(prompt: str) -> Dict[str, Any]:
-    """Call LLM with retry functionality (provider abstraction)"""
+def validate_spot_result(raw_response: str) -> Optional[str]:
+    """
+    Cascade check for a fast-model spot result
+
+    Returns:
+        None if the result is acceptable, otherwise the escalation reason
+    """
+    result = extract_json_from_response(raw_response)
+    if not isinstance(result, dict) or 'processing_error' in result:
+        return "invalid_json"
+
+    vibe_score = result.get('vibe_score')
+    if isinstance(vibe_score, bool) or not isinstance(vibe_score, (int, float)):
+        return "missing_vibe_score"
+    if not -100 <= vibe_score <= 100:
+        return "vibe_score_out_of_range"
+
+    for field in ('summary', 'behavior'):
+        value = result.get(field)
+        if not isinstance(value, str) or not value.strip():
+            return f"missing_{field}"
+
+    confidence = result.get('confidence')
+    if isinstance(confidence, (int, float)) and not isinstance(confidence, bool) and confidence < LLM_CASCADE_MIN_CONFIDENCE:
+        return "low_confidence"
+    return None
+
+
+# Profiler types that may finish on the cascade fast model (validator per type)
+CASCADE_VALIDATORS = {
+    "spot": validate_spot_result
+}
+
+
+async def call_llm_with_retry(
+    prompt: str,
+    profiler_type: str,
+    priority: Optional[str] = None,
+    deadline: Optional[Deadline] = None,
+    http_request: Optional[Request] = None,
+    split_prompt: Optional[Tuple[Optional[str], str]] = None
+) -> Tuple[Dict[str, Any], str]:
+    """
+    Call LLM with retry functionality (provider abstraction)
+
+    The static instruction prefix of the prompt is sent as a byte-stable system
+    message so provider-side prefix caching can hit. The call is queued on the
+    priority scheduler (spot > daily > weekly > backfill; defaults to the
+    profiler type) and runs in a worker thread.
+
+    With LLM_CASCADE_ENABLED, profiler types in CASCADE_VALIDATORS try the fast
+    model first and escalate to the current model only if validation fails.
+
+    Each provider attempt gets a share of the request deadline; the call is
+    cancelled when the deadline passes or the HTTP client disconnects.
+
+    Generation parameters come from GENERATION_PROFILES[profiler_type]
+    (llm_providers.py), applied the same way for every provider.
+
+    Callers that already split the prompt (spot shortcuts) pass the
+    (static_prefix, variable_part) pair as split_prompt so it is split once.
+
+    Returns:
+        (extracted JSON, model that actually answered)
+    """
     try:
-        # Get current LLM provider
-        llm = get_current_llm()
+        deadline = deadline or Deadline()
+        priority = priority or profiler_type
+
+        # Split static instructions (system) from per-recording data (user)
+        system_prompt, user_prompt = split_prompt or prompt_templates.split(profiler_type, prompt)
+
+        # Generation profile (reasoning effort, max tokens, temperature, model override)
+        profile = GENERATION_PROFILES.get(profiler_type)
+        llm = get_llm_for_profile(profile)
 
         # LLM call (retry functionality is applied by each provider)
-        raw_response = llm.generate(prompt)
+        cascade = LLM_CASCADE_ENABLED and profiler_type in CASCADE_VALIDATORS
+        if cascade:
+            generate = get_model_cascade().generate
+            args = (user_prompt, system_prompt, CASCADE_VALIDATORS[profiler_type])
+            kwargs = {"deadline": deadline, "profile": profile, "strong": llm}
+        else:
+            generate = llm.generate
+            args = (user_prompt, system_prompt)
+            kwargs = {"deadline": deadline, "profile": profile}
+
+        result = await watch_client(
+            llm_dispatcher.run(priority, generate, *args, **kwargs),
+            deadline,
+            http_request.is_disconnected if http_request is not None else None,
+            llm_dispatcher.service_seconds(priority) or ADMISSION_DEFAULT_LLM_SECONDS
+        )
+        raw_response, model_used = result if cascade else (result, llm.model_name)
 
         # Extract JSON
         extracted_data = extract_json_from_response(raw_response)
 
-        return extracted_data
+        return extracted_data, model_used
 
     except Exception as e:
         print(f"LLM API call error: {e}")
         raise
 
 
+def cache_saved_result(key: CacheKey, saved_rows: list, fallback_row: Dict[str, Any]) -> None:
+    """Put a saved row into the result cache (prefer the row returned by PostgREST)"""
+    try:
+        result_cache.put(key, saved_rows[0] if saved_rows else fallback_row)
+    except Exception as e:
+        print(f"⚠️ Warning: Failed to cache result {key}: {e}")
+
+
+def fetch_result_row(table: str, match: Dict[str, str], latest_by: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Read one result row from Supabase (cache miss path)"""
+    supabase = get_supabase_client()
+    if latest_by:
+        rows = supabase.select_rows(table, '*', match, order_by=latest_by, desc=True, limit=1)
+    else:
+        rows = supabase.select_rows(table, '*', match)
+    return rows[0] if rows else None
+
+
+async def cached_result_response(http_request: Request, key: CacheKey, loader: Callable[[], Optional[Dict[str, Any]]]) -> Response:
+    """
+    Serve a result from the LRU cache with ETag / conditional 304
+
+    On a cache miss the row is loaded from Supabase in a worker thread
+    (the blocking query must not stall the event loop) and cached.
+    """
+    entry = result_cache.get(key)
+    if entry is None:
+        try:
+            row = await asyncio.to_thread(loader)
+        except CircuitOpenError as e:
+            raise circuit_open_http_exception(e)
+        except Exception as e:
+            print(f"❌ Failed to fetch {key}: {e}")
+            raise HTTPException(status_code=500, detail=f"Result fetch error: {str(e)}")
+        if row is None:
+            raise HTTPException(status_code=404, detail=f"No result found: {'/'.join(key)}")
+        entry = result_cache.put(key, row)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(http_request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
 @app.get("/")
 async def root():
     return {"message": "Profiler API", "version": "1.0.0"}
@@ -123,7 +558,7 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (liveness: the process is up and serving)"""
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
@@ -132,438 +567,515 @@ async def health_check():
     }
 
 
-@app.post("/spot-profiler")
-async def spot_profiler(request: SpotProfilerRequest):
-    """
-    Spot profiler: Analyze a single recording and save to spot_results table
+@app.get("/metrics")
+async def metrics():
+    """Runtime metrics (admission, LLM dispatch queues, pipeline stages, circuit breakers, token usage, spot shortcuts, re-drive, result cache)"""
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "llm_dispatcher": llm_dispatcher.stats(),
+        "pipelines": {pipeline.name: pipeline.stats() for pipeline in PROFILER_PIPELINES},
+        "admission": admission_controller.stats(),
+        "circuit_breakers": all_breaker_stats(),
+        "llm_usage": {llm.model_name: llm.usage_stats() for llm in built_llm_providers()},
+        "llm_cascade": get_model_cascade().stats() if LLM_CASCADE_ENABLED and readiness["llm"] else None,
+        "static_prompt_prefixes": prompt_templates.stats(),
+        "spot_shortcuts": spot_shortcuts.stats(),
+        "spot_redrive": spot_redrive_sweeper.stats(),
+        "result_cache": result_cache.stats()
+    }
 
-    Flow:
-    1. Fetch prompt from spot_aggregators table
-    2. Execute LLM analysis
-    3. Save result to spot_results table
-    """
-    try:
-        print(f"\n🔍 Spot profiler analysis started")
-        print(f"  - Device ID: {request.device_id}")
-        print(f"  - Recorded At: {request.recorded_at}")
 
-        # Get Supabase client
-        supabase = get_supabase_client()
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 200 only after Supabase and LLM clients are warmed up and health checks pass"""
+    healthy = all(readiness["llm_health"].values())
+    if not readiness["ready"]:
+        status = "warming_up"
+    else:
+        status = "ready" if healthy else "llm_unhealthy"
+    body = {
+        "status": status,
+        "timestamp": datetime.now().isoformat(),
+        "checks": {
+            "supabase": readiness["supabase"],
+            "llm": readiness["llm"],
+            "llm_health": dict(readiness["llm_health"])
+        },
+        "started_at": readiness["started_at"],
+        "ready_at": readiness["ready_at"],
+        "last_error": readiness["last_error"],
+        "llm_provider": CURRENT_PROVIDER,
+        "llm_model": CURRENT_MODEL
+    }
+    return ORJSONResponse(status_code=200 if status == "ready" else 503, content=body)
 
-        # Fetch prompt, local_date, and local_time from spot_aggregators table
-        print("📥 Fetching prompt from spot_aggregators table...")
-        try:
-            result = supabase.client.table('spot_aggregators').select('prompt, local_date, local_time').eq('device_id', request.device_id).eq('recorded_at', request.recorded_at).execute()
-
-            if not result.data or len(result.data) == 0:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"No data found in spot_aggregators: device_id={request.device_id}, recorded_at={request.recorded_at}"
-                )
-
-            prompt = result.data[0].get('prompt')
-            local_date = result.data[0].get('local_date')
-            local_time = result.data[0].get('local_time')
-
-            if not prompt:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"prompt field is empty: device_id={request.device_id}, recorded_at={request.recorded_at}"
-                )
-
-            print(f"  ✅ Prompt fetched successfully: {len(prompt)} chars")
-            print(f"  ✅ Local date: {local_date}")
-            print(f"  ✅ Local time: {local_time}")
-        except HTTPException:
-            raise
-        except Exception as e:
-            print(f"❌ Failed to fetch prompt: {e}")
+
+# ==========================================
+# Profiler pipelines (stages shared by spot / daily / weekly)
+# ==========================================
+
+def fetch_prompt_stage(table: str, columns: str, key_field: str) -> StageFunction:
+    """Stage: fetch the aggregator row (with a non-empty prompt) for device_id + key_field"""
+    async def fetch_input(ctx: PipelineContext) -> Dict[str, Any]:
+        request = ctx.request
+        key = getattr(request, key_field)
+        print(f"📥 Fetching prompt from {table} table...")
+        rows = await run_stage(ctx.deadline, "fetch", get_supabase_client().select_rows, table, columns, {
+            'device_id': request.device_id,
+            key_field: key
+        })
+
+        if not rows:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No data found in {table}: device_id={request.device_id}, {key_field}={key}"
+            )
+        if not rows[0].get('prompt'):
             raise HTTPException(
-                status_code=500,
-                detail=f"Prompt fetch error: {str(e)}"
+                status_code=404,
+                detail=f"prompt field is empty: device_id={request.device_id}, {key_field}={key}"
             )
 
-        # LLM processing (provider abstraction)
+        print(f"  ✅ Prompt fetched successfully: {len(rows[0]['prompt'])} chars")
+        return rows[0]
+    return fetch_input
+
+
+def llm_stage(profiler_type: str, title: str) -> StageFunction:
+    """Stage: run the fetched prompt through the LLM (returns analysis result and model used)"""
+    async def analyze(ctx: PipelineContext, split_prompt: Optional[Tuple[Optional[str], str]] = None) -> Dict[str, Any]:
         print(f"📤 Sending to LLM... ({CURRENT_PROVIDER}/{CURRENT_MODEL})")
-        analysis_result = await call_llm_with_retry(prompt)
-        print(f"✅ LLM processing completed")
+        analysis_result, model_used = await call_llm_with_retry(
+            ctx['fetch_input']['prompt'], profiler_type,
+            priority=ctx.priority, deadline=ctx.deadline, http_request=ctx.http_request,
+            split_prompt=split_prompt
+        )
+        print(f"✅ LLM processing completed ({model_used})")
 
         # Display result in terminal
         print("\n" + "="*60)
-        print("📊 Analysis result:")
+        print(title)
         print("="*60)
         print(json.dumps(analysis_result, ensure_ascii=False, indent=2))
         print("="*60 + "\n")
 
-        # Prepare data for spot_results table
-        spot_results_data = {
-            'device_id': request.device_id,
-            'recorded_at': request.recorded_at,
-            'vibe_score': analysis_result.get('vibe_score'),
-            'profile_result': analysis_result,  # Save full analysis as JSONB
-            'summary': analysis_result.get('summary'),  # Dashboard summary (Japanese)
-            'behavior': analysis_result.get('behavior'),  # Detected behaviors (comma-separated)
-            'emotion': analysis_result.get('emotion'),  # Top 1-2 significant emotions (comma-separated)
-            'rating': analysis_result.get('rating'),  # Importance rating (0-5)
-            'llm_model': f"{CURRENT_PROVIDER}/{CURRENT_MODEL}"
+        profile = GENERATION_PROFILES.get(profiler_type)
+        return {
+            'result': analysis_result,
+            'model': model_used,
+            'generation_profile': profile.describe(model_used) if profile else {'model': model_used}
         }
+    return analyze
 
-        # Add local_date and local_time if available
-        if local_date:
-            spot_results_data['local_date'] = local_date
-        if local_time:
-            spot_results_data['local_time'] = local_time
 
-        # Save to spot_results table (UPSERT)
-        print("💾 Saving to spot_results table...")
-        try:
-            result = supabase.client.table('spot_results').upsert(spot_results_data).execute()
-            print(f"✅ Successfully saved to spot_results table")
-            save_success = True
-        except Exception as e:
-            print(f"❌ Failed to save to spot_results table: {e}")
-            save_success = False
-            # Return response even if save fails
+def spot_analyze_stage(title: str) -> StageFunction:
+    """
+    Stage: spot analysis with the no-speech fast path and near-duplicate reuse in front of the LLM
 
-        # Update spot_aggregators.profiler_status to 'completed'
-        try:
-            supabase.client.table('spot_aggregators').update({
-                'profiler_status': 'completed',
-                'profiler_processed_at': datetime.now().isoformat()
-            }).eq('device_id', request.device_id).eq('recorded_at', request.recorded_at).execute()
-            print(f"✅ Updated spot_aggregators.profiler_status to 'completed' for {request.device_id}/{request.recorded_at}")
-        except Exception as update_error:
-            print(f"⚠️ Warning: Failed to update spot_aggregators.profiler_status: {update_error}")
-            # Continue execution even if status update fails
+    In "on" mode a shortcut hit skips the LLM call; in "shadow" mode the LLM is
+    always called and the shortcut's vibe_score error is recorded. Only
+    LLM-produced results are added to the per-device index.
 
+    The prompt is split once and the split is reused for the LLM call; the
+    prompt signature (SimHash) is computed once, in a worker thread.
+    """
+    analyze_with_llm = llm_stage("spot", title)
+
+    async def analyze(ctx: PipelineContext) -> Dict[str, Any]:
+        if not spot_shortcuts.enabled:
+            return await analyze_with_llm(ctx)
+
+        request = ctx.request
+        split_prompt = prompt_templates.split("spot", ctx['fetch_input']['prompt'])
+        static_prefix, variable_part = split_prompt
+        signature = await asyncio.to_thread(PromptSignature, variable_part) if static_prefix else None
+        shortcut = spot_shortcuts.lookup(request.device_id, signature)
+        if shortcut and spot_shortcuts.mode == "on":
+            kind, result, model = shortcut
+            print(f"⚡ Spot shortcut ({kind}): LLM call skipped, using {model}")
+            return {'result': result, 'model': model, 'generation_profile': {'model': model, 'shortcut': kind}}
+
+        analyzed = await analyze_with_llm(ctx, split_prompt=split_prompt)
+        if shortcut:
+            spot_shortcuts.record_shadow(shortcut[0], shortcut[1], analyzed['result'])
+        spot_shortcuts.add(request.device_id, request.recorded_at, signature, analyzed['result'], analyzed['model'])
+        return analyzed
+    return analyze
+
+
+def save_result_stage(
+    table: str,
+    key_field: str,
+    build_row: Callable[[PipelineContext], Dict[str, Any]],
+    invalidate: Callable[[PipelineContext], list] = lambda ctx: []
+) -> StageFunction:
+    """Stage: upsert the result row and put it into the result cache (returns True on success)"""
+    async def save_result(ctx: PipelineContext) -> bool:
+        request = ctx.request
+        row = build_row(ctx)
+        print(f"💾 Saving to {table} table...")
+        saved_rows = await run_stage(ctx.deadline, "write", get_supabase_client().upsert_row, table, row, returning="representation")
+        print(f"✅ Successfully saved to {table} table")
+        cache_saved_result((table, request.device_id, getattr(request, key_field)), saved_rows, row)
+        for key in invalidate(ctx):
+            result_cache.invalidate(key)
+        return True
+    return save_result
+
+
+def profiler_response(label: str, key_field: str) -> Callable[[PipelineContext], Dict[str, Any]]:
+    """Response body shared by the profiler endpoints"""
+    def respond(ctx: PipelineContext) -> Dict[str, Any]:
+        request = ctx.request
+        save_success = ctx['save_result']
         return {
             "status": "success" if save_success else "partial_success",
-            "message": "Spot profiler analysis completed" + (" (DB save successful)" if save_success else " (DB save failed)"),
+            "message": f"{label} profiler analysis completed" + (" (DB save successful)" if save_success else " (DB save failed)"),
             "device_id": request.device_id,
-            "recorded_at": request.recorded_at,
-            "analysis_result": analysis_result,
+            key_field: getattr(request, key_field),
             "database_save": save_success,
             "processed_at": datetime.now().isoformat(),
-            "model_used": f"{CURRENT_PROVIDER}/{CURRENT_MODEL}"
+            "model_used": ctx['analyze']['model']
         }
+    return respond
+
+
+def add_generation_profile(row: Dict[str, Any], ctx: PipelineContext) -> None:
+    """Add the generation parameters used (reasoning effort / max tokens / temperature) once the column exists"""
+    if STORE_GENERATION_PROFILE:
+        row['generation_profile'] = ctx['analyze']['generation_profile']
+
+
+def build_spot_row(ctx: PipelineContext) -> Dict[str, Any]:
+    """spot_results row"""
+    analysis_result = ctx['analyze']['result']
+    source = ctx['fetch_input']
+    row = {
+        'device_id': ctx.request.device_id,
+        'recorded_at': ctx.request.recorded_at,
+        'vibe_score': analysis_result.get('vibe_score'),
+        'profile_result': analysis_result,  # Save full analysis as JSONB
+        'summary': analysis_result.get('summary'),  # Dashboard summary (Japanese)
+        'behavior': analysis_result.get('behavior'),  # Detected behaviors (comma-separated)
+        'emotion': analysis_result.get('emotion'),  # Top 1-2 significant emotions (comma-separated)
+        'rating': analysis_result.get('rating'),  # Importance rating (0-5)
+        'llm_model': ctx['analyze']['model']
+    }
+    add_generation_profile(row, ctx)
+
+    # Add local_date and local_time if available
+    if source.get('local_date'):
+        row['local_date'] = source['local_date']
+    if source.get('local_time'):
+        row['local_time'] = source['local_time']
+    return row
+
+
+async def mark_spot_completed(ctx: PipelineContext) -> None:
+    """Stage: update spot_aggregators.profiler_status to 'completed'"""
+    request = ctx.request
+    await run_stage(ctx.deadline, "write", get_supabase_client().update_rows, 'spot_aggregators', {
+        'profiler_status': 'completed',
+        'profiler_processed_at': datetime.now().isoformat()
+    }, {'device_id': request.device_id, 'recorded_at': request.recorded_at})
+    print(f"✅ Updated spot_aggregators.profiler_status to 'completed' for {request.device_id}/{request.recorded_at}")
+
+
+async def record_spot_error(ctx: PipelineContext, e: Exception) -> None:
+    """Record the failure on spot_aggregators (profiler_status / error type / message) within the write budget"""
+    # Determine error type for database
+    error_type_str = type(e).__name__
+    if isinstance(e, CircuitOpenError):
+        profiler_status = 'rate_limited'
+        error_type_db = 'circuit_open'
+    elif isinstance(e, DeadlineExceeded):
+        profiler_status = 'failed'
+        error_type_db = 'deadline_exceeded'
+    elif isinstance(e, ClientDisconnected):
+        profiler_status = 'failed'
+        error_type_db = 'client_disconnected'
+    elif 'RateLimitError' in error_type_str or 'rate_limit' in str(e).lower():
+        profiler_status = 'rate_limited'
+        error_type_db = 'rate_limit'
+    elif 'TimeoutError' in error_type_str or 'timeout' in str(e).lower():
+        profiler_status = 'failed'
+        error_type_db = 'timeout'
+    else:
+        profiler_status = 'failed'
+        error_type_db = error_type_str
+
+    request = ctx.request
+    update = {
+        'profiler_status': profiler_status,
+        'profiler_error_type': error_type_db,
+        'profiler_error_message': str(e)[:500],  # Limit to 500 chars
+        'profiler_processed_at': datetime.now().isoformat()
+    }
+    if SPOT_REDRIVE_ENABLED and ctx.priority != PRIORITY_BACKFILL:
+        # Due for the re-drive sweeper now (re-drives reschedule themselves with back-off).
+        # The column only exists once the re-drive migration is applied (SPOT_REDRIVE_ENABLED)
+        update['profiler_next_attempt_at'] = datetime.now(timezone.utc).isoformat()
+    await run_stage(
+        ctx.deadline, "write", get_supabase_client().update_rows,
+        'spot_aggregators', update, {'device_id': request.device_id, 'recorded_at': request.recorded_at}
+    )
+    print(f"✅ Updated spot_aggregators with error info: {profiler_status}/{error_type_db}")
+
+
+async def fetch_vibe_points(ctx: PipelineContext) -> list:
+    """Stage: time-based vibe scores from spot_results (independent of the LLM call)"""
+    request = ctx.request
+    print("📥 Fetching spot_results for vibe_scores array...")
+    spot_rows = await run_stage(ctx.deadline, "fetch", get_supabase_client().select_rows, 'spot_results', 'recorded_at, local_time, vibe_score', {
+        'device_id': request.device_id,
+        'local_date': request.local_date
+    }, order_by='recorded_at')
+
+    vibe_scores_array = extract_vibe_points(spot_rows)
+    if vibe_scores_array:
+        print(f"  ✅ Generated vibe_scores array with {len(vibe_scores_array)} data points")
+    else:
+        print(f"  ⚠️ No spot_results found for vibe_scores generation")
+    return vibe_scores_array
+
+
+def build_daily_row(ctx: PipelineContext) -> Dict[str, Any]:
+    """daily_results row (LLM summary + vibe analytics from spot_results)"""
+    analysis_result = ctx['analyze']['result']
+    vibe_scores_array = ctx['fetch_vibe_points']
+
+    # Daily vibe analytics (48-slot timeline, hour distribution, change points)
+    vibe_analytics = compute_daily_vibe_analytics(vibe_scores_array)
+    avg_vibe = vibe_analytics['average_score'] if vibe_analytics['average_score'] is not None else 0
+
+    row = {
+        'device_id': ctx.request.device_id,
+        'local_date': ctx.request.local_date,
+        'vibe_score': avg_vibe,  # Calculated average
+        'summary': analysis_result.get('summary'),  # LLM output (Japanese)
+        'burst_events': analysis_result.get('burst_events', []),  # LLM output
+        'vibe_scores': vibe_scores_array,  # Time-based vibe scores array from spot_results
+        'processed_count': len(vibe_scores_array),  # Number of processed recordings
+        'llm_model': ctx['analyze']['model']
+    }
+    add_generation_profile(row, ctx)
+    if STORE_DAILY_VIBE_ANALYTICS:
+        row['vibe_analytics'] = vibe_analytics  # 48-slot timeline, positive/negative/neutral hours, change points
+    return row
+
+
+def build_weekly_row(ctx: PipelineContext) -> Dict[str, Any]:
+    """weekly_results row"""
+    analysis_result = ctx['analyze']['result']
+    context_data = ctx['fetch_input'].get('context_data') or {}
+    row = {
+        'device_id': ctx.request.device_id,
+        'week_start_date': ctx.request.week_start_date,
+        'summary': analysis_result.get('week_summary', ''),  # LLM output (Japanese)
+        'memorable_events': analysis_result.get('memorable_events', []),  # Top 5 memorable events (JSONB array)
+        'profile_result': analysis_result,  # Full LLM output (memorable_events included)
+        'processed_count': context_data.get('spot_count', 0),  # Number of recordings processed
+        'llm_model': ctx['analyze']['model']
+    }
+    add_generation_profile(row, ctx)
+    return row
+
+
+SPOT_PIPELINE = ProfilerPipeline("spot", [
+    Stage("fetch_input", fetch_prompt_stage('spot_aggregators', 'prompt, local_date, local_time', 'recorded_at'), retries=1),
+    Stage("analyze", spot_analyze_stage("📊 Analysis result:"), depends_on=("fetch_input",)),
+    Stage("save_result", save_result_stage(
+        'spot_results', 'recorded_at', build_spot_row,
+        invalidate=lambda ctx: [('spot_results', ctx.request.device_id, 'latest')]
+    ), depends_on=("analyze",), retries=1, optional=True, default=False),
+    Stage("mark_completed", mark_spot_completed, depends_on=("save_result",), retries=1, optional=True),
+], respond=profiler_response("Spot", "recorded_at"), on_error=record_spot_error)
+
+DAILY_PIPELINE = ProfilerPipeline("daily", [
+    Stage("fetch_input", fetch_prompt_stage('daily_aggregators', 'prompt', 'local_date'), retries=1),
+    Stage("fetch_vibe_points", fetch_vibe_points, retries=1, optional=True, default=[]),
+    Stage("analyze", llm_stage("daily", "📊 Daily analysis result:"), depends_on=("fetch_input",)),
+    Stage("save_result", save_result_stage('daily_results', 'local_date', build_daily_row),
+          depends_on=("analyze", "fetch_vibe_points"), retries=1, optional=True, default=False),
+], respond=profiler_response("Daily", "local_date"))
+
+WEEKLY_PIPELINE = ProfilerPipeline("weekly", [
+    Stage("fetch_input", fetch_prompt_stage('weekly_aggregators', 'prompt, context_data', 'week_start_date'), retries=1),
+    Stage("analyze", llm_stage("weekly", "📊 Weekly analysis result:"), depends_on=("fetch_input",)),
+    Stage("save_result", save_result_stage('weekly_results', 'week_start_date', build_weekly_row),
+          depends_on=("analyze",), retries=1, optional=True, default=False),
+], respond=profiler_response("Weekly", "week_start_date"))
+
+PROFILER_PIPELINES = [SPOT_PIPELINE, DAILY_PIPELINE, WEEKLY_PIPELINE]
+
+
+async def run_profiler(
+    pipeline: ProfilerPipeline,
+    request: BaseModel,
+    http_request: Optional[Request],
+    priority: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Run a profiler pipeline and map failures to HTTP errors
+
+    404s raised by stages pass through. Other failures call the pipeline's
+    on_error hook once, then become 503 (circuit open), 504/499 (deadline /
+    client disconnect) or 500. `priority` overrides the LLM dispatch class
+    (e.g. backfill for re-drives).
+    """
+    ctx = PipelineContext(request, request_deadline(http_request), http_request, priority)
+    try:
+        print(f"\n🔍 {pipeline.name.capitalize()} profiler analysis started")
+        for field, value in request.model_dump(exclude={'response_mode'}).items():
+            print(f"  - {field}: {value}")
+
+        await pipeline.run(ctx)
+        return build_profiler_response(request.response_mode, pipeline.respond(ctx), ctx['analyze']['result'])
 
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        error_details = {
-            "error_type": type(e).__name__,
-            "error_message": str(e),
-            "traceback": traceback.format_exc()
-        }
+        error_details = log_error_details(f"{pipeline.name}_profiler", e)
+        error_details["stage"] = ctx.failed_stage
 
-        print(f"❌ ERROR in spot_profiler: {error_details}")
+        if pipeline.on_error:
+            try:
+                await pipeline.on_error(ctx, e)
+            except Exception as update_error:
+                print(f"⚠️ Warning: Failed to record {pipeline.name} profiler error: {update_error}")
 
-        # Determine error type for database
-        error_type_str = type(e).__name__
-        if 'RateLimitError' in error_type_str or 'rate_limit' in str(e).lower():
-            profiler_status = 'rate_limited'
-            error_type_db = 'rate_limit'
-        elif 'TimeoutError' in error_type_str or 'timeout' in str(e).lower():
-            profiler_status = 'failed'
-            error_type_db = 'timeout'
-        else:
-            profiler_status = 'failed'
-            error_type_db = error_type_str
-
-        # Update spot_aggregators with error information
-        try:
-            supabase = get_supabase_client()
-            supabase.client.table('spot_aggregators').update({
-                'profiler_status': profiler_status,
-                'profiler_error_type': error_type_db,
-                'profiler_error_message': str(e)[:500],  # Limit to 500 chars
-                'profiler_processed_at': datetime.now().isoformat()
-            }).eq('device_id', request.device_id).eq('recorded_at', request.recorded_at).execute()
-            print(f"✅ Updated spot_aggregators with error info: {profiler_status}/{error_type_db}")
-        except Exception as update_error:
-            print(f"⚠️ Warning: Failed to update spot_aggregators error info: {update_error}")
+        if isinstance(e, CircuitOpenError):
+            raise circuit_open_http_exception(e)
+        if isinstance(e, (DeadlineExceeded, ClientDisconnected)):
+            raise deadline_http_exception(e)
 
         raise HTTPException(
             status_code=500,
             detail={
-                "message": "Error occurred during spot profiler analysis",
+                "message": f"Error occurred during {pipeline.name} profiler analysis",
                 "error_details": error_details
             }
         )
 
 
-@app.post("/daily-profiler")
-async def daily_profiler(request: DailyProfilerRequest):
+@app.post("/spot-profiler")
+async def spot_profiler(request: SpotProfilerRequest, http_request: Request = None):
     """
-    Daily profiler: Analyze daily aggregated data and save to daily_results table
+    Spot profiler: Analyze a single recording and save to spot_results table
 
-    Flow:
-    1. Fetch prompt from daily_aggregators table
-    2. Execute LLM analysis
-    3. Save result to daily_results table
+    Stages (SPOT_PIPELINE):
+    1. fetch_input: prompt from spot_aggregators table
+    2. analyze: LLM analysis
+    3. save_result: spot_results table
+    4. mark_completed: spot_aggregators.profiler_status = 'completed'
     """
-    try:
-        print(f"\n📅 Daily profiler analysis started")
-        print(f"  - Device ID: {request.device_id}")
-        print(f"  - Local Date: {request.local_date}")
-
-        # Get Supabase client
-        supabase = get_supabase_client()
-
-        # Fetch prompt from daily_aggregators table
-        print("📥 Fetching prompt from daily_aggregators table...")
-        try:
-            result = supabase.client.table('daily_aggregators').select('prompt').eq('device_id', request.device_id).eq('local_date', request.local_date).execute()
-
-            if not result.data or len(result.data) == 0:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"No data found in daily_aggregators: device_id={request.device_id}, local_date={request.local_date}"
-                )
-
-            prompt = result.data[0].get('prompt')
-
-            if not prompt:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"prompt field is empty: device_id={request.device_id}, local_date={request.local_date}"
-                )
-
-            print(f"  ✅ Prompt fetched successfully: {len(prompt)} chars")
-        except HTTPException:
-            raise
-        except Exception as e:
-            print(f"❌ Failed to fetch prompt: {e}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Prompt fetch error: {str(e)}"
-            )
-
-        # LLM processing (provider abstraction)
-        print(f"📤 Sending to LLM... ({CURRENT_PROVIDER}/{CURRENT_MODEL})")
-        analysis_result = await call_llm_with_retry(prompt)
-        print(f"✅ LLM processing completed")
-
-        # Display result in terminal
-        print("\n" + "="*60)
-        print("📊 Daily analysis result:")
-        print("="*60)
-        print(json.dumps(analysis_result, ensure_ascii=False, indent=2))
-        print("="*60 + "\n")
-
-        # Fetch spot_results to generate vibe_scores array
-        print("📥 Fetching spot_results for vibe_scores array...")
-        try:
-            spot_results_response = supabase.client.table('spot_results').select(
-                'recorded_at, local_time, vibe_score'
-            ).eq(
-                'device_id', request.device_id
-            ).eq(
-                'local_date', request.local_date
-            ).order('recorded_at').execute()
-
-            vibe_scores_array = []
-            vibe_scores_for_avg = []
-            if spot_results_response.data:
-                for spot in spot_results_response.data:
-                    local_time = spot.get('local_time')
-                    vibe_score = spot.get('vibe_score')
-
-                    if local_time and vibe_score is not None:
-                        # Extract HH:MM from local_time (YYYY-MM-DD HH:MM:SS)
-                        time_str = local_time.split(' ')[1] if ' ' in local_time else local_time
-                        time_parts = time_str.split(':')
-                        if len(time_parts) >= 2:
-                            time_hhmm = f"{time_parts[0]}:{time_parts[1]}"
-                            vibe_scores_array.append({
-                                "time": time_hhmm,
-                                "score": vibe_score
-                            })
-                            vibe_scores_for_avg.append(vibe_score)
-
-                print(f"  ✅ Generated vibe_scores array with {len(vibe_scores_array)} data points")
-            else:
-                print(f"  ⚠️ No spot_results found for vibe_scores generation")
-        except Exception as e:
-            print(f"❌ Failed to fetch spot_results: {e}")
-            vibe_scores_array = []
-            vibe_scores_for_avg = []
-
-        # Calculate average vibe score
-        avg_vibe = sum(vibe_scores_for_avg) / len(vibe_scores_for_avg) if vibe_scores_for_avg else 0
-
-        # Prepare data for daily_results table
-        daily_results_data = {
-            'device_id': request.device_id,
-            'local_date': request.local_date,
-            'vibe_score': avg_vibe,  # Calculated average
-            'summary': analysis_result.get('summary'),  # LLM output (Japanese)
-            'burst_events': analysis_result.get('burst_events', []),  # LLM output
-            'vibe_scores': vibe_scores_array,  # Time-based vibe scores array from spot_results
-            'processed_count': len(vibe_scores_array),  # Number of processed recordings
-            'llm_model': f"{CURRENT_PROVIDER}/{CURRENT_MODEL}"
-        }
-
-        # Save to daily_results table (UPSERT)
-        print("💾 Saving to daily_results table...")
-        try:
-            result = supabase.client.table('daily_results').upsert(daily_results_data).execute()
-            print(f"✅ Successfully saved to daily_results table")
-            save_success = True
-        except Exception as e:
-            print(f"❌ Failed to save to daily_results table: {e}")
-            save_success = False
-            # Return response even if save fails
-
-        return {
-            "status": "success" if save_success else "partial_success",
-            "message": "Daily profiler analysis completed" + (" (DB save successful)" if save_success else " (DB save failed)"),
-            "device_id": request.device_id,
-            "local_date": request.local_date,
-            "analysis_result": analysis_result,
-            "database_save": save_success,
-            "processed_at": datetime.now().isoformat(),
-            "model_used": f"{CURRENT_PROVIDER}/{CURRENT_MODEL}"
-        }
+    return await run_profiler(SPOT_PIPELINE, request, http_request)
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        import traceback
-        error_details = {
-            "error_type": type(e).__name__,
-            "error_message": str(e),
-            "traceback": traceback.format_exc()
-        }
 
-        print(f"❌ ERROR in daily_profiler: {error_details}")
+@app.post("/daily-profiler")
+async def daily_profiler(request: DailyProfilerRequest, http_request: Request = None):
+    """
+    Daily profiler: Analyze daily aggregated data and save to daily_results table
 
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "message": "Error occurred during daily profiler analysis",
-                "error_details": error_details
-            }
-        )
+    Stages (DAILY_PIPELINE):
+    1. fetch_input: prompt from daily_aggregators table
+       fetch_vibe_points: spot_results for the vibe_scores array (runs alongside 1-2)
+    2. analyze: LLM analysis
+    3. save_result: daily_results table
+    """
+    return await run_profiler(DAILY_PIPELINE, request, http_request)
 
 
 @app.post("/weekly-profiler")
-async def weekly_profiler(request: WeeklyProfilerRequest):
+async def weekly_profiler(request: WeeklyProfilerRequest, http_request: Request = None):
     """
     Weekly profiler: Analyze weekly aggregated data and save to weekly_results table
 
-    Flow:
-    1. Fetch prompt from weekly_aggregators table
-    2. Execute LLM analysis
-    3. Save result to weekly_results table
+    Stages (WEEKLY_PIPELINE):
+    1. fetch_input: prompt from weekly_aggregators table
+    2. analyze: LLM analysis
+    3. save_result: weekly_results table
     """
-    try:
-        print(f"\n📅 Weekly profiler analysis started")
-        print(f"  - Device ID: {request.device_id}")
-        print(f"  - Week Start Date: {request.week_start_date}")
+    return await run_profiler(WEEKLY_PIPELINE, request, http_request)
 
-        # Get Supabase client
-        supabase = get_supabase_client()
 
-        # Fetch prompt from weekly_aggregators table
-        print("📥 Fetching prompt from weekly_aggregators table...")
-        try:
-            result = supabase.client.table('weekly_aggregators').select('prompt, context_data').eq('device_id', request.device_id).eq('week_start_date', request.week_start_date).execute()
-
-            if not result.data or len(result.data) == 0:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"No data found in weekly_aggregators: device_id={request.device_id}, week_start_date={request.week_start_date}"
-                )
-
-            prompt = result.data[0].get('prompt')
-            context_data = result.data[0].get('context_data', {})
-
-            if not prompt:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"prompt field is empty: device_id={request.device_id}, week_start_date={request.week_start_date}"
-                )
-
-            print(f"  ✅ Prompt fetched successfully: {len(prompt)} chars")
-        except HTTPException:
-            raise
-        except Exception as e:
-            print(f"❌ Failed to fetch prompt: {e}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Prompt fetch error: {str(e)}"
-            )
+# ==========================================
+# Re-drive of rate_limited / failed spot rows (SPOT_REDRIVE_ENABLED)
+# ==========================================
 
-        # LLM processing (provider abstraction)
-        print(f"📤 Sending to LLM... ({CURRENT_PROVIDER}/{CURRENT_MODEL})")
-        analysis_result = await call_llm_with_retry(prompt)
-        print(f"✅ LLM processing completed")
+async def redrive_spot(device_id: str, recorded_at: str) -> Dict[str, Any]:
+    """Re-run the spot pipeline for one aggregator row on the backfill priority class"""
+    request = SpotProfilerRequest(device_id=device_id, recorded_at=recorded_at)
+    return await run_profiler(SPOT_PIPELINE, request, None, priority=PRIORITY_BACKFILL)
 
-        # Display result in terminal
-        print("\n" + "="*60)
-        print("📊 Weekly analysis result:")
-        print("="*60)
-        print(json.dumps(analysis_result, ensure_ascii=False, indent=2))
-        print("="*60 + "\n")
 
-        # Extract memorable events and summary from LLM result
-        memorable_events = analysis_result.get('memorable_events', [])
-        week_summary = analysis_result.get('week_summary', '')
+spot_redrive_sweeper = SpotRedriveSweeper(get_supabase_client, redrive_spot, admission_controller, llm_dispatcher)
+_spot_redrive_task = None
 
-        # Prepare data for weekly_results table
-        weekly_results_data = {
-            'device_id': request.device_id,
-            'week_start_date': request.week_start_date,
-            'summary': week_summary,  # LLM output (Japanese)
-            'memorable_events': memorable_events,  # Top 5 memorable events (JSONB array)
-            'profile_result': analysis_result,  # Full LLM output (memorable_events included)
-            'processed_count': context_data.get('spot_count', 0),  # Number of recordings processed
-            'llm_model': f"{CURRENT_PROVIDER}/{CURRENT_MODEL}"
-        }
 
-        # Save to weekly_results table (UPSERT)
-        print("💾 Saving to weekly_results table...")
-        try:
-            result = supabase.client.table('weekly_results').upsert(weekly_results_data).execute()
-            print(f"✅ Successfully saved to weekly_results table")
-            save_success = True
-        except Exception as e:
-            print(f"❌ Failed to save to weekly_results table: {e}")
-            save_success = False
-            # Return response even if save fails
+@app.on_event("startup")
+async def start_spot_redrive():
+    """Start the re-drive sweeper once warm-up has finished"""
+    global _spot_redrive_task
+    if not (SPOT_REDRIVE_ENABLED and SPOT_REDRIVE_IN_PROCESS):
+        return
 
-        return {
-            "status": "success" if save_success else "partial_success",
-            "message": "Weekly profiler analysis completed" + (" (DB save successful)" if save_success else " (DB save failed)"),
-            "device_id": request.device_id,
-            "week_start_date": request.week_start_date,
-            "analysis_result": analysis_result,
-            "database_save": save_success,
-            "processed_at": datetime.now().isoformat(),
-            "model_used": f"{CURRENT_PROVIDER}/{CURRENT_MODEL}"
-        }
+    async def run_when_ready():
+        while not readiness["ready"]:
+            await asyncio.sleep(WARMUP_RETRY_INTERVAL_SECONDS)
+        await spot_redrive_sweeper.run()
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        import traceback
-        error_details = {
-            "error_type": type(e).__name__,
-            "error_message": str(e),
-            "traceback": traceback.format_exc()
-        }
+    _spot_redrive_task = asyncio.create_task(run_when_ready())
 
-        print(f"❌ ERROR in weekly_profiler: {error_details}")
 
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "message": "Error occurred during weekly profiler analysis",
-                "error_details": error_details
-            }
+@app.on_event("shutdown")
+async def stop_spot_redrive():
+    """Let re-drives in flight finish before the worker exits"""
+    if _spot_redrive_task is not None:
+        spot_redrive_sweeper.stop()
+        if not readiness["ready"]:
+            _spot_redrive_task.cancel()
+        await asyncio.gather(_spot_redrive_task, return_exceptions=True)
+
+
+@app.get("/spot-results/{device_id}")
+async def get_spot_results(device_id: str, http_request: Request, recorded_at: Optional[str] = None):
+    """
+    Spot result read API (cached, ETag/304)
+
+    recorded_at: UTC timestamp of the recording. If omitted, the latest spot result is returned.
+    """
+    if recorded_at:
+        return await cached_result_response(
+            http_request,
+            ('spot_results', device_id, recorded_at),
+            lambda: fetch_result_row('spot_results', {'device_id': device_id, 'recorded_at': recorded_at})
         )
+    return await cached_result_response(
+        http_request,
+        ('spot_results', device_id, 'latest'),
+        lambda: fetch_result_row('spot_results', {'device_id': device_id}, latest_by='recorded_at')
+    )
+
+
+@app.get("/daily-results/{device_id}/{local_date}")
+async def get_daily_results(device_id: str, local_date: str, http_request: Request):
+    """Daily result read API (cached, ETag/304)"""
+    return await cached_result_response(
+        http_request,
+        ('daily_results', device_id, local_date),
+        lambda: fetch_result_row('daily_results', {'device_id': device_id, 'local_date': local_date})
+    )
+
+
+@app.get("/weekly-results/{device_id}/{week_start_date}")
+async def get_weekly_results(device_id: str, week_start_date: str, http_request: Request):
+    """Weekly result read API (cached, ETag/304)"""
+    return await cached_result_response(
+        http_request,
+        ('weekly_results', device_id, week_start_date),
+        lambda: fetch_result_row('weekly_results', {'device_id': device_id, 'week_start_date': week_start_date})
+    )
 
 
 if __name__ == "__main__":
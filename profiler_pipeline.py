@@ -0,0 +1,206 @@
+"""
+Declarative profiler pipeline engine
+
+Each profiler (spot, daily, weekly, ...) is declared as a list of stages
+with dependencies instead of a hand-written sequential flow:
+
+    ProfilerPipeline("daily", [
+        Stage("fetch_input", fetch_prompt),
+        Stage("fetch_vibe_points", fetch_points, optional=True, default=[]),
+        Stage("analyze", call_llm, depends_on=("fetch_input",)),
+        Stage("save_result", save, depends_on=("analyze", "fetch_vibe_points")),
+    ], respond=build_body)
+
+The engine handles what every profiler needs once:
+
+- Stages whose dependencies are satisfied run concurrently
+- Per-stage timing (logged per run, aggregated for /metrics)
+- Retries of transient errors (Supabase blips) with a short back-off,
+  skipped once the request deadline has passed
+- Optional stages fall back to a default instead of failing the run
+- A failing required stage cancels the stages still running and the
+  pipeline's on_error hook (e.g. error-status writes) is called once
+
+Stage functions are async and receive the PipelineContext; a stage's
+return value is available to later stages as ctx[stage_name].
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from circuit_breaker import is_transient_error
+from deadlines import Deadline
+
+STAGE_RETRY_BACKOFF_SECONDS = 0.5
+
+
+class PipelineContext:
+    """Per-run state shared by the stages of one pipeline run"""
+
+    def __init__(self, request: Any, deadline: Deadline, http_request: Any = None, priority: Optional[str] = None):
+        self.request = request
+        self.deadline = deadline
+        self.http_request = http_request
+        self.priority = priority  # LLM dispatch class (None = the profiler type)
+        self.results: Dict[str, Any] = {}
+        self.timings: Dict[str, float] = {}
+        self.failed_stage: Optional[str] = None
+
+    def __getitem__(self, stage_name: str) -> Any:
+        return self.results[stage_name]
+
+
+StageFunction = Callable[[PipelineContext], Awaitable[Any]]
+
+
+class Stage:
+    """One step of a profiler pipeline"""
+
+    def __init__(
+        self,
+        name: str,
+        run: StageFunction,
+        depends_on: Iterable[str] = (),
+        retries: int = 0,
+        optional: bool = False,
+        default: Any = None
+    ):
+        """
+        Args:
+            name: Stage name (key of its result in the context)
+            run: Async function taking the PipelineContext
+            depends_on: Stages that must finish before this one starts
+            retries: Extra attempts on transient errors
+            optional: On failure, log and use `default` instead of failing the run
+            default: Result of an optional stage that failed
+        """
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+        self.retries = retries
+        self.optional = optional
+        self.default = default
+
+
+class _StageStats:
+    __slots__ = ("runs", "failures", "retries", "total_seconds", "recent")
+
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.recent = deque(maxlen=200)
+
+
+class ProfilerPipeline:
+    """A profiler declared as a dependency graph of stages"""
+
+    def __init__(
+        self,
+        name: str,
+        stages: List[Stage],
+        respond: Callable[[PipelineContext], Dict[str, Any]],
+        on_error: Optional[Callable[[PipelineContext, Exception], Awaitable[None]]] = None
+    ):
+        """
+        Args:
+            name: Profiler name (logs, metrics)
+            stages: Stages in declaration order
+            respond: Builds the response body from a finished context
+            on_error: Async hook awaited once when a required stage fails (e.g. error-status write)
+        """
+        self.name = name
+        self.stages = stages
+        self.respond = respond
+        self.on_error = on_error
+        self._validate()
+        self._stats = {stage.name: _StageStats() for stage in stages}
+
+    def _validate(self) -> None:
+        """Reject duplicate names, unknown dependencies and cycles"""
+        names = [stage.name for stage in self.stages]
+        if len(names) != len(set(names)):
+            raise ValueError(f"Duplicate stage names in pipeline '{self.name}'")
+        resolved = set()
+        remaining = list(self.stages)
+        while remaining:
+            ready = [stage for stage in remaining if set(stage.depends_on) <= resolved]
+            if not ready:
+                raise ValueError(
+                    f"Unresolvable dependencies in pipeline '{self.name}': "
+                    + ", ".join(f"{s.name} <- {list(s.depends_on)}" for s in remaining)
+                )
+            for stage in ready:
+                resolved.add(stage.name)
+                remaining.remove(stage)
+
+    async def run(self, ctx: PipelineContext) -> PipelineContext:
+        """
+        Run all stages, starting each as soon as its dependencies have finished
+
+        Raises:
+            Exception: The error of the first required stage that failed
+        """
+        pending = list(self.stages)
+        running: Dict["asyncio.Task[Any]", Stage] = {}
+        try:
+            while pending or running:
+                for stage in [s for s in pending if all(d in ctx.results for d in s.depends_on)]:
+                    pending.remove(stage)
+                    running[asyncio.ensure_future(self._run_stage(stage, ctx))] = stage
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stage = running.pop(task)
+                    ctx.results[stage.name] = task.result()
+        finally:
+            for task in running:
+                task.cancel()
+            print(f"⏱️ {self.name} pipeline: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in ctx.timings.items()))
+        return ctx
+
+    async def _run_stage(self, stage: Stage, ctx: PipelineContext) -> Any:
+        stats = self._stats[stage.name]
+        started = time.monotonic()
+        attempt = 0
+        try:
+            while True:
+                try:
+                    return await stage.run(ctx)
+                except Exception as e:
+                    if attempt < stage.retries and is_transient_error(e) and not ctx.deadline.expired:
+                        attempt += 1
+                        stats.retries += 1
+                        print(f"🔁 {self.name}.{stage.name} retry {attempt}/{stage.retries}: {e}")
+                        await asyncio.sleep(STAGE_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+                        continue
+                    stats.failures += 1
+                    if stage.optional:
+                        print(f"⚠️ {self.name}.{stage.name} failed (optional, continuing): {e}")
+                        return stage.default
+                    ctx.failed_stage = stage.name
+                    raise
+        finally:
+            elapsed = time.monotonic() - started
+            ctx.timings[stage.name] = elapsed
+            stats.runs += 1
+            stats.total_seconds += elapsed
+            stats.recent.append(elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        """Run count, failures, retries and latency (avg / p95) per stage"""
+        result = {}
+        for name, stats in self._stats.items():
+            recent = sorted(stats.recent)
+            result[name] = {
+                "runs": stats.runs,
+                "failures": stats.failures,
+                "retries": stats.retries,
+                "avg_seconds": round(stats.total_seconds / stats.runs, 3) if stats.runs else 0.0,
+                "p95_seconds": round(recent[math.ceil(len(recent) * 0.95) - 1], 3) if recent else 0.0,
+            }
+        return result
@@ -0,0 +1,100 @@
+"""
+プロンプトの固定部分／可変部分の分離（プロバイダー側プレフィックスキャッシュ用）
+
+Aggregator APIが生成するプロンプトは、大きな固定の指示ブロック（出力スキーマ、
+日本語スタイルルール、行動語彙など）と録音ごとのデータが1つの文字列になっている。
+固定部分をバイト単位で毎回同一のsystemメッセージとして送ることで、
+OpenAI/Groqのプレフィックスキャッシュがヒットしやすくなる。
+
+固定部分の決め方（プロファイラー種別ごと）:
+1. 宣言: PROMPT_SPLIT_MARKERS にマーカー文字列があれば、その直前までを固定部分とする
+2. 検出: 同じ種別の直近プロンプトとの共通プレフィックス（行単位）を固定部分として学習する。
+   確定したプレフィックスは置き換えない（バイト安定）。一致しないテンプレートのプロンプトが
+   来た場合は、そのテンプレート用のプレフィックスを別に学習する（種別ごとに最大
+   PROMPT_MAX_TEMPLATES_PER_TYPE 個、以降は新しいテンプレートを学習しない）
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# 宣言的な分割マーカー（プロンプト内でこの文字列が現れる位置から可変部分）
+PROMPT_SPLIT_MARKERS: Dict[str, Optional[str]] = {
+    "spot": os.getenv("PROMPT_SPLIT_MARKER_SPOT") or None,
+    "daily": os.getenv("PROMPT_SPLIT_MARKER_DAILY") or None,
+    "weekly": os.getenv("PROMPT_SPLIT_MARKER_WEEKLY") or None,
+}
+
+# 固定部分として扱う最小文字数（短すぎるとキャッシュ対象にならない）
+MIN_STATIC_PREFIX_CHARS = int(os.getenv("MIN_STATIC_PREFIX_CHARS", "1024"))
+# 種別ごとに保持するテンプレート（学習済みプレフィックス）の上限
+PROMPT_MAX_TEMPLATES_PER_TYPE = int(os.getenv("PROMPT_MAX_TEMPLATES_PER_TYPE", "4"))
+
+
+def common_line_prefix(a: str, b: str) -> str:
+    """2つの文字列の共通プレフィックスを、最後の改行までに切り詰めて返す"""
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    newline = a.rfind("\n", 0, i)
+    return a[:newline + 1] if newline >= 0 else ""
+
+
+class PromptTemplateRegistry:
+    """プロファイラー種別ごとの固定プレフィックスを管理（スレッドセーフ）"""
+
+    def __init__(
+        self,
+        markers: Optional[Dict[str, Optional[str]]] = None,
+        min_prefix_chars: int = MIN_STATIC_PREFIX_CHARS,
+        max_templates: int = PROMPT_MAX_TEMPLATES_PER_TYPE
+    ):
+        self.markers = markers if markers is not None else PROMPT_SPLIT_MARKERS
+        self.min_prefix_chars = min_prefix_chars
+        self.max_templates = max_templates
+        self._prefixes: Dict[str, List[str]] = {}
+        self._last_prompts: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def split(self, profiler_type: str, prompt: str) -> Tuple[Optional[str], str]:
+        """
+        プロンプトを (固定部分, 可変部分) に分割
+
+        Returns:
+            Tuple[Optional[str], str]: 固定部分が見つからない場合は (None, prompt)
+        """
+        marker = self.markers.get(profiler_type)
+        if marker:
+            index = prompt.find(marker)
+            if index >= self.min_prefix_chars:
+                return prompt[:index], prompt[index:]
+
+        with self._lock:
+            prefixes = self._prefixes.setdefault(profiler_type, [])
+            # 学習済みのうち一致する最長のもの（テンプレートごとに常に同じプレフィックス）
+            matched = [p for p in prefixes if prompt.startswith(p) and len(prompt) > len(p)]
+            if matched:
+                prefix = max(matched, key=len)
+                return prefix, prompt[len(prefix):]
+
+            # 学習済みのどれにも一致しないプロンプト同士から新しいテンプレートを学習
+            previous = self._last_prompts.get(profiler_type)
+            self._last_prompts[profiler_type] = prompt
+            if previous is None or len(prefixes) >= self.max_templates:
+                return None, prompt
+
+            candidate = common_line_prefix(previous, prompt)
+            if len(candidate) < self.min_prefix_chars or len(candidate) == len(prompt):
+                return None, prompt
+            prefixes.append(candidate)
+            del self._last_prompts[profiler_type]
+            return candidate, prompt[len(candidate):]
+
+    def stats(self) -> Dict[str, List[int]]:
+        """種別ごとの学習済みプレフィックス長（テンプレートごと）"""
+        with self._lock:
+            return {
+                profiler_type: [len(prefix) for prefix in prefixes]
+                for profiler_type, prefixes in self._prefixes.items() if prefixes
+            }
@@ -0,0 +1,448 @@
+"""
+Pull-based queue consumer for profiler jobs
+
+Pulls spot/daily/weekly jobs straight from a queue in batches and runs them
+through the same profiler logic as the HTTP endpoints, instead of paying a
+Lambda invocation and an HTTP hop per message. The long-running process keeps
+the Supabase/LLM connection pools warm.
+
+Backends:
+- SQSQueueBackend: Amazon SQS (long polling, batch delete)
+- SQLiteQueueBackend: local SQLite file or in-memory queue (testing / local runs)
+
+Message body (JSON):
+    {"type": "spot", "device_id": "...", "recorded_at": "2025-11-13T12:31:01+00:00"}
+    {"type": "daily", "device_id": "...", "local_date": "2025-11-15"}
+    {"type": "weekly", "device_id": "...", "week_start_date": "2025-11-10"}
+"type" may be omitted; it is inferred from recorded_at / local_date / week_start_date.
+
+Received messages stay hidden for PROFILER_QUEUE_VISIBILITY_TIMEOUT seconds
+(default: request deadline + margin), so a job is not redelivered while it
+is still running. Messages that keep failing transiently are dead-lettered
+(or dropped) after PROFILER_QUEUE_MAX_RECEIVE_COUNT receives.
+
+Usage:
+    python queue_consumer.py --backend sqs --queue-url https://sqs.ap-southeast-2.amazonaws.com/.../queue
+    python queue_consumer.py --backend sqlite --sqlite-path jobs.db
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from deadlines import REQUEST_DEADLINE_SECONDS
+
+# Visibility timeout: jobs run under the request deadline; the margin covers
+# batched acks so a finished job is deleted before it becomes visible again
+PROFILER_QUEUE_VISIBILITY_MARGIN_SECONDS = int(os.getenv("PROFILER_QUEUE_VISIBILITY_MARGIN_SECONDS", "30"))
+PROFILER_QUEUE_VISIBILITY_TIMEOUT = int(os.getenv(
+    "PROFILER_QUEUE_VISIBILITY_TIMEOUT",
+    str(int(REQUEST_DEADLINE_SECONDS) + PROFILER_QUEUE_VISIBILITY_MARGIN_SECONDS)
+))
+# Transient failures are retried until a message has been received this many times
+PROFILER_QUEUE_MAX_RECEIVE_COUNT = int(os.getenv("PROFILER_QUEUE_MAX_RECEIVE_COUNT", "5"))
+
+
+class QueueMessage:
+    """A received message (receipt identifies it for ack; receive_count includes this receive)"""
+
+    __slots__ = ("message_id", "receipt", "body", "receive_count")
+
+    def __init__(self, message_id: str, receipt: Any, body: str, receive_count: int = 1):
+        self.message_id = message_id
+        self.receipt = receipt
+        self.body = body
+        self.receive_count = receive_count
+
+
+class QueueBackend(ABC):
+    """Queue interface used by QueueConsumer (all methods are blocking)"""
+
+    @abstractmethod
+    def receive(self, max_messages: int, wait_seconds: float) -> List[QueueMessage]:
+        """Receive up to max_messages, waiting at most wait_seconds for the first one"""
+        pass
+
+    @abstractmethod
+    def ack(self, messages: List[QueueMessage]) -> None:
+        """Delete processed messages (batch)"""
+        pass
+
+    @abstractmethod
+    def send(self, body: Dict[str, Any]) -> None:
+        """Enqueue a job"""
+        pass
+
+
+class SQSQueueBackend(QueueBackend):
+    """Amazon SQS backend (boto3)"""
+
+    MAX_BATCH = 10  # SQS limit per receive/delete call
+
+    def __init__(self, queue_url: str, region: Optional[str] = None, visibility_timeout: int = PROFILER_QUEUE_VISIBILITY_TIMEOUT):
+        """
+        Args:
+            queue_url: SQS queue URL
+            region: AWS region (default: AWS_REGION environment variable)
+            visibility_timeout: Visibility timeout set on every receive (seconds).
+                Overrides the queue's own setting (30s by default), which is
+                shorter than the request deadline.
+        """
+        import boto3  # Lazy import (only needed for the SQS backend)
+
+        self.client = boto3.client("sqs", region_name=region or os.getenv("AWS_REGION"))
+        self.queue_url = queue_url
+        self.visibility_timeout = visibility_timeout
+
+    def receive(self, max_messages: int, wait_seconds: float) -> List[QueueMessage]:
+        params = {
+            "QueueUrl": self.queue_url,
+            "MaxNumberOfMessages": max(1, min(self.MAX_BATCH, max_messages)),
+            "WaitTimeSeconds": int(min(20, max(0, wait_seconds))),
+            "VisibilityTimeout": self.visibility_timeout,
+            "AttributeNames": ["ApproximateReceiveCount"]
+        }
+        response = self.client.receive_message(**params)
+        return [
+            QueueMessage(
+                message["MessageId"],
+                message["ReceiptHandle"],
+                message["Body"],
+                int(message.get("Attributes", {}).get("ApproximateReceiveCount", 1))
+            )
+            for message in response.get("Messages", [])
+        ]
+
+    def ack(self, messages: List[QueueMessage]) -> None:
+        for start in range(0, len(messages), self.MAX_BATCH):
+            chunk = messages[start:start + self.MAX_BATCH]
+            response = self.client.delete_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[{"Id": str(i), "ReceiptHandle": m.receipt} for i, m in enumerate(chunk)]
+            )
+            for failed in response.get("Failed", []):
+                print(f"⚠️ Failed to delete SQS message: {failed}")
+
+    def send(self, body: Dict[str, Any]) -> None:
+        self.client.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(body))
+
+
+class SQLiteQueueBackend(QueueBackend):
+    """Local queue on SQLite (":memory:" for an in-process queue)"""
+
+    POLL_INTERVAL_SECONDS = 0.2
+
+    def __init__(self, path: str = ":memory:", visibility_timeout: float = PROFILER_QUEUE_VISIBILITY_TIMEOUT):
+        """
+        Args:
+            path: SQLite file path, or ":memory:"
+            visibility_timeout: Seconds a received message stays hidden before redelivery
+        """
+        self.visibility_timeout = visibility_timeout
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS profiler_jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " body TEXT NOT NULL,"
+            " visible_at REAL NOT NULL,"
+            " receive_count INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS profiler_jobs_visible_at ON profiler_jobs (visible_at)")
+
+    def _receive_now(self, max_messages: int) -> List[QueueMessage]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, body, receive_count FROM profiler_jobs WHERE visible_at <= ? ORDER BY id LIMIT ?",
+                    (now, max_messages)
+                ).fetchall()
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE profiler_jobs SET visible_at = ?, receive_count = receive_count + 1 WHERE id = ?",
+                        [(now + self.visibility_timeout, row[0]) for row in rows]
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [QueueMessage(str(row[0]), row[0], row[1], row[2] + 1) for row in rows]
+
+    def receive(self, max_messages: int, wait_seconds: float) -> List[QueueMessage]:
+        deadline = time.monotonic() + wait_seconds
+        while True:
+            messages = self._receive_now(max_messages)
+            if messages or time.monotonic() >= deadline:
+                return messages
+            time.sleep(self.POLL_INTERVAL_SECONDS)
+
+    def ack(self, messages: List[QueueMessage]) -> None:
+        if not messages:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM profiler_jobs WHERE id = ?", [(m.receipt,) for m in messages])
+
+    def send(self, body: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO profiler_jobs (body, visible_at) VALUES (?, ?)",
+                (json.dumps(body), time.time())
+            )
+
+    def depth(self) -> int:
+        """Number of messages in the queue (visible or in flight)"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM profiler_jobs").fetchone()[0]
+
+
+def parse_job(body: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Parse a message body into (job type, request fields)
+
+    Raises:
+        ValueError: If the body is not a valid profiler job
+    """
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if not isinstance(payload, dict):
+        raise ValueError("Message body must be a JSON object")
+
+    job_type = payload.pop("type", None)
+    if job_type is None:
+        if "recorded_at" in payload:
+            job_type = "spot"
+        elif "local_date" in payload:
+            job_type = "daily"
+        elif "week_start_date" in payload:
+            job_type = "weekly"
+    if job_type not in ("spot", "daily", "weekly"):
+        raise ValueError(f"Unknown job type: {job_type}")
+    return job_type, payload
+
+
+class QueueConsumer:
+    """Receives jobs in batches, runs them with bounded concurrency and acks in batches"""
+
+    def __init__(
+        self,
+        backend: QueueBackend,
+        concurrency: int = 4,
+        batch_size: int = 10,
+        wait_seconds: float = 20,
+        ack_batch_size: int = 10,
+        ack_interval_seconds: float = 1.0,
+        max_receive_count: int = PROFILER_QUEUE_MAX_RECEIVE_COUNT,
+        dead_letter: Optional[QueueBackend] = None
+    ):
+        """
+        Args:
+            max_receive_count: Receives after which a transiently failing message
+                is moved to dead_letter (or dropped when no dead_letter is set)
+            dead_letter: Queue for exhausted messages
+        """
+        self.backend = backend
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.wait_seconds = wait_seconds
+        self.ack_batch_size = ack_batch_size
+        self.ack_interval_seconds = ack_interval_seconds
+        self.max_receive_count = max_receive_count
+        self.dead_letter = dead_letter
+        self._stopping = False
+        self.processed = 0
+        self.failed = 0
+        self.dead_lettered = 0
+
+    def stop(self) -> None:
+        """Stop receiving; in-flight jobs are finished and acked"""
+        self._stopping = True
+
+    @staticmethod
+    def _build_job(job_type: str, fields: Dict[str, Any]):
+        """
+        Build the endpoint coroutine for a job
+
+        Raises:
+            ValueError: If fields don't match the request model (pydantic ValidationError)
+        """
+        import main
+
+        if job_type == "spot":
+            return main.spot_profiler(main.SpotProfilerRequest(**fields))
+        elif job_type == "daily":
+            return main.daily_profiler(main.DailyProfilerRequest(**fields))
+        return main.weekly_profiler(main.WeeklyProfilerRequest(**fields))
+
+    async def _handle(self, message: QueueMessage) -> Tuple[QueueMessage, bool]:
+        """
+        Process one message
+
+        Returns:
+            (message, ack): ack=True for success, permanent failures (bad body, 4xx)
+            and exhausted messages, False for transient failures (left for redelivery)
+        """
+        from fastapi import HTTPException
+
+        try:
+            job_type, fields = parse_job(message.body)
+            job = self._build_job(job_type, fields)
+        except ValueError as e:
+            print(f"❌ Dropping invalid message {message.message_id}: {e}")
+            return message, True
+
+        try:
+            await job
+            self.processed += 1
+            return message, True
+        except HTTPException as e:
+            self.failed += 1
+            permanent = 400 <= e.status_code < 500 and e.status_code != 429
+            if permanent:
+                print(f"❌ Job {message.message_id} ({job_type}) failed with {e.status_code} (dropped)")
+                return message, True
+            reason = f"{e.status_code}"
+        except Exception as e:
+            self.failed += 1
+            reason = f"{type(e).__name__}: {e}"
+
+        if message.receive_count < self.max_receive_count:
+            print(f"❌ Job {message.message_id} ({job_type}) failed: {reason} (will be redelivered)")
+            return message, False
+        return message, await self._dead_letter(message, job_type, reason)
+
+    async def _dead_letter(self, message: QueueMessage, job_type: str, reason: str) -> bool:
+        """
+        Move an exhausted message to the dead-letter queue (or drop it)
+
+        Returns:
+            bool: True if the message can be acked, False if the move failed
+        """
+        print(f"💀 Job {message.message_id} ({job_type}) failed: {reason} "
+              f"after {message.receive_count} receives"
+              + (" (dead-lettered)" if self.dead_letter else " (dropped)"))
+        if self.dead_letter is not None:
+            try:
+                await asyncio.to_thread(self.dead_letter.send, json.loads(message.body))
+            except Exception as e:
+                print(f"⚠️ Failed to dead-letter message {message.message_id}: {e} (will be redelivered)")
+                return False
+        self.dead_lettered += 1
+        return True
+
+    async def _flush_acks(self, pending_acks: List[QueueMessage]) -> None:
+        if not pending_acks:
+            return
+        batch = pending_acks[:]
+        pending_acks.clear()
+        try:
+            await asyncio.to_thread(self.backend.ack, batch)
+        except Exception as e:
+            print(f"⚠️ Failed to ack {len(batch)} messages: {e}")
+
+    async def run(self) -> None:
+        """Consume until stop() is called"""
+        in_flight = set()
+        pending_acks: List[QueueMessage] = []
+        last_flush = time.monotonic()
+
+        while not self._stopping or in_flight:
+            received = []
+            free = self.concurrency - len(in_flight)
+            if free > 0 and not self._stopping:
+                # Long-poll only when idle, otherwise keep finished jobs flowing to ack
+                wait = self.wait_seconds if not in_flight else 0
+                try:
+                    received = await asyncio.to_thread(self.backend.receive, min(self.batch_size, free), wait)
+                except Exception as e:
+                    print(f"⚠️ Failed to receive messages: {e}")
+                    await asyncio.sleep(1)
+                for message in received:
+                    in_flight.add(asyncio.create_task(self._handle(message)))
+
+            if in_flight and (not received or len(in_flight) >= self.concurrency or self._stopping):
+                done, in_flight = await asyncio.wait(
+                    in_flight, timeout=self.ack_interval_seconds, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    message, ack = task.result()
+                    if ack:
+                        pending_acks.append(message)
+
+            if len(pending_acks) >= self.ack_batch_size or (
+                pending_acks and time.monotonic() - last_flush >= self.ack_interval_seconds
+            ):
+                await self._flush_acks(pending_acks)
+                last_flush = time.monotonic()
+
+        await self._flush_acks(pending_acks)
+        print(f"🛑 Queue consumer stopped (processed={self.processed}, failed={self.failed}, dead_lettered={self.dead_lettered})")
+
+
+def create_backend(args: argparse.Namespace) -> QueueBackend:
+    if args.backend == "sqs":
+        if not args.queue_url:
+            raise ValueError("--queue-url (or PROFILER_QUEUE_URL) is required for the sqs backend")
+        return SQSQueueBackend(args.queue_url, visibility_timeout=args.visibility_timeout)
+    return SQLiteQueueBackend(args.sqlite_path, visibility_timeout=args.visibility_timeout)
+
+
+def create_dead_letter(args: argparse.Namespace) -> Optional[QueueBackend]:
+    if not args.dead_letter_queue_url:
+        return None
+    return SQSQueueBackend(args.dead_letter_queue_url)
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    import main
+
+    backend = create_backend(args)
+    consumer = QueueConsumer(
+        backend,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        wait_seconds=args.wait_seconds,
+        max_receive_count=args.max_receive_count,
+        dead_letter=create_dead_letter(args)
+    )
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, consumer.stop)
+
+    # Warm up Supabase/LLM clients before pulling jobs
+    await main.warm_up_until_ready()
+    print(f"📥 Queue consumer started (backend={args.backend}, concurrency={args.concurrency}, "
+          f"batch_size={args.batch_size}, visibility_timeout={args.visibility_timeout}s)")
+    await consumer.run()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Profiler queue consumer")
+    parser.add_argument("--backend", choices=["sqs", "sqlite"], default=os.getenv("PROFILER_QUEUE_BACKEND", "sqs"))
+    parser.add_argument("--queue-url", default=os.getenv("PROFILER_QUEUE_URL"))
+    parser.add_argument("--sqlite-path", default=os.getenv("PROFILER_QUEUE_SQLITE_PATH", "profiler_jobs.db"))
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("PROFILER_QUEUE_CONCURRENCY", "4")))
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("PROFILER_QUEUE_BATCH_SIZE", "10")))
+    parser.add_argument("--wait-seconds", type=float, default=float(os.getenv("PROFILER_QUEUE_WAIT_SECONDS", "20")))
+    parser.add_argument("--visibility-timeout", type=int, default=PROFILER_QUEUE_VISIBILITY_TIMEOUT)
+    parser.add_argument("--max-receive-count", type=int, default=PROFILER_QUEUE_MAX_RECEIVE_COUNT)
+    parser.add_argument("--dead-letter-queue-url", default=os.getenv("PROFILER_QUEUE_DLQ_URL"))
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    asyncio.run(main_async(parse_args()))
@@ -0,0 +1,90 @@
+"""
+In-process LRU cache for profiler results
+
+The POST profiler endpoints put each saved row here; the GET read endpoints
+serve the pre-encoded body with a content-hash ETag so polling clients get
+cheap 304 responses.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+import serialization
+
+CacheKey = Tuple[str, ...]
+
+
+class CachedResult:
+    """Encoded result row with its ETag"""
+
+    __slots__ = ("row", "body", "etag", "stored_at")
+
+    def __init__(self, row: Dict[str, Any]):
+        self.row = row
+        self.body = serialization.dumps(row, sort_keys=True)
+        self.etag = '"' + hashlib.blake2b(self.body, digest_size=16).hexdigest() + '"'
+        self.stored_at = time.monotonic()
+
+
+class ResultCache:
+    """Thread-safe LRU keyed by (table, device_id, date key)"""
+
+    def __init__(self, max_entries: int = 5000, ttl_seconds: float = 300):
+        self._entries: "OrderedDict[CacheKey, CachedResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: CacheKey) -> Optional[CachedResult]:
+        """Return the cached entry, or None if missing/expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry.stored_at > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: CacheKey, row: Dict[str, Any]) -> CachedResult:
+        """Store a row (encoding happens once here)"""
+        entry = CachedResult(row)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, key: CacheKey) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+        total = self.hits + self.misses
+        return {
+            "entries": size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None
+        }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
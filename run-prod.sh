@@ -31,14 +31,21 @@ docker-compose -f docker-compose.prod.yml down
 echo -e "\n${YELLOW}▶️  新しいコンテナを起動中...${NC}"
 docker-compose -f docker-compose.prod.yml up -d
 
-# 5. ヘルスチェック
-echo -e "\n${YELLOW}🔍 ヘルスチェック中...${NC}"
-sleep 5
-curl -f http://localhost:8051/health
-if [ $? -eq 0 ]; then
-    echo -e "\n${GREEN}✅ ヘルスチェック成功${NC}"
+# 5. レディネスチェック（Supabase/LLMクライアントのウォームアップ完了を待つ）
+echo -e "\n${YELLOW}🔍 レディネスチェック中...${NC}"
+READY=1
+for i in $(seq 1 30); do
+    if curl -sf http://localhost:8051/ready > /dev/null; then
+        READY=0
+        break
+    fi
+    sleep 1
+done
+curl -s http://localhost:8051/ready
+if [ $READY -eq 0 ]; then
+    echo -e "\n${GREEN}✅ レディネスチェック成功 (${i}秒)${NC}"
 else
-    echo -e "\n${RED}❌ ヘルスチェック失敗${NC}"
+    echo -e "\n${RED}❌ レディネスチェック失敗${NC}"
     docker logs profiler-api --tail 50
 fi
 
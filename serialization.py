@@ -0,0 +1,48 @@
+"""
+Shared JSON serialization layer
+
+All Supabase writes are encoded here in a single native pass with orjson:
+NaN/Infinity floats are emitted as null, numpy scalars/arrays and datetimes
+are encoded directly, so payloads no longer need to be walked in Python
+before being sent to PostgREST.
+"""
+
+from decimal import Decimal
+from typing import Any
+
+import orjson
+
+_DUMPS_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    """Fallback for types orjson does not encode natively"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(data: Any, sort_keys: bool = False) -> bytes:
+    """
+    Encode data to JSON bytes (NaN/Infinity → null)
+
+    Args:
+        data: Object to encode
+        sort_keys: Sort dict keys (stable bytes for content hashing)
+
+    Raises:
+        ValueError: If data contains values that cannot be encoded
+    """
+    option = _DUMPS_OPTIONS | orjson.OPT_SORT_KEYS if sort_keys else _DUMPS_OPTIONS
+    try:
+        return orjson.dumps(data, default=_default, option=option)
+    except orjson.JSONEncodeError as e:
+        raise ValueError(f"データがJSON形式に変換できません: {e}")
+
+
+def loads(data: Any) -> Any:
+    """Decode JSON bytes/str"""
+    return orjson.loads(data)
+
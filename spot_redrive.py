@@ -0,0 +1,312 @@
+"""
+Background re-drive of rate_limited / failed spot aggregators
+
+The spot error path marks spot_aggregators rows as profiler_status
+'rate_limited' or 'failed' and schedules them (profiler_next_attempt_at).
+Nothing re-processed those rows unless a caller happened to retry, so the
+backlog after a provider incident stayed behind. SpotRedriveSweeper drains it:
+
+- Keyset pages over due rows in the partial index
+  (profiler_next_attempt_at, device_id, recorded_at) WHERE profiler_status IN (...),
+  no OFFSET scans
+- Each row is claimed with a conditional update on its retry count (safe
+  with several sweepers), then re-run through the spot pipeline on the
+  backfill priority class
+- Starts are paced to the provider's spare per-minute budget (admission
+  control), keeping SPOT_REDRIVE_RESERVED_SHARE for live traffic, and pause
+  while live profiler calls are queued or a dependency circuit is open
+- Failures back off exponentially per row (profiler_next_attempt_at) up to
+  SPOT_REDRIVE_MAX_ATTEMPTS; 4xx (e.g. the prompt is gone) gives up at once
+
+SPOT_REDRIVE_ENABLED=true means the re-drive migration is applied: the
+API then schedules failed rows and, unless SPOT_REDRIVE_IN_PROCESS=false,
+runs the sweeper in-process. To run it standalone instead:
+    python spot_redrive.py
+"""
+
+import asyncio
+import os
+import random
+import signal
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from admission_control import AdmissionController, AdmissionRejected
+from deadlines import REQUEST_DEADLINE_SECONDS
+from llm_scheduler import LLMDispatcher, PRIORITY_SPOT, PRIORITY_DAILY, PRIORITY_WEEKLY, PRIORITY_BACKFILL
+
+SPOT_REDRIVE_ENABLED = os.getenv("SPOT_REDRIVE_ENABLED", "false").lower() == "true"
+# Run the sweeper inside the API process (false when a standalone sweeper is deployed)
+SPOT_REDRIVE_IN_PROCESS = os.getenv("SPOT_REDRIVE_IN_PROCESS", "true").lower() == "true"
+SPOT_REDRIVE_INTERVAL_SECONDS = float(os.getenv("SPOT_REDRIVE_INTERVAL_SECONDS", "60"))  # Pause between sweeps
+SPOT_REDRIVE_PAGE_SIZE = int(os.getenv("SPOT_REDRIVE_PAGE_SIZE", "50"))
+SPOT_REDRIVE_CONCURRENCY = int(os.getenv("SPOT_REDRIVE_CONCURRENCY", "2"))
+SPOT_REDRIVE_MAX_ATTEMPTS = int(os.getenv("SPOT_REDRIVE_MAX_ATTEMPTS", "5"))
+SPOT_REDRIVE_BASE_DELAY_SECONDS = float(os.getenv("SPOT_REDRIVE_BASE_DELAY_SECONDS", "60"))
+SPOT_REDRIVE_MAX_DELAY_SECONDS = float(os.getenv("SPOT_REDRIVE_MAX_DELAY_SECONDS", "21600"))  # 6 hours
+# Pace when LLM_PROVIDER_RPM_BUDGET is unlimited (0)
+SPOT_REDRIVE_MAX_PER_MINUTE = float(os.getenv("SPOT_REDRIVE_MAX_PER_MINUTE", "30"))
+# Share of the per-minute provider budget never used by re-drives
+SPOT_REDRIVE_RESERVED_SHARE = float(os.getenv("SPOT_REDRIVE_RESERVED_SHARE", "0.2"))
+
+REDRIVE_STATUSES = ("rate_limited", "failed")
+KEYSET_COLUMNS = ("profiler_next_attempt_at", "device_id", "recorded_at")
+LIVE_PRIORITIES = (PRIORITY_SPOT, PRIORITY_DAILY, PRIORITY_WEEKLY)
+# A claimed row becomes due again after this long if the sweeper dies mid re-drive
+REDRIVE_LEASE_SECONDS = REQUEST_DEADLINE_SECONDS * 2
+BUDGET_POLL_SECONDS = 5.0
+
+
+def utc_after(seconds: float) -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=seconds)).isoformat()
+
+
+def redrive_delay(attempt: int) -> float:
+    """Back-off after a failed re-drive attempt: base x 2^(attempt-1), capped, ±20% jitter"""
+    delay = min(SPOT_REDRIVE_MAX_DELAY_SECONDS, SPOT_REDRIVE_BASE_DELAY_SECONDS * 2 ** max(0, attempt - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def keyset_after(row: Dict[str, Any]) -> str:
+    """PostgREST or-filter for rows after `row` in (next_attempt_at, device_id, recorded_at) order"""
+    t, d, r = (f'"{row[column]}"' for column in KEYSET_COLUMNS)
+    return (
+        f"profiler_next_attempt_at.gt.{t},"
+        f"and(profiler_next_attempt_at.eq.{t},device_id.gt.{d}),"
+        f"and(profiler_next_attempt_at.eq.{t},device_id.eq.{d},recorded_at.gt.{r})"
+    )
+
+
+class SpotRedriveSweeper:
+    """Pages through due rate_limited / failed spot rows and re-drives them at the spare provider rate"""
+
+    def __init__(
+        self,
+        supabase: Callable[[], Any],
+        redrive: Callable[[str, str], Awaitable[Any]],
+        admission: AdmissionController,
+        dispatcher: LLMDispatcher,
+        page_size: int = SPOT_REDRIVE_PAGE_SIZE,
+        concurrency: int = SPOT_REDRIVE_CONCURRENCY,
+        max_attempts: int = SPOT_REDRIVE_MAX_ATTEMPTS,
+        interval_seconds: float = SPOT_REDRIVE_INTERVAL_SECONDS
+    ):
+        """
+        Args:
+            supabase: Returns the SupabaseClient
+            redrive: Runs the spot pipeline for (device_id, recorded_at); raises on failure
+                (exceptions with a 4xx status_code other than 429 are permanent)
+            admission: Admission controller (provider budget, in-flight cap, circuit state)
+            dispatcher: LLM dispatcher (re-drives pause while live calls are queued)
+            page_size: Rows per keyset page
+            concurrency: Re-drives running at once
+            max_attempts: Re-drive attempts per row before giving up
+            interval_seconds: Pause between sweeps
+        """
+        self.supabase = supabase
+        self.redrive = redrive
+        self.admission = admission
+        self.dispatcher = dispatcher
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.interval_seconds = interval_seconds
+
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._last_start = 0.0
+        self._counts = {
+            "sweeps": 0, "redriven": 0, "succeeded": 0, "failed": 0,
+            "exhausted": 0, "abandoned": 0, "claim_conflicts": 0, "deferred": 0
+        }
+        self._last_sweep: Dict[str, Any] = {}
+
+    def stop(self) -> None:
+        """Stop after the re-drives in flight"""
+        self._stopping = True
+        self._wakeup.set()
+
+    async def _sleep(self, seconds: float) -> None:
+        """Sleep that stop() interrupts"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), max(0.0, seconds))
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self) -> None:
+        """Sweep every interval until stop() is called"""
+        print(f"♻️ Spot re-drive sweeper started (page={self.page_size}, concurrency={self.concurrency}, max_attempts={self.max_attempts})")
+        while not self._stopping:
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"⚠️ Spot re-drive sweep failed: {type(e).__name__}: {e}")
+            await self._sleep(self.interval_seconds)
+        print(f"🛑 Spot re-drive sweeper stopped ({self._counts})")
+
+    async def sweep(self) -> int:
+        """
+        One pass over the rows due now, page by page
+
+        Returns:
+            Number of rows re-driven
+        """
+        started = time.monotonic()
+        due_before = datetime.now(timezone.utc).isoformat()
+        cursor: Optional[Dict[str, Any]] = None
+        tasks = set()
+        count = 0
+        try:
+            while not self._stopping:
+                page = await asyncio.to_thread(self._fetch_page, due_before, cursor)
+                for row in page:
+                    await self._wait_for_budget()
+                    if self._stopping:
+                        break
+                    while len(tasks) >= self.concurrency:
+                        _, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    tasks.add(asyncio.create_task(self._redrive_row(row)))
+                    count += 1
+                if len(page) < self.page_size:
+                    break
+                cursor = page[-1]
+        finally:
+            if tasks:
+                await asyncio.wait(tasks)
+            self._counts["sweeps"] += 1
+            self._last_sweep = {
+                "finished_at": datetime.now(timezone.utc).isoformat(),
+                "rows": count,
+                "seconds": round(time.monotonic() - started, 1)
+            }
+        if count:
+            print(f"♻️ Spot re-drive sweep: {count} rows in {self._last_sweep['seconds']}s")
+        return count
+
+    def _fetch_page(self, due_before: str, cursor: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Next keyset page of due rows (served by the partial re-drive index)"""
+        return self.supabase().select_page(
+            'spot_aggregators',
+            'device_id, recorded_at, profiler_status, profiler_retry_count, profiler_next_attempt_at',
+            [
+                ('profiler_status', 'in', f"({','.join(REDRIVE_STATUSES)})"),
+                ('profiler_next_attempt_at', 'lte', due_before),
+                ('profiler_retry_count', 'lt', self.max_attempts),
+            ],
+            ','.join(KEYSET_COLUMNS),
+            self.page_size,
+            or_filter=keyset_after(cursor) if cursor else None
+        )
+
+    def spare_rate(self) -> float:
+        """Re-drive starts per minute the provider budget can absorb right now"""
+        spare = self.admission.spare_rpm()
+        if spare is None:
+            return SPOT_REDRIVE_MAX_PER_MINUTE
+        return max(0.0, spare - self.admission.rpm_budget * SPOT_REDRIVE_RESERVED_SHARE)
+
+    async def _wait_for_budget(self) -> None:
+        """Pace starts to the spare rate; hold while live profiler calls are queued"""
+        while not self._stopping:
+            live_queued = sum(self.dispatcher.queue_depth(priority) for priority in LIVE_PRIORITIES)
+            rate = self.spare_rate()
+            if live_queued or rate <= 0:
+                await self._sleep(BUDGET_POLL_SECONDS)
+                continue
+            delay = self._last_start + 60 / rate - time.monotonic()
+            if delay <= 0:
+                self._last_start = time.monotonic()
+                return
+            await self._sleep(delay)
+
+    async def _admit(self) -> bool:
+        """Admit as backfill work, waiting out Retry-After on rejection (False when stopping)"""
+        while not self._stopping:
+            try:
+                self.admission.admit(PRIORITY_BACKFILL)
+                return True
+            except AdmissionRejected as e:
+                self._counts["deferred"] += 1
+                await self._sleep(e.retry_after)
+        return False
+
+    def _update(self, row: Dict[str, Any], data: Dict[str, Any], match: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return self.supabase().update_rows('spot_aggregators', data, {
+            'device_id': row['device_id'],
+            'recorded_at': row['recorded_at'],
+            **(match or {})
+        }, returning="representation")
+
+    async def _redrive_row(self, row: Dict[str, Any]) -> None:
+        key = f"{row['device_id']}/{row['recorded_at']}"
+        previous = row.get('profiler_retry_count') or 0
+        attempt = previous + 1
+        if not await self._admit():
+            return
+        try:
+            # Claim: only one sweeper wins the conditional update on the retry count
+            claimed = await asyncio.to_thread(self._update, row, {
+                'profiler_retry_count': attempt,
+                'profiler_next_attempt_at': utc_after(REDRIVE_LEASE_SECONDS)
+            }, {'profiler_status': row['profiler_status'], 'profiler_retry_count': previous})
+            if not claimed:
+                self._counts["claim_conflicts"] += 1
+                return
+
+            self._counts["redriven"] += 1
+            print(f"♻️ Re-driving spot {key} (attempt {attempt}/{self.max_attempts}, was {row['profiler_status']})")
+            try:
+                await self.redrive(row['device_id'], row['recorded_at'])
+                self._counts["succeeded"] += 1
+                return
+            except Exception as e:
+                status_code = getattr(e, 'status_code', None)
+                error = status_code or type(e).__name__
+                permanent = status_code is not None and 400 <= status_code < 500 and status_code != 429
+                self._counts["failed"] += 1
+        finally:
+            self.admission.release(PRIORITY_BACKFILL)
+
+        try:
+            if permanent:
+                self._counts["abandoned"] += 1
+                print(f"❌ Giving up on spot {key}: {status_code} is permanent")
+                await asyncio.to_thread(self._update, row, {'profiler_retry_count': self.max_attempts})
+            elif attempt >= self.max_attempts:
+                self._counts["exhausted"] += 1
+                print(f"❌ Giving up on spot {key} after {attempt} re-drive attempts")
+            else:
+                delay = redrive_delay(attempt)
+                print(f"⏳ Spot {key} re-drive failed ({error}), next attempt in {delay:.0f}s")
+                await asyncio.to_thread(self._update, row, {'profiler_next_attempt_at': utc_after(delay)})
+        except Exception as update_error:
+            print(f"⚠️ Failed to reschedule spot {key}: {update_error}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._counts,
+            "max_attempts": self.max_attempts,
+            "spare_rate_per_minute": round(self.spare_rate(), 1),
+            "last_sweep": self._last_sweep or None
+        }
+
+
+async def main_async() -> None:
+    import main
+
+    sweeper = main.spot_redrive_sweeper
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, sweeper.stop)
+
+    # Warm up Supabase/LLM clients before sweeping
+    await main.warm_up_until_ready()
+    await sweeper.run()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    asyncio.run(main_async())
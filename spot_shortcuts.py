@@ -0,0 +1,306 @@
+"""
+Spotプロンプトのショートカット：無発話の高速パスと類似プロンプトの結果再利用
+
+Spot録音の多く（無音、テレビの音、同じ時間帯の同じ習慣）はほぼ同一の内容だが、
+これまでは1件ごとにLLMを呼び出していた。LLMの前に2つのショートカットを置く:
+
+1. 無発話の高速パス: 録音固有部分の文字起こし欄（「文字起こし: 発話なし」のような
+   欄の値、または文字起こしセクションの最初の行）が無発話マーカーそのものである場合、
+   または発話率の特徴量が SPOT_NO_SPEECH_MAX_RATIO 以下の場合、ルールベースの固定結果を使う。
+   文字起こし本文の途中にマーカーの語句が含まれているだけでは一致しない。
+2. 類似プロンプトの再利用: デバイスごとに直近のLLM分析済みプロンプトを索引化
+   （文字3-gramの64bit SimHash、数字は正規化）。最近傍が SPOT_SIMHASH_MAX_DISTANCE
+   ビット以内かつ数値特徴量が近い場合、その分析結果を再利用し、vibe_scoreを
+   SPOT_REUSE_VIBE_WEIGHTS × 特徴量の差分で補正する。
+
+比較するのは録音固有部分のみ（prompt_templatesの固定プレフィックスは除く）。
+固定プレフィックスが未確定の間は、共通の指示文で全プロンプトが似て見えるため
+ショートカットは使わない。
+
+SPOT_SHORTCUT_MODE:
+- "off": 無効
+- "shadow"（デフォルト）: 判定と集計のみ行い、LLMは常に呼び出す。
+  ショートカットのvibe_scoreがLLMの結果とどれだけ離れていたかを記録する
+- "on": ショートカットの結果を使い、LLM呼び出しを省略する
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SPOT_SHORTCUT_MODE = os.getenv("SPOT_SHORTCUT_MODE", "shadow").lower()  # "off", "shadow", "on"
+
+# 類似プロンプトの再利用
+SPOT_SIMHASH_MAX_DISTANCE = int(os.getenv("SPOT_SIMHASH_MAX_DISTANCE", "3"))  # ハミング距離（64bit中）
+SPOT_REUSE_MAX_FEATURE_DELTA = float(os.getenv("SPOT_REUSE_MAX_FEATURE_DELTA", "0.25"))  # 特徴量ごとの相対差
+# 再利用時のvibe_score補正（特徴量1単位あたりの点数）:
+# 発話率が0.1高いと+2点、音量が1dB大きいと+0.5点（活発な時間ほど高めに）
+SPOT_REUSE_VIBE_WEIGHTS: Dict[str, float] = json.loads(
+    os.getenv("SPOT_REUSE_VIBE_WEIGHTS", '{"speech_ratio": 20, "loudness": 0.5}')
+)
+SPOT_SIMILARITY_MAX_PER_DEVICE = int(os.getenv("SPOT_SIMILARITY_MAX_PER_DEVICE", "50"))
+SPOT_SIMILARITY_MAX_DEVICES = int(os.getenv("SPOT_SIMILARITY_MAX_DEVICES", "5000"))
+SPOT_SIMILARITY_TTL_HOURS = float(os.getenv("SPOT_SIMILARITY_TTL_HOURS", "24"))
+
+# 無発話の高速パス
+SPOT_NO_SPEECH_MARKERS: List[str] = [
+    marker.strip() for marker in os.getenv(
+        "SPOT_NO_SPEECH_MARKERS", "発話なし,発話は検出されませんでした,音声なし,文字起こしなし,なし,No speech detected"
+    ).split(",") if marker.strip()
+]
+# マーカーを照合する文字起こし欄／セクションの名前
+SPOT_TRANSCRIPTION_FIELDS: List[str] = [
+    field.strip().lower() for field in os.getenv(
+        "SPOT_TRANSCRIPTION_FIELDS", "文字起こし,文字起こし結果,発話内容,transcription,transcript"
+    ).split(",") if field.strip()
+]
+SPOT_SPEECH_RATIO_FEATURE = os.getenv("SPOT_SPEECH_RATIO_FEATURE", "speech_ratio")
+SPOT_NO_SPEECH_MAX_RATIO = float(os.getenv("SPOT_NO_SPEECH_MAX_RATIO", "0.0"))
+
+NO_SPEECH_MODEL = "rule/no-speech"
+
+_FEATURE_PATTERN = re.compile(r"([A-Za-z_][A-Za-z0-9_ ]{0,40}?)\s*[:=]\s*(-?\d+(?:\.\d+)?)")
+_FIELD_LINE = re.compile(r"^([^:：=]{1,40}?)\s*[:：=]\s*(.*)$")
+_HEADING_DECORATION = "#■□●◆・*-[]【】()（）〈〉<> \t:："
+_VALUE_DECORATION = " \t「」『』\"'()（）[]【】。.、,"
+_DIGITS = re.compile(r"\d+(?:\.\d+)?")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def extract_features(text: str) -> Dict[str, float]:
+    """プロンプト中の数値の `名前: 値` の組（例: "speech_ratio: 0.12", "loudness = -32.5"）"""
+    features = {}
+    for name, value in _FEATURE_PATTERN.findall(text):
+        features[_WHITESPACE.sub("_", name.strip().lower())] = float(value)
+    return features
+
+
+_BIT_POSITIONS = np.arange(64, dtype=np.uint64)
+
+
+def simhash(text: str) -> int:
+    """文字3-gramの64bit SimHash（数値は特徴量として別に比較するため0に正規化）"""
+    normalized = _WHITESPACE.sub(" ", _DIGITS.sub("0", text)).strip()
+    digests = b"".join(
+        hashlib.blake2b(normalized[i:i + 3].encode("utf-8"), digest_size=8).digest()
+        for i in range(max(1, len(normalized) - 2))
+    )
+    hashes = np.frombuffer(digests, dtype=">u8").astype(np.uint64)
+    # ビットごとに（立っているshingle数）-（立っていないshingle数）> 0 なら1
+    set_counts = ((hashes[:, None] >> _BIT_POSITIONS) & np.uint64(1)).sum(axis=0)
+    return sum(1 << bit for bit in range(64) if 2 * int(set_counts[bit]) > len(hashes))
+
+
+class PromptSignature:
+    """録音固有部分のSimHashと数値特徴量（リクエストごとに1回だけ計算する）"""
+
+    __slots__ = ("text", "features", "fingerprint")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.features = extract_features(text)
+        self.fingerprint = simhash(text)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def transcription_status(text: str) -> Optional[str]:
+    """
+    文字起こし欄の値、または文字起こしセクションの最初の行を返す（見つからなければNone）
+
+    - 欄: "文字起こし: 発話なし" → "発話なし"
+    - セクション: "## 文字起こし" / "【文字起こし】" / "文字起こし:" の次の空でない行
+    """
+    in_section = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if in_section:
+            return stripped.strip(_VALUE_DECORATION)
+        heading = stripped.strip(_HEADING_DECORATION).lower()
+        if heading in SPOT_TRANSCRIPTION_FIELDS:
+            in_section = True
+            continue
+        match = _FIELD_LINE.match(stripped)
+        if match and match.group(1).strip(_HEADING_DECORATION).lower() in SPOT_TRANSCRIPTION_FIELDS:
+            value = match.group(2).strip(_VALUE_DECORATION)
+            if value:
+                return value
+            in_section = True
+    return None
+
+
+def is_no_speech(text: str, features: Dict[str, float]) -> bool:
+    """
+    無発話の判定：文字起こし欄がマーカーそのもの、または発話率が閾値以下
+
+    文字起こし本文にマーカーの語句（例:「音声なし」）が含まれるだけでは無発話としない。
+    """
+    if transcription_status(text) in SPOT_NO_SPEECH_MARKERS:
+        return True
+    ratio = features.get(SPOT_SPEECH_RATIO_FEATURE)
+    return ratio is not None and ratio <= SPOT_NO_SPEECH_MAX_RATIO
+
+
+def no_speech_result() -> Dict[str, Any]:
+    """発話のない録音に対する決定的なSpot結果"""
+    return {
+        "summary": "発話は検出されませんでした。静かな時間を過ごしている様子。",
+        "vibe_score": 0,
+        "behavior": "静寂, 休息, 一人の時間",
+        "emotion": "",
+        "rating": 0,
+        "analysis_source": "no_speech_rule"
+    }
+
+
+def features_close(a: Dict[str, float], b: Dict[str, float]) -> bool:
+    """共通する数値特徴量がすべて SPOT_REUSE_MAX_FEATURE_DELTA（相対差）以内か"""
+    for name in a.keys() & b.keys():
+        scale = max(abs(a[name]), abs(b[name]), 1.0)
+        if abs(a[name] - b[name]) > SPOT_REUSE_MAX_FEATURE_DELTA * scale:
+            return False
+    return True
+
+
+def adjust_vibe_score(vibe_score: Any, features: Dict[str, float], neighbour_features: Dict[str, float]) -> Any:
+    """近傍のvibe_score + Σ(重み × 特徴量の差分)、-100..100に収める"""
+    if not isinstance(vibe_score, (int, float)) or isinstance(vibe_score, bool):
+        return vibe_score
+    delta = sum(
+        weight * (features[name] - neighbour_features[name])
+        for name, weight in SPOT_REUSE_VIBE_WEIGHTS.items()
+        if name in features and name in neighbour_features
+    )
+    return round(max(-100.0, min(100.0, vibe_score + delta)), 1)
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "features", "result", "model", "recorded_at", "stored_at")
+
+    def __init__(self, fingerprint: int, features: Dict[str, float], result: Dict[str, Any], model: str, recorded_at: str):
+        self.fingerprint = fingerprint
+        self.features = features
+        self.result = result
+        self.model = model
+        self.recorded_at = recorded_at
+        self.stored_at = time.monotonic()
+
+
+class SpotShortcuts:
+    """デバイスごとの類似索引とヒット率・シャドー誤差の集計（スレッドセーフ）"""
+
+    def __init__(self, mode: str = SPOT_SHORTCUT_MODE):
+        self.mode = mode
+        self._devices: "OrderedDict[str, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"lookups": 0, "no_template": 0, "no_speech": 0, "reuse": 0, "miss": 0}
+        self._shadow_errors = {"no_speech": deque(maxlen=500), "reuse": deque(maxlen=500)}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("shadow", "on")
+
+    def lookup(self, device_id: str, signature: Optional[PromptSignature]) -> Optional[Tuple[str, Dict[str, Any], str]]:
+        """
+        Spotプロンプトに使えるショートカットを探す
+
+        Args:
+            device_id (str): 録音のデバイスID
+            signature (PromptSignature, optional): 録音固有部分のシグネチャ（固定プレフィックス未確定ならNone）
+
+        Returns:
+            (種別, 結果, モデル名)。種別は "no_speech" または "reuse"。該当なしはNone（LLMを呼び出す）
+        """
+        with self._lock:
+            self._counts["lookups"] += 1
+            if signature is None:
+                self._counts["no_template"] += 1
+                return None
+
+        features, fingerprint = signature.features, signature.fingerprint
+        if is_no_speech(signature.text, features):
+            with self._lock:
+                self._counts["no_speech"] += 1
+            return "no_speech", no_speech_result(), NO_SPEECH_MODEL
+
+        best, best_distance = None, None
+        with self._lock:
+            for entry in self._entries(device_id):
+                distance = hamming(fingerprint, entry.fingerprint)
+                if distance <= SPOT_SIMHASH_MAX_DISTANCE and (best is None or distance < best_distance) \
+                        and features_close(features, entry.features):
+                    best, best_distance = entry, distance
+            self._counts["reuse" if best else "miss"] += 1
+        if best is None:
+            return None
+
+        result = dict(best.result)
+        result["vibe_score"] = adjust_vibe_score(best.result.get("vibe_score"), features, best.features)
+        result["analysis_source"] = "near_duplicate_reuse"
+        result["reused_from"] = {"recorded_at": best.recorded_at, "simhash_distance": best_distance}
+        return "reuse", result, f"reuse/{best.model}"
+
+    def add(self, device_id: str, recorded_at: str, signature: Optional[PromptSignature], result: Dict[str, Any], model: str) -> None:
+        """LLMが生成した結果を索引に追加（誤差が蓄積しないようショートカットの結果は追加しない）"""
+        if not self.enabled or signature is None or 'processing_error' in result:
+            return
+        entry = _Entry(signature.fingerprint, signature.features, result, model, recorded_at)
+        with self._lock:
+            entries = self._devices.get(device_id)
+            if entries is None:
+                entries = deque(maxlen=SPOT_SIMILARITY_MAX_PER_DEVICE)
+                self._devices[device_id] = entries
+                while len(self._devices) > SPOT_SIMILARITY_MAX_DEVICES:
+                    self._devices.popitem(last=False)
+            self._devices.move_to_end(device_id)
+            entries.append(entry)
+
+    def record_shadow(self, kind: str, shortcut_result: Dict[str, Any], llm_result: Dict[str, Any]) -> None:
+        """シャドーモード：ショートカットのvibe_scoreとLLMの結果の差を記録"""
+        a, b = shortcut_result.get("vibe_score"), llm_result.get("vibe_score")
+        if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+            with self._lock:
+                self._shadow_errors[kind].append(abs(a - b))
+
+    def _entries(self, device_id: str) -> List[_Entry]:
+        entries = self._devices.get(device_id)
+        if not entries:
+            return []
+        cutoff = time.monotonic() - SPOT_SIMILARITY_TTL_HOURS * 3600
+        while entries and entries[0].stored_at < cutoff:
+            entries.popleft()
+        return list(entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+            lookups = counts["lookups"]
+            shadow = {
+                kind: {
+                    "samples": len(errors),
+                    "mean_abs_vibe_error": round(sum(errors) / len(errors), 2) if errors else None
+                }
+                for kind, errors in self._shadow_errors.items()
+            }
+            indexed = sum(len(entries) for entries in self._devices.values())
+            devices = len(self._devices)
+        return {
+            "mode": self.mode,
+            **counts,
+            "no_speech_rate": round(counts["no_speech"] / lookups, 4) if lookups else None,
+            "reuse_rate": round(counts["reuse"] / lookups, 4) if lookups else None,
+            "indexed_prompts": indexed,
+            "indexed_devices": devices,
+            "shadow": shadow if self.mode == "shadow" else None
+        }
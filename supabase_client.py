@@ -3,24 +3,189 @@ Supabase Client for vibe_whisper_prompt and vibe_whisper_summary tables
 """
 
 import os
-import math
-from typing import Dict, Any, Optional, List
-from supabase import create_client, Client
+from typing import Dict, Any, Optional, List, Tuple, TYPE_CHECKING
 from datetime import datetime
-import json
+
+import serialization
+from circuit_breaker import get_breaker
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+# Circuit breaker: calls slower than this count as slow
+SUPABASE_SLOW_CALL_SECONDS = float(os.getenv("SUPABASE_SLOW_CALL_SECONDS", "5"))
+
+
+class SupabaseWriteError(Exception):
+    """Raised when PostgREST rejects a write request"""
+
+    def __init__(self, table: str, status_code: int, message: str):
+        self.table = table
+        self.status_code = status_code
+        super().__init__(f"Write to {table} failed ({status_code}): {message}")
+
 
 class SupabaseClient:
     def __init__(self):
         """Initialize Supabase client"""
+        from supabase import create_client  # Lazy import (keeps module import fast)
+
         url = os.getenv("SUPABASE_URL")
         key = os.getenv("SUPABASE_KEY")
         
         if not url or not key:
             raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
         
-        self.client: Client = create_client(url, key)
+        self.client: "Client" = create_client(url, key)
+        self.breaker = get_breaker("supabase", slow_call_seconds=SUPABASE_SLOW_CALL_SECONDS)
         print(f"✅ Supabase client initialized: {url}")
     
+    def ping(self) -> None:
+        """Issue a minimal query to open the PostgREST connection pool"""
+        self.select_rows('spot_aggregators', 'device_id', {}, limit=1)
+    
+    def select_rows(
+        self,
+        table: str,
+        columns: str,
+        match: Dict[str, Any],
+        order_by: Optional[str] = None,
+        desc: bool = False,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        SELECT rows matching all column=value pairs in match (circuit breaker guarded)
+        
+        Args:
+            table: Table name
+            columns: Comma-separated columns (e.g. 'prompt, local_date')
+            match: Equality filters
+            order_by: Column to order by
+            desc: Descending order
+            limit: Max rows
+        
+        Raises:
+            CircuitOpenError: If the Supabase circuit is open
+        """
+        with self.breaker.guard():
+            query = self.client.table(table).select(columns)
+            for column, value in match.items():
+                query = query.eq(column, value)
+            if order_by:
+                query = query.order(order_by, desc=desc)
+            if limit:
+                query = query.limit(limit)
+            return query.execute().data or []
+    
+    def select_page(
+        self,
+        table: str,
+        columns: str,
+        filters: List[Tuple[str, str, Any]],
+        order_by: str,
+        limit: int,
+        or_filter: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        SELECT one keyset page with PostgREST operator filters (circuit breaker guarded)
+        
+        Args:
+            table: Table name
+            columns: Comma-separated columns
+            filters: (column, operator, value) tuples, e.g. ('profiler_retry_count', 'lt', 5)
+            order_by: Comma-separated columns, ascending (the keyset order)
+            limit: Page size
+            or_filter: PostgREST or=(...) expression without the outer parentheses (keyset cursor)
+        
+        Raises:
+            CircuitOpenError: If the Supabase circuit is open
+        """
+        with self.breaker.guard():
+            query = self.client.table(table).select(columns)
+            for column, operator, value in filters:
+                query = query.filter(column, operator, value)
+            if or_filter:
+                query = query.or_(or_filter)
+            return query.order(order_by).limit(limit).execute().data or []
+    
+    def _write(
+        self,
+        method: str,
+        table: str,
+        data: Any,
+        params: Dict[str, str],
+        prefer: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Send a write request to PostgREST with a body pre-encoded by serialization.dumps
+        
+        The payload is sanitized (NaN/Infinity → null) and encoded in one pass,
+        then sent as raw bytes on the postgrest session (auth headers and
+        connection pool are shared with self.client).
+        
+        Returns:
+            List[Dict]: Returned rows (empty unless returning="representation")
+        
+        Raises:
+            SupabaseWriteError: If PostgREST returns an error status
+            CircuitOpenError: If the Supabase circuit is open
+        """
+        body = serialization.dumps(data)
+        with self.breaker.guard():
+            response = self.client.postgrest.session.request(
+                method,
+                f"/{table}",
+                content=body,
+                params=params,
+                headers={
+                    "Content-Type": "application/json",
+                    "Prefer": prefer
+                }
+            )
+            if response.status_code >= 400:
+                raise SupabaseWriteError(table, response.status_code, response.text[:500])
+        if not response.content:
+            return []
+        return serialization.loads(response.content)
+    
+    def upsert_row(
+        self,
+        table: str,
+        data: Any,
+        on_conflict: Optional[str] = None,
+        returning: str = "minimal"
+    ) -> List[Dict[str, Any]]:
+        """
+        UPSERT row(s) into table (merge on primary key or on_conflict columns)
+        
+        Args:
+            table: Table name
+            data: Row dict or list of row dicts
+            on_conflict: Comma-separated conflict columns (default: primary key)
+            returning: "minimal" or "representation"
+        """
+        params = {"on_conflict": on_conflict} if on_conflict else {}
+        return self._write("POST", table, data, params, f"resolution=merge-duplicates,return={returning}")
+    
+    def update_rows(
+        self,
+        table: str,
+        data: Dict[str, Any],
+        match: Dict[str, Any],
+        returning: str = "minimal"
+    ) -> List[Dict[str, Any]]:
+        """
+        UPDATE rows matching all column=value pairs in match
+        
+        Args:
+            table: Table name
+            data: Columns to update
+            match: Equality filters (e.g. {'device_id': ..., 'recorded_at': ...})
+            returning: "minimal" or "representation"
+        """
+        params = {column: f"eq.{value}" for column, value in match.items()}
+        return self._write("PATCH", table, data, params, f"return={returning}")
+    
     async def get_vibe_whisper_prompt(self, device_id: str, target_date: str) -> Optional[Dict[str, Any]]:
         """
         vibe_whisper_promptテーブルから指定したdevice_idと日付のプロンプトを取得
@@ -78,66 +243,33 @@ class SupabaseClient:
             bool: 保存成功時True
         """
         try:
-            # NaN/Infinity値をNoneに変換する関数
-            def sanitize_value(value):
-                if isinstance(value, float):
-                    if math.isnan(value) or math.isinf(value):
-                        return None
-                return value
-            
-            def sanitize_list(lst):
-                if lst is None:
-                    return []
-                return [sanitize_value(item) if not isinstance(item, dict) else sanitize_dict(item) for item in lst]
-            
-            def sanitize_dict(d):
-                if d is None:
-                    return {}
-                result = {}
-                for key, value in d.items():
-                    if isinstance(value, list):
-                        result[key] = sanitize_list(value)
-                    elif isinstance(value, dict):
-                        result[key] = sanitize_dict(value)
-                    else:
-                        result[key] = sanitize_value(value)
-                return result
-            
-            # データをサニタイズ
+            # NaN/Infinityはserialization.dumpsでnullに変換される
             data = {
                 'device_id': device_id,
                 'date': target_date,
-                'vibe_scores': sanitize_list(vibe_scores),  # NaN/InfinityをNoneに変換
-                'average_score': sanitize_value(average_score),
-                'positive_hours': sanitize_value(positive_hours),
-                'negative_hours': sanitize_value(negative_hours),
-                'neutral_hours': sanitize_value(neutral_hours),
+                'vibe_scores': vibe_scores if vibe_scores else [],
+                'average_score': average_score,
+                'positive_hours': positive_hours,
+                'negative_hours': negative_hours,
+                'neutral_hours': neutral_hours,
                 'insights': insights if insights else [],  # Noneの場合は空リスト
-                'vibe_changes': sanitize_list(vibe_changes) if vibe_changes else [],  # NaN/InfinityをNoneに変換
+                'vibe_changes': vibe_changes if vibe_changes else [],
                 'processed_at': datetime.now().isoformat(),
-                'processing_log': sanitize_dict(processing_log) if processing_log else {}  # NaN/InfinityをNoneに変換
+                'processing_log': processing_log if processing_log else {}
             }
             
             # デバッグ用：保存するデータを確認
-            import json
             print(f"📝 Saving data to vibe_whisper_summary:")
             print(f"   device_id: {data['device_id']}")
             print(f"   date: {data['date']}")
-            print(f"   vibe_scores length: {len(data['vibe_scores']) if data['vibe_scores'] else 0}")
+            print(f"   vibe_scores length: {len(data['vibe_scores'])}")
             print(f"   average_score: {data['average_score']}")
             
-            # JSONシリアライズ可能か確認
-            try:
-                json.dumps(data)
-            except (TypeError, ValueError) as json_error:
-                print(f"❌ JSON serialization error: {json_error}")
-                print(f"   Problematic data: {data}")
-                raise ValueError(f"データがJSON形式に変換できません: {json_error}")
-            
             # UPSERT (既存レコードがあれば更新、なければ挿入)
-            response = self.client.table('vibe_whisper_summary').upsert(data).execute()
+            # JSONに変換できないデータはserialization.dumpsがValueErrorを送出
+            response_data = self.upsert_row('vibe_whisper_summary', data, returning="representation")
             
-            if response.data:
+            if response_data:
                 print(f"✅ Successfully saved to vibe_whisper_summary: device_id={device_id}, date={target_date}")
                 return True
             else:
@@ -199,53 +331,26 @@ class SupabaseClient:
             bool: 更新成功時True
         """
         try:
-            # NaN/Infinity値をNoneに変換する関数
-            def sanitize_value(value):
-                if isinstance(value, float):
-                    if math.isnan(value) or math.isinf(value):
-                        return None
-                return value
-            
-            def sanitize_dict(d):
-                if d is None:
-                    return {}
-                result = {}
-                for key, value in d.items():
-                    if isinstance(value, list):
-                        result[key] = [sanitize_value(item) if not isinstance(item, dict) else sanitize_dict(item) for item in value]
-                    elif isinstance(value, dict):
-                        result[key] = sanitize_dict(value)
-                    else:
-                        result[key] = sanitize_value(value)
-                return result
-            
-            # 更新データを準備
+            # 更新データを準備（NaN/Infinityはserialization.dumpsでnullに変換される）
             update_data = {
-                'analysis_result': sanitize_dict(analysis_result),
+                'analysis_result': analysis_result if analysis_result is not None else {},
                 'updated_at': datetime.now().isoformat()
             }
             
             # オプションフィールドの追加
             if vibe_scores is not None:
-                update_data['vibe_scores'] = [sanitize_value(score) for score in vibe_scores]
+                update_data['vibe_scores'] = vibe_scores
             
             if average_vibe is not None:
-                update_data['average_vibe'] = sanitize_value(average_vibe)
+                update_data['average_vibe'] = average_vibe
             
             if insights is not None:
                 update_data['insights'] = insights
             
             # burst_eventsの追加（新規）
             if burst_events is not None:
-                # burst_eventsはリストなので、各イベントをサニタイズ
                 if isinstance(burst_events, list):
-                    sanitized_events = []
-                    for event in burst_events:
-                        if isinstance(event, dict):
-                            sanitized_events.append(sanitize_dict(event))
-                        else:
-                            sanitized_events.append(event)
-                    update_data['burst_events'] = sanitized_events
+                    update_data['burst_events'] = burst_events
                 else:
                     # リストでない場合は空のリストまたはNoneをセット
                     update_data['burst_events'] = [] if burst_events else None
@@ -257,9 +362,14 @@ class SupabaseClient:
             print(f"   fields to update: {list(update_data.keys())}")
             
             # UPDATE実行
-            response = self.client.table('dashboard_summary').update(update_data).eq('device_id', device_id).eq('date', target_date).execute()
+            response_data = self.update_rows(
+                'dashboard_summary',
+                update_data,
+                {'device_id': device_id, 'date': target_date},
+                returning="representation"
+            )
             
-            if response.data:
+            if response_data:
                 print(f"✅ Successfully updated dashboard_summary: device_id={device_id}, date={target_date}")
                 return True
             else:
@@ -0,0 +1,68 @@
+"""Tests for admission control (CORS on shed responses, per-class circuit dependencies)"""
+
+import os
+import time
+
+import pytest
+
+for _name in ("SUPABASE_URL", "SUPABASE_KEY", "OPENAI_API_KEY"):
+    os.environ.setdefault(_name, "http://localhost" if _name == "SUPABASE_URL" else "test")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import llm_providers  # noqa: E402
+import main  # noqa: E402
+from admission_control import AdmissionController, AdmissionRejected  # noqa: E402
+from circuit_breaker import OPEN, get_breaker  # noqa: E402
+from llm_scheduler import LLMDispatcher  # noqa: E402
+from llm_providers import GenerationProfile  # noqa: E402
+
+def test_shed_response_carries_cors_headers(monkeypatch):
+    def reject(priority, deadline_seconds):
+        raise AdmissionRejected(429, "in_flight_limit", 2.5, "Too many requests in flight")
+
+    monkeypatch.setattr(main.admission_controller, "admit", reject)
+    client = TestClient(main.app)
+    response = client.post(
+        "/spot-profiler",
+        json={},
+        headers={"Origin": "https://example.com"}
+    )
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "3"
+    assert response.headers["access-control-allow-origin"] in ("*", "https://example.com")
+
+def test_each_class_is_gated_only_on_its_own_provider(monkeypatch):
+    monkeypatch.setattr(llm_providers, "GENERATION_PROFILES", {
+        "spot": GenerationProfile(),
+        "daily": GenerationProfile(provider="Local", model="qwen"),
+    })
+    assert llm_providers.profile_provider("spot") == llm_providers.CURRENT_PROVIDER.lower()
+    assert llm_providers.profile_provider("daily") == "local"
+    assert llm_providers.profile_provider("weekly") == llm_providers.CURRENT_PROVIDER.lower()
+
+
+def test_open_circuit_only_sheds_classes_that_depend_on_it(monkeypatch):
+    controller = AdmissionController(
+        LLMDispatcher(max_concurrency=4),
+        dependencies={"spot": ["test-admission-openai"], "daily": ["test-admission-local"]}
+    )
+    breaker = get_breaker("test-admission-local")
+    monkeypatch.setattr(breaker, "_state", OPEN)
+    monkeypatch.setattr(breaker, "_opened_at", time.monotonic())
+
+    controller.admit("spot")
+    controller.release("spot")
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit("daily")
+    assert rejected.value.status_code == 503
+
+
+def test_admission_ignores_the_cascade_fast_provider():
+    assert main.admission_controller.dependencies["spot"] == [llm_providers.profile_provider("spot"), "supabase"]
+    assert main.admission_controller.dependencies["backfill"] == main.admission_controller.dependencies["spot"]
+    if llm_providers.CASCADE_FAST_PROVIDER != llm_providers.profile_provider("spot"):
+        assert all(
+            llm_providers.CASCADE_FAST_PROVIDER not in names
+            for names in main.admission_controller.dependencies.values()
+        )
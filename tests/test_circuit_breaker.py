@@ -0,0 +1,130 @@
+"""Tests for circuit_breaker (error classification, state transitions)"""
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, is_transient_error
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_breaker(**settings):
+    defaults = dict(
+        failure_rate_threshold=0.5, slow_call_rate_threshold=0.8, slow_call_seconds=10,
+        window_seconds=60, minimum_calls=4, open_seconds=30, half_open_max_calls=1
+    )
+    defaults.update(settings)
+    return CircuitBreaker("test", **defaults)
+
+
+def fail(breaker, error=None):
+    with pytest.raises(Exception):
+        with breaker.guard():
+            raise error or StatusError(503)
+
+
+def succeed(breaker):
+    with breaker.guard():
+        pass
+
+
+def test_is_transient_error():
+    assert is_transient_error(StatusError(429))
+    assert is_transient_error(StatusError(408))
+    assert is_transient_error(StatusError(502))
+    assert not is_transient_error(StatusError(400))
+    assert not is_transient_error(StatusError(404))
+    assert is_transient_error(TimeoutError())
+    assert is_transient_error(ConnectionResetError())
+    assert is_transient_error(APITimeoutError())
+    assert not is_transient_error(ValueError("bad json"))
+    assert not is_transient_error(CircuitOpenError("x", 1))
+
+
+def test_opens_on_failure_rate_after_minimum_calls(clock):
+    breaker = make_breaker()
+    fail(breaker)
+    fail(breaker)
+    fail(breaker)
+    assert breaker.state == CLOSED  # below minimum_calls
+    succeed(breaker)
+    assert breaker.state == OPEN  # 3/4 failed
+    with pytest.raises(CircuitOpenError) as e:
+        with breaker.guard():
+            pytest.fail("body must not run while open")
+    assert e.value.retry_after == pytest.approx(30)
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_client_errors_do_not_count(clock):
+    breaker = make_breaker()
+    for _ in range(6):
+        fail(breaker, StatusError(400))
+    assert breaker.state == CLOSED
+    assert breaker.stats()["window_failure_rate"] == 0.0
+
+
+def test_opens_on_slow_calls(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.after_call(breaker.before_call(), False, latency=12)
+    assert breaker.state == OPEN
+
+
+def test_old_calls_leave_the_window(clock):
+    breaker = make_breaker()
+    fail(breaker)
+    fail(breaker)
+    fail(breaker)
+    clock[0] += 61
+    succeed(breaker)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["window_calls"] == 1
+
+
+def test_half_open_probe_success_closes(clock):
+    breaker = make_breaker(minimum_calls=1, failure_rate_threshold=1.0)
+    fail(breaker)
+    assert breaker.state == OPEN
+    clock[0] += 30
+    assert breaker.state == HALF_OPEN
+    probe = breaker.before_call()
+    assert probe is True
+    # Only half_open_max_calls probes at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.after_call(probe, False, latency=0.1)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_failure_reopens(clock):
+    breaker = make_breaker(minimum_calls=1, failure_rate_threshold=1.0)
+    fail(breaker)
+    clock[0] += 30
+    fail(breaker)
+    assert breaker.state == OPEN
+    assert breaker.retry_after() == pytest.approx(30)
+    assert breaker.stats()["opened_count"] == 2
+
+
+def test_sdk_retries_are_disabled(monkeypatch):
+    """Retries belong to tenacity: one attempt must be one HTTP call"""
+    pytest.importorskip("openai")
+    from llm_providers import OpenAIProvider
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    assert OpenAIProvider("gpt-4o-mini").client.max_retries == 0
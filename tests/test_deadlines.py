@@ -0,0 +1,95 @@
+"""Tests for per-attempt deadline budgets (deadlines + attempt_timeout_params)"""
+
+import asyncio
+import time
+
+import pytest
+
+import deadlines
+from conftest import chat_completion
+from deadlines import ClientDisconnected, Deadline, DeadlineExceeded, DEADLINE_STAGE_SHARES
+from llm_providers import LLM_ATTEMPT_TIMEOUT_SECONDS, OpenAIProvider, attempt_timeout_params
+
+
+def test_attempt_timeout_is_a_share_of_the_budget():
+    assert attempt_timeout_params(None) == {"timeout": LLM_ATTEMPT_TIMEOUT_SECONDS}
+    assert attempt_timeout_params(None, default=7) == {"timeout": 7}
+    timeout = attempt_timeout_params(Deadline(10))["timeout"]
+    assert timeout == pytest.approx(10 * DEADLINE_STAGE_SHARES["llm_attempt"], abs=0.05)
+
+
+def test_attempt_timeout_raises_when_budget_is_spent():
+    deadline = Deadline(0.01)
+    time.sleep(0.02)
+    with pytest.raises(DeadlineExceeded):
+        attempt_timeout_params(deadline)
+
+
+def test_slow_provider_costs_one_http_call_within_the_attempt_budget(stub_server, monkeypatch):
+    def slow(body):
+        time.sleep(1.5)
+        return 200, chat_completion("late")
+
+    stub_server.route("/v1/chat/completions", slow)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_BASE_URL", stub_server.base_url)
+    provider = OpenAIProvider(model="gpt-4o-mini")
+
+    started = time.monotonic()
+    with pytest.raises(Exception):
+        provider.generate_once("hello", deadline=Deadline(1.0))
+    elapsed = time.monotonic() - started
+
+    # SDK retries are disabled: a timed-out attempt is exactly one request, bounded by its share
+    assert stub_server.count("/v1/chat/completions") == 1
+    assert elapsed < 1.0
+
+
+def test_calls_without_a_deadline_still_pass_an_sdk_timeout(stub_server, monkeypatch):
+    stub_server.route("/v1/chat/completions", lambda body: (200, chat_completion("ok")))
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_BASE_URL", stub_server.base_url)
+    provider = OpenAIProvider(model="gpt-4o-mini")
+    assert provider.client.timeout == LLM_ATTEMPT_TIMEOUT_SECONDS
+
+    sent = []
+    create = provider.client.chat.completions.create
+    monkeypatch.setattr(provider.client.chat.completions, "create", lambda **params: sent.append(params) or create(**params))
+    assert provider.generate_once("hello") == "ok"
+    assert sent[0]["timeout"] == LLM_ATTEMPT_TIMEOUT_SECONDS
+
+
+def test_concurrent_stage_does_not_hide_the_llm_attempt(monkeypatch):
+    monkeypatch.setattr(deadlines, "DISCONNECT_POLL_SECONDS", 0.01)
+    deadline = Deadline(30)
+
+    async def llm_call():
+        deadline.enter("llm_attempt")
+        await asyncio.sleep(0.05)
+        deadline.stage_timeout("fetch")  # an independent stage's fetch retry starts meanwhile
+        await asyncio.sleep(0.1)
+        return "result"
+
+    async def disconnected():
+        return True
+
+    # The attempt is expected to finish well within the grace period, so it keeps running
+    result = asyncio.run(deadlines.watch_client(llm_call(), deadline, disconnected, expected_attempt_seconds=1))
+    assert result == "result"
+    assert deadline.stage_started_at("llm_attempt") < deadline.stage_started_at("fetch")
+
+
+def test_disconnect_before_any_attempt_cancels(monkeypatch):
+    monkeypatch.setattr(deadlines, "DISCONNECT_POLL_SECONDS", 0.01)
+    deadline = Deadline(30)
+
+    async def queued():
+        deadline.enter("fetch")
+        await asyncio.sleep(1)
+
+    async def disconnected():
+        return True
+
+    with pytest.raises(ClientDisconnected):
+        asyncio.run(deadlines.watch_client(queued(), deadline, disconnected, expected_attempt_seconds=1))
+    assert deadline.cancelled
@@ -0,0 +1,45 @@
+"""Tests for GenerationProfile overrides and generation_params"""
+
+import pytest
+
+import llm_providers
+from llm_providers import GenerationProfile, generation_params, PROVIDER_DEFAULT_MODELS
+
+
+def test_provider_only_override_uses_that_providers_default_model():
+    profile = GenerationProfile(provider="Local")
+    assert profile.provider == "local"
+    assert profile.model == PROVIDER_DEFAULT_MODELS["local"]
+
+    other = next(p for p in PROVIDER_DEFAULT_MODELS if p != llm_providers.CURRENT_PROVIDER.lower())
+    assert GenerationProfile(provider=other).model == PROVIDER_DEFAULT_MODELS[other]
+
+
+def test_provider_only_override_of_current_provider_keeps_current_model():
+    profile = GenerationProfile(provider=llm_providers.CURRENT_PROVIDER)
+    assert profile.model == llm_providers.CURRENT_MODEL
+
+
+def test_explicit_model_is_kept():
+    assert GenerationProfile(provider="groq", model="llama-3.1-8b-instant").model == "llama-3.1-8b-instant"
+    assert GenerationProfile(model="gpt-4o-mini").provider is None
+
+
+def test_unknown_provider_is_rejected_at_definition():
+    with pytest.raises(ValueError):
+        GenerationProfile(provider="anthropic", model="x")
+
+
+def test_configured_profiles_are_valid():
+    for profile in llm_providers.GENERATION_PROFILES.values():
+        if profile.provider:
+            assert profile.provider in PROVIDER_DEFAULT_MODELS and profile.model
+
+
+def test_reasoning_effort_only_sent_to_reasoning_models():
+    profile = GenerationProfile(reasoning_effort="low", max_completion_tokens=100, temperature=0.2)
+    assert generation_params("gpt-5-nano", profile)["reasoning_effort"] == "low"
+    params = generation_params("llama-3.1-8b-instant", profile)
+    assert "reasoning_effort" not in params
+    assert params == {"max_completion_tokens": 100, "temperature": 0.2}
+    assert generation_params("gpt-4o", None) == {}
@@ -0,0 +1,129 @@
+"""Tests for llm_scheduler.LLMDispatcher (priority order, per-class caps, aging)"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from llm_scheduler import LLMDispatcher, PRIORITY_SPOT, PRIORITY_DAILY, PRIORITY_WEEKLY
+
+
+async def _occupy(dispatcher: LLMDispatcher, priority: str, release: threading.Event) -> "asyncio.Task":
+    """Start a call that holds its slot until `release` is set"""
+    task = asyncio.ensure_future(dispatcher.run(priority, release.wait, 5))
+    while dispatcher._total_running == 0 or dispatcher.queue_depth(priority):
+        await asyncio.sleep(0.01)
+    return task
+
+
+def test_higher_priority_is_dispatched_first():
+    async def scenario():
+        dispatcher = LLMDispatcher(max_concurrency=1, aging_seconds=3600)
+        release = threading.Event()
+        blocker = await _occupy(dispatcher, PRIORITY_SPOT, release)
+
+        order = []
+        weekly = asyncio.ensure_future(dispatcher.run(PRIORITY_WEEKLY, order.append, "weekly"))
+        await asyncio.sleep(0.01)
+        spot = asyncio.ensure_future(dispatcher.run(PRIORITY_SPOT, order.append, "spot"))
+        await asyncio.sleep(0.01)
+        assert dispatcher.queue_depth() == 2
+
+        release.set()
+        await asyncio.gather(blocker, weekly, spot)
+        return order
+
+    assert asyncio.run(scenario()) == ["spot", "weekly"]
+
+
+def test_aging_promotes_long_waiting_low_priority_work():
+    async def scenario():
+        dispatcher = LLMDispatcher(max_concurrency=1, aging_seconds=0.05)
+        release = threading.Event()
+        blocker = await _occupy(dispatcher, PRIORITY_SPOT, release)
+
+        order = []
+        weekly = asyncio.ensure_future(dispatcher.run(PRIORITY_WEEKLY, order.append, "weekly"))
+        await asyncio.sleep(0.2)  # weekly: rank 2 - 0.2/0.05 = -2 < fresh spot (0)
+        spot = asyncio.ensure_future(dispatcher.run(PRIORITY_SPOT, order.append, "spot"))
+        await asyncio.sleep(0.01)
+
+        release.set()
+        await asyncio.gather(blocker, weekly, spot)
+        return order
+
+    assert asyncio.run(scenario()) == ["weekly", "spot"]
+
+
+def test_per_class_cap_leaves_room_for_other_classes():
+    async def scenario():
+        dispatcher = LLMDispatcher(max_concurrency=3, class_limits={PRIORITY_DAILY: 1})
+        running = {"now": 0, "max": 0}
+        lock = threading.Lock()
+
+        def daily_call():
+            with lock:
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+            time.sleep(0.05)
+            with lock:
+                running["now"] -= 1
+
+        daily = [asyncio.ensure_future(dispatcher.run(PRIORITY_DAILY, daily_call)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        # A spot call is not blocked by queued daily work
+        spot_started = time.monotonic()
+        await dispatcher.run(PRIORITY_SPOT, lambda: None)
+        spot_wait = time.monotonic() - spot_started
+        await asyncio.gather(*daily)
+        return running["max"], spot_wait, dispatcher.stats()
+
+    max_daily, spot_wait, stats = asyncio.run(scenario())
+    assert max_daily == 1
+    assert spot_wait < 0.05
+    assert stats["classes"][PRIORITY_DAILY]["completed"] == 3
+    assert stats["running"] == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        dispatcher = LLMDispatcher(max_concurrency=1)
+        release = threading.Event()
+        blocker = await _occupy(dispatcher, PRIORITY_SPOT, release)
+
+        waiter = asyncio.ensure_future(dispatcher.run(PRIORITY_DAILY, lambda: "never"))
+        await asyncio.sleep(0.01)
+        assert dispatcher.queue_depth(PRIORITY_DAILY) == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert dispatcher.queue_depth() == 0
+
+        release.set()
+        await blocker
+        return dispatcher.stats()["running"]
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_estimate_wait():
+    async def scenario():
+        dispatcher = LLMDispatcher(max_concurrency=1)
+        assert dispatcher.estimate_wait(PRIORITY_WEEKLY, 10) == 0.0
+        release = threading.Event()
+        blocker = await _occupy(dispatcher, PRIORITY_SPOT, release)
+        queued = asyncio.ensure_future(dispatcher.run(PRIORITY_SPOT, lambda: None))
+        await asyncio.sleep(0.01)
+        # One spot waiter ahead + the new call, no observed service time yet
+        estimate = dispatcher.estimate_wait(PRIORITY_WEEKLY, 10)
+        release.set()
+        await asyncio.gather(blocker, queued)
+        return estimate
+
+    assert asyncio.run(scenario()) == 20.0
+
+
+def test_unknown_priority_is_rejected():
+    with pytest.raises(ValueError):
+        asyncio.run(LLMDispatcher().run("urgent", lambda: None))
@@ -0,0 +1,139 @@
+"""Tests for LocalOpenAICompatibleProvider against a stub OpenAI-compatible server"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import llm_providers
+from circuit_breaker import HALF_OPEN
+from conftest import chat_completion
+from deadlines import Deadline
+from llm_providers import LocalOpenAICompatibleProvider
+
+MODELS = {"object": "list", "data": [{"id": "stub-model", "object": "model", "created": 0, "owned_by": "test"}]}
+
+
+def make_provider(stub_server, **kwargs):
+    return LocalOpenAICompatibleProvider(model="stub-model", base_url=stub_server.base_url, timeout=5, **kwargs)
+
+
+def test_generate_sends_model_and_records_usage(stub_server):
+    stub_server.route("/v1/chat/completions", lambda body: (200, chat_completion("hi " + body["model"])))
+    provider = make_provider(stub_server)
+    assert provider.generate("hello", system_prompt="be brief") == "hi stub-model"
+    _, body = stub_server.requests[-1]
+    assert [m["role"] for m in body["messages"]] == ["system", "user"]
+    stats = provider.usage_stats()
+    assert stats["calls"] == 1 and stats["prompt_tokens"] == 10
+    assert stats["in_flight"] == 0
+
+
+def test_health_check_and_warmup(stub_server):
+    stub_server.route("/v1/models", lambda body: (200, MODELS))
+    provider = make_provider(stub_server)
+    provider.warmup()
+    assert provider.health_check()["healthy"] is True
+    assert provider.usage_stats()["health"]["healthy"] is True
+
+
+def test_warmup_fails_when_server_is_down(stub_server):
+    provider = make_provider(stub_server)
+    stub_server.stop()
+    with pytest.raises(ConnectionError):
+        provider.warmup()
+    assert provider.usage_stats()["health"]["healthy"] is False
+
+
+def test_refresh_health_rechecks_when_due_or_half_open(stub_server, monkeypatch):
+    stub_server.route("/v1/models", lambda body: (200, MODELS))
+    provider = make_provider(stub_server)
+    provider.refresh_health()
+    provider.refresh_health()
+    assert stub_server.count("/v1/models") == 1  # within the interval: cached result
+
+    monkeypatch.setattr(llm_providers, "LOCAL_LLM_HEALTH_CHECK_INTERVAL_SECONDS", 0)
+    provider.refresh_health()
+    assert stub_server.count("/v1/models") == 2
+
+    monkeypatch.setattr(llm_providers, "LOCAL_LLM_HEALTH_CHECK_INTERVAL_SECONDS", 3600)
+    monkeypatch.setattr(provider, "_breaker", type("Breaker", (), {"state": HALF_OPEN})())
+    provider.refresh_health()
+    assert stub_server.count("/v1/models") == 3
+
+    # A server that goes down after startup is noticed on the next due check
+    stub_server.route("/v1/models", lambda body: (503, {"error": "down"}))
+    assert provider.refresh_health()["healthy"] is False
+
+
+def test_semaphore_caps_requests_in_flight_at_the_server(stub_server):
+    lock = threading.Lock()
+    active = {"now": 0, "max": 0}
+
+    def slow(body):
+        with lock:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        time.sleep(0.2)
+        with lock:
+            active["now"] -= 1
+        return 200, chat_completion("ok")
+
+    stub_server.route("/v1/chat/completions", slow)
+    provider = make_provider(stub_server, max_concurrency=2)
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(lambda i: provider.generate(f"p{i}"), range(5)))
+    assert results == ["ok"] * 5
+    assert active["max"] == 2
+
+
+def test_waiting_for_a_slot_is_bounded_by_the_attempt_budget(stub_server):
+    release = threading.Event()
+
+    def blocked(body):
+        release.wait(5)
+        return 200, chat_completion("ok")
+
+    stub_server.route("/v1/chat/completions", blocked)
+    provider = make_provider(stub_server, max_concurrency=1)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        holder = pool.submit(provider.generate, "first")
+        while stub_server.count("/v1/chat/completions") == 0:
+            time.sleep(0.01)
+        with pytest.raises(TimeoutError):
+            provider.generate_once("second", deadline=Deadline(0.5))
+        release.set()
+        assert holder.result() == "ok"
+    assert stub_server.count("/v1/chat/completions") == 1
+
+
+def test_slot_wait_is_deducted_from_the_sdk_timeout(stub_server):
+    def slow(body):
+        time.sleep(0.6)
+        return 200, chat_completion("ok")
+
+    stub_server.route("/v1/chat/completions", slow)
+    provider = LocalOpenAICompatibleProvider(
+        model="stub-model", base_url=stub_server.base_url, timeout=1.0, max_concurrency=1
+    )
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        holder = pool.submit(provider.generate_once, "first")
+        while stub_server.count("/v1/chat/completions") == 0:
+            time.sleep(0.01)
+        started = time.monotonic()
+        # ~0.6s waiting for the slot leaves ~0.4s for a 0.6s response: the attempt times out
+        with pytest.raises(Exception):
+            provider.generate_once("second")
+        assert time.monotonic() - started < 1.1
+        assert holder.result() == "ok"
+
+
+def test_built_providers_include_profile_overrides(stub_server, monkeypatch):
+    current, override = make_provider(stub_server), make_provider(stub_server)
+    monkeypatch.setattr(llm_providers, "_current_llm", current)
+    monkeypatch.setattr(llm_providers, "_override_llms", {("local", "other"): override})
+    monkeypatch.setattr(llm_providers, "_model_cascade", None)
+    assert llm_providers.built_llm_providers() == [current, override]
+    profile = llm_providers.GenerationProfile(provider=llm_providers.CURRENT_PROVIDER, model=llm_providers.CURRENT_MODEL)
+    assert llm_providers.get_llm_for_profile(profile) is current
@@ -0,0 +1,86 @@
+"""Tests for llm_providers.ModelCascade (single fast attempt, validated escalation)"""
+
+from typing import Optional
+
+import pytest
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
+
+from circuit_breaker import is_transient_error
+from llm_providers import LLMProvider, ModelCascade
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeProvider(LLMProvider):
+    """Provider with the same tenacity policy as the real ones (no network)"""
+
+    def __init__(self, name: str, responses):
+        super().__init__()
+        self._name = name
+        self._responses = list(responses)
+        self.calls = 0
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception(is_transient_error),
+        reraise=True
+    )
+    def generate(self, prompt: str, system_prompt: Optional[str] = None, deadline=None, profile=None) -> str:
+        self.calls += 1
+        response = self._responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    @property
+    def model_name(self) -> str:
+        return self._name
+
+
+def reject_empty(text: str) -> Optional[str]:
+    return "empty" if not text else None
+
+
+def test_fast_result_accepted_when_valid():
+    fast, strong = FakeProvider("fast", ["ok"]), FakeProvider("strong", [])
+    cascade = ModelCascade(fast, strong)
+    assert cascade.generate("p", validate=reject_empty) == ("ok", "fast")
+    assert cascade.stats()["fast_accepted"] == 1
+
+
+def test_validation_failure_escalates():
+    fast, strong = FakeProvider("fast", [""]), FakeProvider("strong", ["better"])
+    cascade = ModelCascade(fast, strong)
+    assert cascade.generate("p", validate=reject_empty) == ("better", "strong")
+    assert cascade.stats()["escalation_reasons"] == {"empty": 1}
+
+
+def test_transient_fast_error_escalates_without_retry_backoff():
+    fast = FakeProvider("fast", [StatusError(503), "never used"])
+    strong = FakeProvider("strong", ["answer"])
+    cascade = ModelCascade(fast, strong)
+    assert cascade.generate("p", validate=reject_empty) == ("answer", "strong")
+    assert fast.calls == 1
+    assert cascade.stats()["escalation_reasons"] == {"fast_error:StatusError": 1}
+
+
+def test_strong_model_keeps_its_retries():
+    fast = FakeProvider("fast", [StatusError(503)])
+    strong = FakeProvider("strong", [StatusError(503), "answer"])
+    # Skip the real back-off sleep for the strong model's retry
+    strong_generate = type(strong).generate
+    strong_generate.retry.sleep = lambda seconds: None
+    cascade = ModelCascade(fast, strong)
+    assert cascade.generate("p")[0] == "answer"
+    assert strong.calls == 2
+
+
+def test_generate_once_reraises_first_error():
+    provider = FakeProvider("fast", [StatusError(429), "ok"])
+    with pytest.raises(StatusError):
+        provider.generate_once("p")
+    assert provider.calls == 1
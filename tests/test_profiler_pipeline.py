@@ -0,0 +1,152 @@
+"""Tests for profiler_pipeline (dependency order, concurrency, optional/retry/failure handling)"""
+
+import asyncio
+
+import pytest
+
+import profiler_pipeline
+from deadlines import Deadline
+from profiler_pipeline import PipelineContext, ProfilerPipeline, Stage
+
+
+class Transient(Exception):
+    status_code = 503
+
+
+def run(pipeline, deadline=None):
+    return asyncio.run(pipeline.run(PipelineContext(None, deadline or Deadline(30))))
+
+
+def test_dependencies_run_in_order_and_independent_stages_overlap():
+    events = []
+
+    def stage(name, seconds=0.0):
+        async def fn(ctx):
+            events.append(f"{name}:start")
+            await asyncio.sleep(seconds)
+            events.append(f"{name}:end")
+            return name
+        return fn
+
+    pipeline = ProfilerPipeline("t", [
+        Stage("a", stage("a", 0.05)),
+        Stage("b", stage("b", 0.05)),
+        Stage("c", stage("c"), depends_on=("a", "b")),
+    ], respond=lambda ctx: {})
+    ctx = run(pipeline)
+    assert events[:2] == ["a:start", "b:start"]  # both started before either finished
+    assert events[-2:] == ["c:start", "c:end"]
+    assert ctx.results == {"a": "a", "b": "b", "c": "c"}
+    assert set(ctx.timings) == {"a", "b", "c"}
+
+
+def test_stage_reads_dependency_results():
+    async def double(ctx):
+        return ctx["base"] * 2
+
+    async def base(ctx):
+        return 21
+
+    ctx = run(ProfilerPipeline("t", [Stage("double", double, depends_on=("base",)), Stage("base", base)], respond=dict))
+    assert ctx["double"] == 42
+
+
+def test_optional_stage_falls_back_to_default():
+    async def broken(ctx):
+        raise RuntimeError("boom")
+
+    async def after(ctx):
+        return ctx["extra"]
+
+    pipeline = ProfilerPipeline("t", [
+        Stage("extra", broken, optional=True, default=[]),
+        Stage("after", after, depends_on=("extra",)),
+    ], respond=dict)
+    ctx = run(pipeline)
+    assert ctx["after"] == [] and ctx.failed_stage is None
+    assert pipeline.stats()["extra"]["failures"] == 1
+
+
+def test_transient_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(profiler_pipeline, "STAGE_RETRY_BACKOFF_SECONDS", 0)
+    calls = []
+
+    async def flaky(ctx):
+        calls.append(1)
+        if len(calls) < 3:
+            raise Transient()
+        return "ok"
+
+    pipeline = ProfilerPipeline("t", [Stage("fetch", flaky, retries=2)], respond=dict)
+    assert run(pipeline)["fetch"] == "ok"
+    assert len(calls) == 3 and pipeline.stats()["fetch"]["retries"] == 2
+
+
+def test_no_retry_for_non_transient_errors_or_spent_deadline(monkeypatch):
+    monkeypatch.setattr(profiler_pipeline, "STAGE_RETRY_BACKOFF_SECONDS", 0)
+    calls = []
+
+    async def failing(ctx):
+        calls.append(1)
+        raise Transient()
+
+    deadline = Deadline(30)
+    deadline.cancel()
+    with pytest.raises(Transient):
+        run(ProfilerPipeline("t", [Stage("fetch", failing, retries=3)], respond=dict), deadline)
+    assert len(calls) == 1
+
+    async def invalid(ctx):
+        calls.append(1)
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        run(ProfilerPipeline("t", [Stage("fetch", invalid, retries=3)], respond=dict))
+    assert len(calls) == 2
+
+
+def test_required_failure_cancels_siblings_and_sets_failed_stage():
+    cancelled = []
+
+    async def slow(ctx):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+
+    async def failing(ctx):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("llm down")
+
+    async def never(ctx):
+        raise AssertionError("dependent stage must not start")
+
+    pipeline = ProfilerPipeline("t", [
+        Stage("slow", slow),
+        Stage("analyze", failing),
+        Stage("save", never, depends_on=("analyze",)),
+    ], respond=dict)
+    ctx = PipelineContext(None, Deadline(30))
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await pipeline.run(ctx)
+        await asyncio.sleep(0)  # let the cancelled sibling unwind
+
+    asyncio.run(main())
+    assert ctx.failed_stage == "analyze"
+    assert cancelled == ["slow"]
+    assert "save" not in ctx.results
+
+
+def test_cycles_unknown_dependencies_and_duplicates_are_rejected():
+    async def noop(ctx):
+        return None
+
+    with pytest.raises(ValueError):
+        ProfilerPipeline("t", [Stage("a", noop, depends_on=("b",)), Stage("b", noop, depends_on=("a",))], respond=dict)
+    with pytest.raises(ValueError):
+        ProfilerPipeline("t", [Stage("a", noop, depends_on=("missing",))], respond=dict)
+    with pytest.raises(ValueError):
+        ProfilerPipeline("t", [Stage("a", noop), Stage("a", noop)], respond=dict)
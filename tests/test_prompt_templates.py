@@ -0,0 +1,66 @@
+"""Tests for prompt_templates (static prefix split for provider-side prompt caching)"""
+
+from prompt_templates import PromptTemplateRegistry, common_line_prefix
+
+TEMPLATE_A = "".join(f"指示A {i}: 出力はJSONのみ。\n" for i in range(20))
+TEMPLATE_B = "".join(f"指示B {i}: 日本語で簡潔に。\n" for i in range(20))
+
+
+def registry(**kwargs):
+    kwargs.setdefault("markers", {})
+    kwargs.setdefault("min_prefix_chars", 100)
+    return PromptTemplateRegistry(**kwargs)
+
+
+def test_common_line_prefix_stops_at_a_line_boundary():
+    assert common_line_prefix("ab\ncd\nef", "ab\ncd\nxy") == "ab\ncd\n"
+    assert common_line_prefix("abc", "abd") == ""
+
+
+def test_marker_split():
+    templates = registry(markers={"spot": "## データ"})
+    prompt = TEMPLATE_A + "## データ\n値: 1"
+    assert templates.split("spot", prompt) == (TEMPLATE_A, "## データ\n値: 1")
+    # Marker too close to the start (below the floor): no static prefix
+    assert templates.split("spot", "短い\n## データ\n値: 1") == (None, "短い\n## データ\n値: 1")
+
+
+def test_min_prefix_floor_blocks_learning():
+    templates = registry(min_prefix_chars=10_000)
+    templates.split("daily", TEMPLATE_A + "1")
+    assert templates.split("daily", TEMPLATE_A + "2") == (None, TEMPLATE_A + "2")
+    assert templates.stats() == {}
+
+
+def test_learns_from_two_prompts_and_reuses_the_prefix():
+    templates = registry()
+    assert templates.split("spot", TEMPLATE_A + "録音1") == (None, TEMPLATE_A + "録音1")
+    assert templates.split("spot", TEMPLATE_A + "録音2") == (TEMPLATE_A, "録音2")
+    assert templates.split("spot", TEMPLATE_A + "録音3") == (TEMPLATE_A, "録音3")
+    assert templates.stats() == {"spot": [len(TEMPLATE_A)]}
+    assert templates.split("daily", TEMPLATE_A + "x") == (None, TEMPLATE_A + "x")  # per profiler type
+
+
+def test_alternating_templates_keep_byte_stable_prefixes():
+    templates = registry()
+    for i in range(2):
+        templates.split("spot", TEMPLATE_A + f"a{i}")
+    templates.split("spot", TEMPLATE_B + "b0")
+    assert templates.split("spot", TEMPLATE_B + "b1") == (TEMPLATE_B, "b1")
+
+    # A prompt of another template no longer replaces the first confirmed prefix
+    for i in range(5):
+        prefix_a, _ = templates.split("spot", TEMPLATE_A + f"a{i + 2}")
+        prefix_b, _ = templates.split("spot", TEMPLATE_B + f"b{i + 2}")
+        assert prefix_a == TEMPLATE_A
+        assert prefix_b == TEMPLATE_B
+    assert sorted(templates.stats()["spot"]) == sorted([len(TEMPLATE_A), len(TEMPLATE_B)])
+
+
+def test_template_cap_stops_learning():
+    templates = registry(max_templates=1)
+    templates.split("spot", TEMPLATE_A + "a0")
+    templates.split("spot", TEMPLATE_A + "a1")
+    templates.split("spot", TEMPLATE_B + "b0")
+    assert templates.split("spot", TEMPLATE_B + "b1") == (None, TEMPLATE_B + "b1")
+    assert templates.split("spot", TEMPLATE_A + "a2") == (TEMPLATE_A, "a2")
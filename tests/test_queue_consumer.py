@@ -0,0 +1,184 @@
+"""Tests for queue_consumer (SQLite backend, job parsing, ack policy)"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+import queue_consumer
+from queue_consumer import QueueConsumer, SQLiteQueueBackend, SQSQueueBackend, parse_job
+
+
+def test_sqlite_backend_receive_and_ack():
+    backend = SQLiteQueueBackend(":memory:")
+    for i in range(3):
+        backend.send({"type": "spot", "device_id": f"d{i}", "recorded_at": "2025-11-13T12:00:00+00:00"})
+    assert backend.depth() == 3
+
+    first = backend.receive(2, wait_seconds=0)
+    assert [json.loads(m.body)["device_id"] for m in first] == ["d0", "d1"]
+    # Received messages are invisible until acked or the visibility timeout passes
+    second = backend.receive(10, wait_seconds=0)
+    assert [json.loads(m.body)["device_id"] for m in second] == ["d2"]
+    assert backend.receive(10, wait_seconds=0) == []
+
+    backend.ack(first + second)
+    assert backend.depth() == 0
+
+
+def test_sqlite_backend_redelivers_after_visibility_timeout():
+    backend = SQLiteQueueBackend(":memory:", visibility_timeout=0.05)
+    backend.send({"type": "daily", "device_id": "d", "local_date": "2025-11-15"})
+    assert len(backend.receive(1, wait_seconds=0)) == 1
+    assert backend.receive(1, wait_seconds=0) == []
+    time.sleep(0.06)
+    redelivered = backend.receive(1, wait_seconds=0)
+    assert len(redelivered) == 1
+    assert backend.depth() == 1
+
+
+def test_sqlite_backend_counts_receives():
+    backend = SQLiteQueueBackend(":memory:", visibility_timeout=0)
+    backend.send({"type": "daily", "device_id": "d", "local_date": "2025-11-15"})
+    assert [m.receive_count for m in backend.receive(1, wait_seconds=0)] == [1]
+    assert [m.receive_count for m in backend.receive(1, wait_seconds=0)] == [2]
+
+
+def test_default_visibility_timeout_outlasts_request_deadline():
+    assert queue_consumer.PROFILER_QUEUE_VISIBILITY_TIMEOUT > queue_consumer.REQUEST_DEADLINE_SECONDS
+    assert SQLiteQueueBackend(":memory:").visibility_timeout == queue_consumer.PROFILER_QUEUE_VISIBILITY_TIMEOUT
+
+
+class FakeSQS:
+    def __init__(self, messages):
+        self.messages = messages
+        self.calls = []
+
+    def receive_message(self, **params):
+        self.calls.append(params)
+        return {"Messages": self.messages}
+
+
+def test_sqs_backend_sets_visibility_timeout_and_reads_receive_count():
+    backend = SQSQueueBackend.__new__(SQSQueueBackend)
+    backend.client = FakeSQS([
+        {"MessageId": "m1", "ReceiptHandle": "r1", "Body": "{}", "Attributes": {"ApproximateReceiveCount": "3"}}
+    ])
+    backend.queue_url = "https://sqs.example/queue"
+    backend.visibility_timeout = 200
+
+    messages = backend.receive(10, wait_seconds=20)
+    params = backend.client.calls[0]
+    assert params["VisibilityTimeout"] == 200
+    assert params["AttributeNames"] == ["ApproximateReceiveCount"]
+    assert [(m.message_id, m.receipt, m.receive_count) for m in messages] == [("m1", "r1", 3)]
+
+
+def test_sqlite_backend_long_poll_waits_when_empty():
+    backend = SQLiteQueueBackend(":memory:")
+    started = time.monotonic()
+    assert backend.receive(1, wait_seconds=0.3) == []
+    assert time.monotonic() - started >= 0.3
+
+
+@pytest.mark.parametrize("body, expected", [
+    ('{"type": "weekly", "device_id": "d", "week_start_date": "2025-11-10"}', "weekly"),
+    ('{"device_id": "d", "recorded_at": "2025-11-13T12:00:00+00:00"}', "spot"),
+    ('{"device_id": "d", "local_date": "2025-11-15"}', "daily"),
+    ('{"device_id": "d", "week_start_date": "2025-11-10"}', "weekly"),
+])
+def test_parse_job(body, expected):
+    job_type, fields = parse_job(body)
+    assert job_type == expected
+    assert "type" not in fields and fields["device_id"] == "d"
+
+
+@pytest.mark.parametrize("body", ["not json", "[1, 2]", '{"type": "monthly", "device_id": "d"}', '{"device_id": "d"}'])
+def test_parse_job_rejects_invalid_bodies(body):
+    with pytest.raises(ValueError):
+        parse_job(body)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def run_consumer(monkeypatch, outcomes):
+    """Run the consumer over one message per outcome; returns the device_ids left on the queue"""
+    import fastapi
+
+    backend = SQLiteQueueBackend(":memory:", visibility_timeout=60)
+    for device_id in outcomes:
+        backend.send({"type": "spot", "device_id": device_id, "recorded_at": "2025-11-13T12:00:00+00:00"})
+
+    async def job(device_id):
+        outcome = outcomes[device_id]
+        if isinstance(outcome, int):
+            raise fastapi.HTTPException(status_code=outcome)
+        if isinstance(outcome, Exception):
+            raise outcome
+
+    monkeypatch.setattr(QueueConsumer, "_build_job", staticmethod(lambda job_type, fields: job(fields["device_id"])))
+
+    async def scenario():
+        consumer = QueueConsumer(backend, concurrency=2, wait_seconds=0, ack_interval_seconds=0.01)
+        task = asyncio.ensure_future(consumer.run())
+        while consumer.processed + consumer.failed < len(outcomes):
+            await asyncio.sleep(0.01)
+        consumer.stop()
+        await task
+        return consumer
+
+    consumer = asyncio.run(scenario())
+    rows = backend._conn.execute("SELECT body FROM profiler_jobs").fetchall()
+    return consumer, sorted(json.loads(row[0])["device_id"] for row in rows)
+
+
+def test_consumer_ack_policy(monkeypatch):
+    pytest.importorskip("fastapi")
+    consumer, remaining = run_consumer(monkeypatch, {
+        "ok": None,
+        "not_found": 404,            # permanent → acked
+        "rate_limited": 429,         # transient → left for redelivery
+        "unavailable": 503,
+        "crashed": RuntimeError("boom"),
+    })
+    assert consumer.processed == 1
+    assert consumer.failed == 4
+    assert remaining == ["crashed", "rate_limited", "unavailable"]
+
+
+def test_consumer_dead_letters_after_max_receive_count(monkeypatch):
+    pytest.importorskip("fastapi")
+    backend = SQLiteQueueBackend(":memory:", visibility_timeout=0.1)
+    dead_letter = SQLiteQueueBackend(":memory:")
+    backend.send({"type": "spot", "device_id": "d", "recorded_at": "2025-11-13T12:00:00+00:00"})
+    attempts = []
+
+    async def job():
+        attempts.append(1)
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(QueueConsumer, "_build_job", staticmethod(lambda job_type, fields: job()))
+
+    async def scenario():
+        consumer = QueueConsumer(
+            backend, concurrency=1, wait_seconds=0, ack_interval_seconds=0.01,
+            max_receive_count=3, dead_letter=dead_letter
+        )
+        task = asyncio.ensure_future(consumer.run())
+        while consumer.dead_lettered < 1:
+            await asyncio.sleep(0.01)
+        consumer.stop()
+        await task
+        return consumer
+
+    consumer = asyncio.run(scenario())
+    assert len(attempts) == 3
+    assert consumer.failed == 3
+    assert backend.depth() == 0
+    assert dead_letter.depth() == 1
+    [moved] = dead_letter.receive(1, wait_seconds=0)
+    assert json.loads(moved.body)["device_id"] == "d"
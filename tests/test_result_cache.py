@@ -0,0 +1,52 @@
+"""Tests for result_cache (LRU, TTL, ETag matching)"""
+
+import result_cache
+from result_cache import ResultCache, etag_matches
+
+
+def test_etag_matches():
+    etag = '"abc"'
+    assert not etag_matches(None, etag)
+    assert not etag_matches("", etag)
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('W/"abc"', etag)
+    assert etag_matches('"x", "abc"', etag)
+    assert etag_matches(' * ', etag)
+    assert not etag_matches('"abcd"', etag)
+    assert not etag_matches('abc', etag)
+
+
+def test_etag_is_stable_and_content_based():
+    cache = ResultCache()
+    a = cache.put(('t', 'd', '1'), {'b': 1, 'a': 2})
+    b = cache.put(('t', 'd', '2'), {'a': 2, 'b': 1})
+    c = cache.put(('t', 'd', '3'), {'a': 2, 'b': 3})
+    assert a.etag == b.etag
+    assert a.etag != c.etag
+
+
+def test_lru_eviction_and_invalidate():
+    cache = ResultCache(max_entries=2)
+    cache.put(('t', '1'), {'v': 1})
+    cache.put(('t', '2'), {'v': 2})
+    assert cache.get(('t', '1')) is not None  # 1 becomes most recent
+    cache.put(('t', '3'), {'v': 3})
+    assert cache.get(('t', '2')) is None
+    assert cache.get(('t', '1')).row == {'v': 1}
+    cache.invalidate(('t', '1'))
+    assert cache.get(('t', '1')) is None
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["hits"] == 2 and stats["misses"] == 2
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: now[0])
+    cache = ResultCache(ttl_seconds=10)
+    cache.put(('t', '1'), {'v': 1})
+    now[0] += 5
+    assert cache.get(('t', '1')) is not None
+    now[0] += 6
+    assert cache.get(('t', '1')) is None
+    assert cache.stats()["entries"] == 0
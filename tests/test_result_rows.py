@@ -0,0 +1,70 @@
+"""Tests for result rows and responses built by the profilers (migration-gated columns, response modes)"""
+
+import os
+
+for _name in ("SUPABASE_URL", "SUPABASE_KEY", "OPENAI_API_KEY"):
+    os.environ.setdefault(_name, "http://localhost" if _name == "SUPABASE_URL" else "test")
+
+import main  # noqa: E402
+from deadlines import Deadline  # noqa: E402
+from profiler_pipeline import PipelineContext  # noqa: E402
+
+ANALYZE = {
+    'result': {'summary': 's', 'burst_events': []},
+    'model': 'openai/gpt-5-nano',
+    'generation_profile': {'model': 'openai/gpt-5-nano', 'reasoning_effort': 'medium'}
+}
+
+
+def daily_ctx():
+    request = main.DailyProfilerRequest(device_id="d1", local_date="2025-01-01")
+    ctx = PipelineContext(request, Deadline(30))
+    ctx.results.update({
+        'analyze': ANALYZE,
+        'fetch_vibe_points': [{'time': '08:00', 'score': 20.0}, {'time': '08:30', 'score': 40.0}]
+    })
+    return ctx
+
+
+def test_daily_vibe_analytics_is_written_only_when_enabled(monkeypatch):
+    monkeypatch.setattr(main, "STORE_DAILY_VIBE_ANALYTICS", False)
+    row = main.build_daily_row(daily_ctx())
+    assert 'vibe_analytics' not in row
+    assert row['processed_count'] == 2
+
+    monkeypatch.setattr(main, "STORE_DAILY_VIBE_ANALYTICS", True)
+    assert 'timeline' in main.build_daily_row(daily_ctx())['vibe_analytics']
+
+
+def test_generation_profile_is_written_only_when_enabled(monkeypatch):
+    spot_request = main.SpotProfilerRequest(device_id="d1", recorded_at="2025-01-01T08:00:00Z")
+    spot = PipelineContext(spot_request, Deadline(30))
+    spot.results.update({'analyze': ANALYZE, 'fetch_input': {'prompt': 'p'}})
+    weekly_request = main.WeeklyProfilerRequest(device_id="d1", week_start_date="2025-01-06")
+    weekly = PipelineContext(weekly_request, Deadline(30))
+    weekly.results.update({'analyze': ANALYZE, 'fetch_input': {'context_data': {'spot_count': 3}}})
+    builders = [(main.build_spot_row, spot), (main.build_daily_row, daily_ctx()), (main.build_weekly_row, weekly)]
+
+    monkeypatch.setattr(main, "STORE_GENERATION_PROFILE", False)
+    for build, ctx in builders:
+        row = build(ctx)
+        assert 'generation_profile' not in row and row['llm_model'] == 'openai/gpt-5-nano'
+
+    monkeypatch.setattr(main, "STORE_GENERATION_PROFILE", True)
+    for build, ctx in builders:
+        assert build(ctx)['generation_profile'] == ANALYZE['generation_profile']
+
+
+def test_response_mode_defaults_to_full():
+    request = main.SpotProfilerRequest(device_id="d1", recorded_at="2025-01-01T00:00:00+00:00")
+    assert request.response_mode == "full"
+    body = main.build_profiler_response(request.response_mode, {"status": "success"}, {"summary": "s"})
+    assert body == {"status": "success", "analysis_result": {"summary": "s"}}
+
+
+def test_minimal_response_mode_omits_analysis_result():
+    request = main.SpotProfilerRequest(
+        device_id="d1", recorded_at="2025-01-01T00:00:00+00:00", response_mode="minimal"
+    )
+    body = main.build_profiler_response(request.response_mode, {"status": "success"}, {"summary": "s"})
+    assert body == {"status": "success"}
@@ -0,0 +1,104 @@
+"""Tests for serialization (exact bytes sent to PostgREST)"""
+
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+import serialization
+from circuit_breaker import CircuitBreaker
+from supabase_client import SupabaseClient
+
+
+def test_non_finite_floats_become_null():
+    data = {"a": float("nan"), "b": float("inf"), "c": float("-inf"), "d": 1.5}
+    assert serialization.dumps(data) == b'{"a":null,"b":null,"c":null,"d":1.5}'
+
+
+def test_nested_non_finite_floats_become_null():
+    data = {"scores": [1.0, float("nan")], "inner": {"x": float("inf")}}
+    assert serialization.dumps(data) == b'{"scores":[1.0,null],"inner":{"x":null}}'
+
+
+def test_numpy_scalars_and_arrays():
+    data = {
+        "f": np.float64(1.5),
+        "i": np.int64(2),
+        "b": np.bool_(True),
+        "arr": np.array([1, 2, 3]),
+        "mat": np.array([[0.5, 1.0], [2.0, 3.5]]),
+    }
+    assert serialization.dumps(data) == (
+        b'{"f":1.5,"i":2,"b":true,"arr":[1,2,3],"mat":[[0.5,1.0],[2.0,3.5]]}'
+    )
+
+
+def test_numpy_non_finite_floats_become_null():
+    data = {"f": np.float64("nan"), "arr": np.array([1.0, np.inf])}
+    assert serialization.dumps(data) == b'{"f":null,"arr":[1.0,null]}'
+
+
+def test_decimal_and_set():
+    assert serialization.dumps({"d": Decimal("1.25")}) == b'{"d":1.25}'
+    assert serialization.dumps({"s": {3}}) == b'{"s":[3]}'
+    assert serialization.dumps({"s": frozenset(["x"])}) == b'{"s":["x"]}'
+
+
+def test_datetime_and_non_str_keys():
+    data = {"at": datetime(2025, 1, 2, 3, 4, 5), 1: "one"}
+    assert serialization.dumps(data) == b'{"at":"2025-01-02T03:04:05","1":"one"}'
+
+
+def test_sort_keys():
+    data = {"b": 1, "a": {"d": 2, "c": 3}}
+    assert serialization.dumps(data) == b'{"b":1,"a":{"d":2,"c":3}}'
+    assert serialization.dumps(data, sort_keys=True) == b'{"a":{"c":3,"d":2},"b":1}'
+
+
+def test_unsupported_type_raises_value_error():
+    with pytest.raises(ValueError):
+        serialization.dumps({"x": object()})
+
+
+def test_loads_round_trip():
+    assert serialization.loads(b'{"a":[1,null]}') == {"a": [1, None]}
+
+
+class _Response:
+    status_code = 201
+    content = b""
+    text = ""
+
+
+class _Session:
+    def __init__(self):
+        self.calls = []
+
+    def request(self, method, path, **kwargs):
+        self.calls.append((method, path, kwargs))
+        return _Response()
+
+
+class _Postgrest:
+    def __init__(self):
+        self.session = _Session()
+
+
+class _Client:
+    def __init__(self):
+        self.postgrest = _Postgrest()
+
+
+def test_write_sends_encoded_body_to_postgrest():
+    client = SupabaseClient.__new__(SupabaseClient)
+    client.client = _Client()
+    client.breaker = CircuitBreaker("supabase-test")
+
+    row = {"device_id": "d1", "score": np.float64("nan"), "tags": np.array([1, 2])}
+    assert client.upsert_row("spot_aggregators", row, on_conflict="device_id") == []
+
+    method, path, kwargs = client.client.postgrest.session.calls[0]
+    assert (method, path) == ("POST", "/spot_aggregators")
+    assert kwargs["content"] == b'{"device_id":"d1","score":null,"tags":[1,2]}'
+    assert kwargs["headers"]["Content-Type"] == "application/json"
@@ -0,0 +1,60 @@
+"""Tests for spot re-drive scheduling (error path column writes, back-off, keyset filter)"""
+
+import asyncio
+import os
+
+for _name in ("SUPABASE_URL", "SUPABASE_KEY", "OPENAI_API_KEY"):
+    os.environ.setdefault(_name, "http://localhost" if _name == "SUPABASE_URL" else "test")
+
+import main  # noqa: E402
+import spot_redrive  # noqa: E402
+from deadlines import Deadline  # noqa: E402
+from llm_scheduler import PRIORITY_BACKFILL  # noqa: E402
+from profiler_pipeline import PipelineContext  # noqa: E402
+
+
+class RecordingClient:
+    def __init__(self):
+        self.updates = []
+
+    def update_rows(self, table, data, match):
+        self.updates.append((table, data, match))
+
+
+def record_error(monkeypatch, enabled, priority=None):
+    client = RecordingClient()
+    monkeypatch.setattr(main, "get_supabase_client", lambda: client)
+    monkeypatch.setattr(main, "SPOT_REDRIVE_ENABLED", enabled)
+    request = main.SpotProfilerRequest(device_id="d1", recorded_at="2025-01-01T08:00:00Z")
+    asyncio.run(main.record_spot_error(PipelineContext(request, Deadline(30), priority=priority), TimeoutError("timeout")))
+    (table, data, match), = client.updates
+    assert table == "spot_aggregators" and match == {"device_id": "d1", "recorded_at": "2025-01-01T08:00:00Z"}
+    return data
+
+
+def test_error_path_leaves_redrive_column_alone_when_disabled(monkeypatch):
+    data = record_error(monkeypatch, enabled=False)
+    assert data["profiler_status"] == "failed" and data["profiler_error_type"] == "timeout"
+    assert "profiler_next_attempt_at" not in data
+
+
+def test_error_path_schedules_redrive_when_enabled(monkeypatch):
+    assert "profiler_next_attempt_at" in record_error(monkeypatch, enabled=True)
+    # A failed re-drive is rescheduled by the sweeper itself, with back-off
+    assert "profiler_next_attempt_at" not in record_error(monkeypatch, enabled=True, priority=PRIORITY_BACKFILL)
+
+
+def test_redrive_delay_backs_off_and_caps(monkeypatch):
+    monkeypatch.setattr(spot_redrive.random, "uniform", lambda a, b: 1.0)
+    monkeypatch.setattr(spot_redrive, "SPOT_REDRIVE_BASE_DELAY_SECONDS", 60)
+    monkeypatch.setattr(spot_redrive, "SPOT_REDRIVE_MAX_DELAY_SECONDS", 300)
+    assert [spot_redrive.redrive_delay(n) for n in (1, 2, 3, 4)] == [60, 120, 240, 300]
+
+
+def test_keyset_filter_orders_by_next_attempt_then_key():
+    row = {"profiler_next_attempt_at": "T", "device_id": "D", "recorded_at": "R"}
+    assert spot_redrive.keyset_after(row) == (
+        'profiler_next_attempt_at.gt."T",'
+        'and(profiler_next_attempt_at.eq."T",device_id.gt."D"),'
+        'and(profiler_next_attempt_at.eq."T",device_id.eq."D",recorded_at.gt."R")'
+    )
@@ -0,0 +1,132 @@
+"""Tests for spot_shortcuts (SimHash, no-speech rule, near-duplicate lookup)"""
+
+import spot_shortcuts
+from spot_shortcuts import PromptSignature, SpotShortcuts, hamming, simhash
+
+PROMPT = "録音データ\nspeech_ratio: 0.40\nloudness: -30\n文字起こし: 朝ごはんを食べながらニュースを見ている。\n"
+
+
+def test_simhash_is_stable_and_digit_insensitive():
+    assert simhash(PROMPT) == simhash(PROMPT)
+    assert simhash(PROMPT) == simhash(PROMPT.replace("0.40", "0.45"))
+    assert hamming(simhash(PROMPT), simhash("全く別の内容の録音。散歩中に犬と遊んでいる。")) > 3
+    assert 0 <= simhash("") < 1 << 64
+
+
+def test_signature_extracts_features_once():
+    signature = PromptSignature(PROMPT)
+    assert signature.features == {"speech_ratio": 0.4, "loudness": -30.0}
+    assert signature.fingerprint == simhash(PROMPT)
+
+
+def test_lookup_without_template_is_skipped():
+    shortcuts = SpotShortcuts(mode="on")
+    assert shortcuts.lookup("d1", None) is None
+    assert shortcuts.stats()["no_template"] == 1
+
+
+def test_no_speech_fast_path():
+    shortcuts = SpotShortcuts(mode="on")
+    kind, result, model = shortcuts.lookup("d1", PromptSignature("speech_ratio: 0.0\n発話なし"))
+    assert kind == "no_speech" and model == spot_shortcuts.NO_SPEECH_MODEL
+    assert result["vibe_score"] == 0
+
+
+def test_no_speech_marker_must_be_the_transcription_itself():
+    assert spot_shortcuts.is_no_speech("speech_ratio: 0.3\n文字起こし: 発話なし\n", {"speech_ratio": 0.3})
+    assert spot_shortcuts.is_no_speech("speech_ratio: 0.3\n文字起こし：「なし」\n", {"speech_ratio": 0.3})
+    assert spot_shortcuts.is_no_speech("## 文字起こし\n(音声なし)\n", {})
+    assert spot_shortcuts.is_no_speech("【文字起こし】\n\nNo speech detected\n", {})
+    # The phrase inside an actual transcription is speech
+    assert not spot_shortcuts.is_no_speech("speech_ratio: 0.4\n文字起こし: テレビが音声なしで流れている\n", {"speech_ratio": 0.4})
+    assert not spot_shortcuts.is_no_speech("## 文字起こし\n今日は発話なしの練習をした\n", {})
+    assert not spot_shortcuts.is_no_speech("メモ: 音声なし\n文字起こし: こんにちは\n", {})
+
+
+def test_default_weights_adjust_reused_vibe_score():
+    shortcuts = SpotShortcuts(mode="on")
+    shortcuts.add("d1", "t", PromptSignature(PROMPT), {"summary": "朝食", "vibe_score": 20}, "m")
+    louder = PROMPT.replace("0.40", "0.45").replace("-30", "-28")
+    kind, reused, _ = shortcuts.lookup("d1", PromptSignature(louder))
+    assert kind == "reuse"
+    # speech_ratio +0.05 x 20 + loudness +2dB x 0.5
+    assert reused["vibe_score"] == 22.0
+
+
+def test_near_duplicate_reuse_is_per_device(monkeypatch):
+    monkeypatch.setattr(spot_shortcuts, "SPOT_REUSE_VIBE_WEIGHTS", {"speech_ratio": 10.0})
+    shortcuts = SpotShortcuts(mode="on")
+    result = {"summary": "朝食", "vibe_score": 20, "behavior": "食事"}
+    shortcuts.add("d1", "2025-01-01T08:00:00Z", PromptSignature(PROMPT), result, "openai/gpt-5-nano")
+
+    assert shortcuts.lookup("d2", PromptSignature(PROMPT)) is None
+    kind, reused, model = shortcuts.lookup("d1", PromptSignature(PROMPT.replace("0.40", "0.50")))
+    assert kind == "reuse" and model == "reuse/openai/gpt-5-nano"
+    assert reused["vibe_score"] == 21.0
+    assert reused["reused_from"]["recorded_at"] == "2025-01-01T08:00:00Z"
+    assert result["vibe_score"] == 20  # indexed result is not mutated
+
+
+def test_features_far_apart_are_not_reused():
+    shortcuts = SpotShortcuts(mode="on")
+    shortcuts.add("d1", "t", PromptSignature(PROMPT), {"vibe_score": 20}, "m")
+    assert shortcuts.lookup("d1", PromptSignature(PROMPT.replace("0.40", "0.90"))) is None
+
+
+def test_errors_and_disabled_mode_are_not_indexed():
+    shortcuts = SpotShortcuts(mode="on")
+    shortcuts.add("d1", "t", PromptSignature(PROMPT), {"processing_error": "x"}, "m")
+    off = SpotShortcuts(mode="off")
+    off.add("d1", "t", PromptSignature(PROMPT), {"vibe_score": 1}, "m")
+    assert shortcuts.lookup("d1", PromptSignature(PROMPT)) is None
+    assert shortcuts.stats()["indexed_prompts"] == 0
+    assert off.stats()["indexed_prompts"] == 0
+
+
+def test_spot_stage_splits_once_and_fingerprints_once(monkeypatch):
+    import asyncio
+    import os
+
+    for name in ("SUPABASE_URL", "SUPABASE_KEY", "OPENAI_API_KEY"):
+        os.environ.setdefault(name, "http://localhost" if name == "SUPABASE_URL" else "test")
+    import main
+    from deadlines import Deadline
+    from profiler_pipeline import PipelineContext
+    from prompt_templates import PromptTemplateRegistry
+
+    templates = PromptTemplateRegistry(markers={"spot": "録音データ"}, min_prefix_chars=100)
+    splits, llm_calls, signatures = [], [], []
+    real_split = templates.split
+
+    def counting_split(profiler_type, prompt):
+        splits.append(profiler_type)
+        return real_split(profiler_type, prompt)
+
+    async def fake_llm(prompt, profiler_type, **kwargs):
+        llm_calls.append(kwargs["split_prompt"])
+        return {"summary": "s", "vibe_score": 5, "behavior": "b"}, "openai/test"
+
+    class CountingSignature(PromptSignature):
+        __slots__ = ()
+
+        def __init__(self, text):
+            signatures.append(text)
+            super().__init__(text)
+
+    monkeypatch.setattr(templates, "split", counting_split)
+    monkeypatch.setattr(main, "prompt_templates", templates)
+    monkeypatch.setattr(main, "spot_shortcuts", SpotShortcuts(mode="shadow"))
+    monkeypatch.setattr(main, "PromptSignature", CountingSignature)
+    monkeypatch.setattr(main, "call_llm_with_retry", fake_llm)
+
+    prompt = "固定の指示文です。" * 40 + "\n" + PROMPT
+    request = main.SpotProfilerRequest(device_id="d1", recorded_at="2025-01-01T08:00:00Z")
+    ctx = PipelineContext(request, Deadline(30))
+    ctx.results["fetch_input"] = {"prompt": prompt}
+
+    analyzed = asyncio.run(main.spot_analyze_stage("test")(ctx))
+    assert analyzed["model"] == "openai/test"
+    assert splits == ["spot"]
+    assert len(llm_calls) == 1 and llm_calls[0] == real_split("spot", prompt)
+    assert llm_calls[0][1] == PROMPT
+    assert signatures == [PROMPT]
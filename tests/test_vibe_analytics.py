@@ -0,0 +1,87 @@
+"""Tests for vibe_analytics (slot bucketing, hour distribution, change points)"""
+
+import math
+
+from vibe_analytics import SLOTS_PER_DAY, compute_daily_vibe_analytics, extract_vibe_points
+
+
+def test_extract_vibe_points_skips_incomplete_rows():
+    rows = [
+        {'local_time': '2025-11-15 09:05:12', 'vibe_score': 20},
+        {'local_time': '10:40:00', 'vibe_score': -5},
+        {'local_time': None, 'vibe_score': 10},
+        {'local_time': '2025-11-15 11:00:00', 'vibe_score': None},
+        {'local_time': 'noon', 'vibe_score': 3},
+    ]
+    assert extract_vibe_points(rows) == [
+        {"time": "09:05", "score": 20},
+        {"time": "10:40", "score": -5},
+    ]
+
+
+def test_empty_day():
+    analytics = compute_daily_vibe_analytics([])
+    assert analytics["timeline"] == [None] * SLOTS_PER_DAY
+    assert analytics["spot_count"] == 0
+    assert analytics["average_score"] is None
+    assert analytics["vibe_changes"] == []
+
+
+def test_slots_are_30_minute_means():
+    points = [
+        {"time": "00:00", "score": 10},
+        {"time": "00:29", "score": 30},   # same slot as 00:00
+        {"time": "00:30", "score": -50},  # next slot
+        {"time": "23:59", "score": 0},    # last slot
+    ]
+    analytics = compute_daily_vibe_analytics(points)
+    timeline = analytics["timeline"]
+    assert timeline[0] == 20.0
+    assert timeline[1] == -50.0
+    assert timeline[47] == 0.0
+    assert timeline[2:47] == [None] * 45
+    assert analytics["spot_count"] == 4
+    assert analytics["observed_slots"] == 3
+    assert analytics["average_score"] == -2.5
+    assert analytics["min_score"] == -50.0
+    assert analytics["max_score"] == 30.0
+
+
+def test_hour_distribution_uses_slot_means():
+    points = [
+        {"time": "08:00", "score": 40},   # positive
+        {"time": "09:00", "score": -40},  # negative
+        {"time": "10:00", "score": 10},   # neutral (threshold is exclusive)
+        {"time": "11:00", "score": -10},  # neutral
+    ]
+    analytics = compute_daily_vibe_analytics(points)
+    assert analytics["positive_hours"] == 0.5
+    assert analytics["negative_hours"] == 0.5
+    assert analytics["neutral_hours"] == 1.0
+
+
+def test_change_points_between_consecutive_observed_slots():
+    points = [
+        {"time": "08:00", "score": 0},
+        {"time": "12:00", "score": 35},   # gap of empty slots is skipped
+        {"time": "12:30", "score": 40},   # small change
+        {"time": "13:00", "score": -20},
+    ]
+    changes = compute_daily_vibe_analytics(points)["vibe_changes"]
+    assert [(c["from_time"], c["time"], c["delta"]) for c in changes] == [
+        ("08:00", "12:00", 35.0),
+        ("12:30", "13:00", -60.0),
+    ]
+
+
+def test_invalid_points_are_dropped():
+    points = [
+        {"time": "25:00", "score": 10},
+        {"time": "bad", "score": 10},
+        {"time": "10:00", "score": "x"},
+        {"time": "10:00", "score": math.nan},
+        {"time": "10:00", "score": 12},
+    ]
+    analytics = compute_daily_vibe_analytics(points)
+    assert analytics["spot_count"] == 1
+    assert analytics["timeline"][20] == 12.0
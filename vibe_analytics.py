@@ -0,0 +1,155 @@
+"""
+Daily vibe analytics (NumPy)
+
+Bins one day of spot vibe scores into 48 x 30-minute slots and computes
+the positive/negative/neutral hour distribution, variance and change
+points in a single vectorised pass. The result is stored in
+daily_results.vibe_analytics so dashboards don't recompute it per view,
+and the numbers are derived from spot_results only (independent of the LLM).
+"""
+
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+SLOTS_PER_DAY = 48
+SLOT_MINUTES = 30
+SLOT_HOURS = SLOT_MINUTES / 60
+
+# vibe_score is -100 to +100
+POSITIVE_THRESHOLD = 10       # slot mean > +10 → positive
+NEGATIVE_THRESHOLD = -10      # slot mean < -10 → negative
+CHANGE_POINT_THRESHOLD = 30   # |Δ| between consecutive observed slots → change point
+
+
+def _to_hhmm(local_time: str) -> Optional[str]:
+    """Extract HH:MM from local_time (YYYY-MM-DD HH:MM:SS or HH:MM:SS)"""
+    time_str = local_time.split(' ')[1] if ' ' in local_time else local_time
+    time_parts = time_str.split(':')
+    if len(time_parts) < 2:
+        return None
+    return f"{time_parts[0]}:{time_parts[1]}"
+
+
+def extract_vibe_points(spot_rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Convert spot_results rows into the daily_results.vibe_scores array
+
+    Args:
+        spot_rows: Rows with local_time and vibe_score (ordered by recorded_at)
+
+    Returns:
+        List[Dict]: [{"time": "HH:MM", "score": vibe_score}, ...]
+    """
+    points = []
+    for spot in spot_rows:
+        local_time = spot.get('local_time')
+        vibe_score = spot.get('vibe_score')
+        if not local_time or vibe_score is None:
+            continue
+        time_hhmm = _to_hhmm(local_time)
+        if time_hhmm:
+            points.append({"time": time_hhmm, "score": vibe_score})
+    return points
+
+
+def _slot_label(slot: int) -> str:
+    minutes = slot * SLOT_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _nan_to_none(values: np.ndarray) -> List[Optional[float]]:
+    return [None if np.isnan(v) else round(float(v), 1) for v in values]
+
+
+def compute_daily_vibe_analytics(points: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Compute daily vibe analytics from vibe points
+
+    Args:
+        points: Output of extract_vibe_points
+
+    Returns:
+        Dict: 48-slot timeline, hour distribution, variance and change points
+    """
+    minutes = []
+    scores = []
+    for point in points:
+        try:
+            hour, minute = point["time"].split(':')
+            minute_of_day = int(hour) * 60 + int(minute)
+            score = float(point["score"])
+        except (ValueError, TypeError):
+            continue
+        minutes.append(minute_of_day)
+        scores.append(score)
+
+    minutes_arr = np.asarray(minutes, dtype=np.int64)
+    scores_arr = np.asarray(scores, dtype=np.float64)
+
+    # Drop non-finite scores and out-of-range times
+    valid = np.isfinite(scores_arr) & (minutes_arr >= 0) & (minutes_arr < 24 * 60)
+    minutes_arr = minutes_arr[valid]
+    scores_arr = scores_arr[valid]
+
+    if scores_arr.size == 0:
+        return {
+            "slot_minutes": SLOT_MINUTES,
+            "timeline": [None] * SLOTS_PER_DAY,
+            "spot_count": 0,
+            "observed_slots": 0,
+            "average_score": None,
+            "min_score": None,
+            "max_score": None,
+            "variance": None,
+            "std_dev": None,
+            "positive_hours": 0.0,
+            "negative_hours": 0.0,
+            "neutral_hours": 0.0,
+            "vibe_changes": []
+        }
+
+    # 30-minute slot means
+    slots = minutes_arr // SLOT_MINUTES
+    slot_sums = np.bincount(slots, weights=scores_arr, minlength=SLOTS_PER_DAY)
+    slot_counts = np.bincount(slots, minlength=SLOTS_PER_DAY)
+    observed = slot_counts > 0
+    slot_means = np.full(SLOTS_PER_DAY, np.nan)
+    slot_means[observed] = slot_sums[observed] / slot_counts[observed]
+
+    # Hour distribution over observed slots
+    observed_means = slot_means[observed]
+    positive_slots = int(np.count_nonzero(observed_means > POSITIVE_THRESHOLD))
+    negative_slots = int(np.count_nonzero(observed_means < NEGATIVE_THRESHOLD))
+    neutral_slots = int(observed_means.size) - positive_slots - negative_slots
+
+    # Change points between consecutive observed slots
+    observed_idx = np.flatnonzero(observed)
+    deltas = np.diff(observed_means)
+    change_idx = np.flatnonzero(np.abs(deltas) >= CHANGE_POINT_THRESHOLD)
+    vibe_changes = [
+        {
+            "time": _slot_label(int(observed_idx[i + 1])),
+            "from_time": _slot_label(int(observed_idx[i])),
+            "from_score": round(float(observed_means[i]), 1),
+            "to_score": round(float(observed_means[i + 1]), 1),
+            "delta": round(float(deltas[i]), 1)
+        }
+        for i in change_idx
+    ]
+
+    return {
+        "slot_minutes": SLOT_MINUTES,
+        "timeline": _nan_to_none(slot_means),
+        "spot_count": int(scores_arr.size),
+        "observed_slots": int(observed_means.size),
+        "average_score": round(float(scores_arr.mean()), 2),
+        "min_score": float(scores_arr.min()),
+        "max_score": float(scores_arr.max()),
+        "variance": round(float(scores_arr.var()), 2),
+        "std_dev": round(float(scores_arr.std()), 2),
+        "positive_hours": positive_slots * SLOT_HOURS,
+        "negative_hours": negative_slots * SLOT_HOURS,
+        "neutral_hours": neutral_slots * SLOT_HOURS,
+        "vibe_changes": vibe_changes
+    }